@@ -0,0 +1,54 @@
+"""shelters: normalized search_text (NFKC + kana) with pg_trgm GIN index
+Revision ID: a7_shelters_search_text_trgm
+Revises: c5f1acb546da
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "a7_shelters_search_text_trgm"
+down_revision = "c5f1acb546da"
+branch_labels = None
+depends_on = None
+
+# ひらがな(U+3041..U+3096) → カタカナ(U+30A1..U+30F6)。app.crud.shelter.normalize_search_text と同じ規則
+_HIRAGANA = "".join(chr(c) for c in range(0x3041, 0x3097))
+_KATAKANA = "".join(chr(c) for c in range(0x30A1, 0x30F7))
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # 生成列から呼ぶので IMMUTABLE で定義（normalize/translate/lower はいずれも不変）
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION shelter_search_normalize(t text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT lower(translate(normalize(coalesce(t, ''), NFKC), '{_HIRAGANA}', '{_KATAKANA}'))
+        $$
+    """)
+
+    # 読み（カナ）。「ふじさわ」で「藤沢」を引けるようにする
+    op.add_column("shelters", sa.Column("name_kana", sa.Text(), nullable=True))
+
+    # seed・手入力どちらでも常に正規化済みになるよう生成列で保持
+    op.add_column(
+        "shelters",
+        sa.Column(
+            "search_text",
+            sa.Text(),
+            sa.Computed(
+                "shelter_search_normalize("
+                "coalesce(name, '') || ' ' || coalesce(name_kana, '') || ' ' || coalesce(address, ''))",
+                persisted=True,
+            ),
+        ),
+    )
+    op.execute(
+        'CREATE INDEX "ix_shelters_search_text_trgm" ON shelters USING GIN (search_text gin_trgm_ops)'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS "ix_shelters_search_text_trgm"')
+    op.drop_column("shelters", "search_text")
+    op.drop_column("shelters", "name_kana")
+    op.execute("DROP FUNCTION IF EXISTS shelter_search_normalize(text)")
@@ -0,0 +1,50 @@
+"""shelters: packed capability bitmask (hazard/facility flags) + partial GiST indexes
+Revision ID: a8_shelters_capabilities
+Revises: a7_shelters_search_text_trgm
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "a8_shelters_capabilities"
+down_revision = "a7_shelters_search_text_trgm"
+branch_labels = None
+depends_on = None
+
+# app.models.shelter.ShelterCapability と同じビット割り当て（変更時は両方そろえる）
+_BITS = [
+    ("is_emergency_flood", 1),
+    ("is_emergency_landslide", 2),
+    ("is_emergency_tidalwave", 4),
+    ("is_emergency_large_fire", 8),
+    ("has_parking", 16),
+    ("has_barrier_free_toilet", 32),
+    ("has_pet_space", 64),
+    ("is_designated_shelter", 128),
+    ("is_welfare_shelter_primary", 256),
+]
+CAPABILITIES_EXPR = " | ".join(
+    f"(CASE WHEN coalesce({col}, false) THEN {bit} ELSE 0 END)" for col, bit in _BITS
+)
+
+
+def upgrade() -> None:
+    # boolean 列から自動計算（seed / 手入力で boolean を書けば常に同期）
+    op.add_column(
+        "shelters",
+        sa.Column("capabilities", sa.Integer(), sa.Computed(CAPABILITIES_EXPR, persisted=True), nullable=False),
+    )
+    # よく使う組み合わせ（ペット可 / 洪水対応）は部分 GiST 索引で空間検索と同時に絞る
+    op.execute(
+        'CREATE INDEX "ix_shelters_geom_cap_pet_space" ON shelters USING GIST (geom) '
+        "WHERE (capabilities & 64) = 64"
+    )
+    op.execute(
+        'CREATE INDEX "ix_shelters_geom_cap_flood" ON shelters USING GIST (geom) '
+        "WHERE (capabilities & 1) = 1"
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP INDEX IF EXISTS "ix_shelters_geom_cap_flood"')
+    op.execute('DROP INDEX IF EXISTS "ix_shelters_geom_cap_pet_space"')
+    op.drop_column("shelters", "capabilities")
@@ -0,0 +1,27 @@
+"""shelters: monotonically increasing data version (ETag / conditional GET)
+Revision ID: a9_shelters_data_version
+Revises: a8_shelters_capabilities
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "a9_shelters_data_version"
+down_revision = "a8_shelters_capabilities"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 1行だけのテーブル。混雑度更新・seed が同じトランザクション内で version を +1 する
+    op.create_table(
+        "shelters_data_version",
+        sa.Column("id", sa.SmallInteger(), primary_key=True, server_default=sa.text("1")),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default=sa.text("1")),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.CheckConstraint("id = 1", name="ck_shelters_data_version_single_row"),
+    )
+    op.execute("INSERT INTO shelters_data_version (id, version, updated_at) VALUES (1, 1, now())")
+
+
+def downgrade() -> None:
+    op.drop_table("shelters_data_version")
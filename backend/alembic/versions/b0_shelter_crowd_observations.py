@@ -0,0 +1,41 @@
+"""shelters: append-only crowd-level observations (BRIN on observed_at)
+Revision ID: b0_shelter_crowd_observations
+Revises: a9_shelters_data_version
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "b0_shelter_crowd_observations"
+down_revision = "a9_shelters_data_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "shelter_crowd_observations",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "shelter_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("shelters.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("crowd_level", sa.Text(), nullable=False),
+        sa.Column("observed_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    # 追記のみ・時刻順なので BRIN（数ヶ月分でも数十KB）で期間の絞り込み
+    op.create_index(
+        "ix_shelter_crowd_observations_observed_at_brin",
+        "shelter_crowd_observations", ["observed_at"], postgresql_using="brin",
+    )
+    # 避難所ごとの期間検索と「期間開始時点の直前の値」の取得用
+    op.create_index(
+        "ix_shelter_crowd_observations_shelter_time",
+        "shelter_crowd_observations", ["shelter_id", "observed_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_shelter_crowd_observations_shelter_time", table_name="shelter_crowd_observations")
+    op.drop_index("ix_shelter_crowd_observations_observed_at_brin", table_name="shelter_crowd_observations")
+    op.drop_table("shelter_crowd_observations")
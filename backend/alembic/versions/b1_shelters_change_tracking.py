@@ -0,0 +1,90 @@
+"""shelters: change tracking (change_version + tombstones) for delta sync
+Revision ID: b1_shelters_change_tracking
+Revises: b0_shelter_crowd_observations
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "b1_shelters_change_tracking"
+down_revision = "b0_shelter_crowd_observations"
+branch_labels = None
+depends_on = None
+
+# 書き込んだトランザクションの ID（xid8 → bigint）。
+# 連番（sequence）だとコミット順と採番順がずれて取りこぼすため、
+# 読み取り側は「実行中トランザクションの最小 xid（xmin）未満」だけを返す。
+_CURRENT_XID = "pg_current_xact_id()::text::bigint"
+
+# 変更判定から外す列（トリガ自身が書く列・生成列）
+_IGNORED = "ARRAY['change_version', 'updated_at', 'search_text', 'capabilities']"
+
+
+def upgrade() -> None:
+    op.add_column(
+        "shelters",
+        sa.Column("change_version", sa.BigInteger(), nullable=False, server_default=sa.text(_CURRENT_XID)),
+    )
+    op.create_index("ix_shelters_change_version", "shelters", ["change_version"])
+
+    op.create_table(
+        "shelter_tombstones",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("change_version", sa.BigInteger(), nullable=False, server_default=sa.text(_CURRENT_XID)),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_shelter_tombstones_change_version", "shelter_tombstones", ["change_version"])
+
+    # INSERT / UPDATE: 中身が変わったときだけ change_version と updated_at を進める
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION shelters_track_change() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND (to_jsonb(NEW) - {_IGNORED}) = (to_jsonb(OLD) - {_IGNORED}) THEN
+                NEW.change_version := OLD.change_version;
+                NEW.updated_at := OLD.updated_at;
+                RETURN NEW;
+            END IF;
+            NEW.change_version := {_CURRENT_XID};
+            NEW.updated_at := now();
+            IF TG_OP = 'INSERT' THEN
+                DELETE FROM shelter_tombstones WHERE id = NEW.id;
+            END IF;
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION shelters_track_delete() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO shelter_tombstones (id, change_version, deleted_at)
+            VALUES (OLD.id, {_CURRENT_XID}, now())
+            ON CONFLICT (id) DO UPDATE
+            SET change_version = EXCLUDED.change_version, deleted_at = EXCLUDED.deleted_at;
+            RETURN OLD;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_shelters_track_change
+        BEFORE INSERT OR UPDATE ON shelters
+        FOR EACH ROW EXECUTE FUNCTION shelters_track_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_shelters_track_delete
+        AFTER DELETE ON shelters
+        FOR EACH ROW EXECUTE FUNCTION shelters_track_delete()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_shelters_track_delete ON shelters")
+    op.execute("DROP TRIGGER IF EXISTS trg_shelters_track_change ON shelters")
+    op.execute("DROP FUNCTION IF EXISTS shelters_track_delete()")
+    op.execute("DROP FUNCTION IF EXISTS shelters_track_change()")
+    op.drop_index("ix_shelter_tombstones_change_version", table_name="shelter_tombstones")
+    op.drop_table("shelter_tombstones")
+    op.drop_index("ix_shelters_change_version", table_name="shelters")
+    op.drop_column("shelters", "change_version")
@@ -0,0 +1,60 @@
+"""shelters: stored lat/lng generated from geom (no per-row geography casts on read)
+Revision ID: b2_shelters_stored_latlng
+Revises: b1_shelters_change_tracking
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b2_shelters_stored_latlng"
+down_revision = "b1_shelters_change_tracking"
+branch_labels = None
+depends_on = None
+
+_CURRENT_XID = "pg_current_xact_id()::text::bigint"
+
+
+def _track_change_function(ignored: str) -> str:
+    # b1_shelters_change_tracking と同じ本体（変更判定から外す列だけ差し替え）
+    return f"""
+        CREATE OR REPLACE FUNCTION shelters_track_change() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND (to_jsonb(NEW) - {ignored}) = (to_jsonb(OLD) - {ignored}) THEN
+                NEW.change_version := OLD.change_version;
+                NEW.updated_at := OLD.updated_at;
+                RETURN NEW;
+            END IF;
+            NEW.change_version := {_CURRENT_XID};
+            NEW.updated_at := now();
+            IF TG_OP = 'INSERT' THEN
+                DELETE FROM shelter_tombstones WHERE id = NEW.id;
+            END IF;
+            RETURN NEW;
+        END
+        $$
+    """
+
+
+def upgrade() -> None:
+    # geom から自動計算（seed・手入力どちらでも常に一致）。読み取りはただの double を返すだけ
+    op.add_column(
+        "shelters",
+        sa.Column("lat", sa.Float(), sa.Computed("ST_Y(geom::geometry)", persisted=True)),
+    )
+    op.add_column(
+        "shelters",
+        sa.Column("lng", sa.Float(), sa.Computed("ST_X(geom::geometry)", persisted=True)),
+    )
+    # 生成列は変更判定の対象外（geom 側で判定される）
+    op.execute(_track_change_function(
+        "ARRAY['change_version', 'updated_at', 'search_text', 'capabilities', 'lat', 'lng']"
+    ))
+
+
+def downgrade() -> None:
+    op.execute(_track_change_function(
+        "ARRAY['change_version', 'updated_at', 'search_text', 'capabilities']"
+    ))
+    op.drop_column("shelters", "lng")
+    op.drop_column("shelters", "lat")
@@ -1,23 +1,57 @@
 # backend/app/core/deps.py
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Annotated, Any, Dict
+from dataclasses import dataclass, field
+from typing import Annotated, Any, Dict, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
 from app.core.firebase_auth import verify_id_token
+from app.core.user_cache import UserRecord, user_cache, user_cache_enabled
+from app.crud.user import get_user_record, upsert_user
 from app.db.session import SessionLocal
 
 bearer_scheme = HTTPBearer(auto_error=True)
 
 @dataclass
 class AuthContext:
+    """
+    1リクエストにつき1回だけ作る認証結果（request.state.auth に置く）。
+    claims はトークン由来なので追加の問い合わせ無し。record / user は初めて触れたときに読む。
+    """
     uid: str
     email: str | None
     claims: Dict[str, Any]  # {"admin": bool, "premium": bool}
-    user: Any               # ORM User オブジェクト
+    db: Session = field(repr=False)
+    _record: Optional[UserRecord] = field(default=None, repr=False)
+    _user: Any = field(default=None, repr=False)
+
+    @property
+    def is_admin(self) -> bool:
+        return bool(self.claims.get("admin", False))
+
+    @property
+    def is_premium(self) -> bool:
+        return bool(self.claims.get("premium", False))
+
+    @property
+    def record(self) -> UserRecord:
+        """users の軽量レコード（キャッシュ → SELECT → 未登録なら自動登録）"""
+        if self._record is None:
+            self._record = resolve_user(self.db, self.uid, self.email)
+        return self._record
+
+    @property
+    def user_id(self) -> Any:
+        return self.record.id
+
+    @property
+    def user(self) -> Any:
+        """ORM User（更新するルートでだけ触る）"""
+        if self._user is None:
+            self._user = _load_user(self.db, self.record, self.email)
+        return self._user
 
 
 def get_db() -> Session:
@@ -28,57 +62,86 @@ def get_db() -> Session:
         db.close()
 
 
-def get_current_user(
-    creds: Annotated[HTTPAuthorizationCredentials, Depends(bearer_scheme)],
-    db: Session = Depends(get_db),
-) -> Any:
+def resolve_user(db: Session, uid: str, email: str | None) -> UserRecord:
     """
-    - Firebaseトークンを検証
-    - users に存在しなければ自動登録（既存実装を踏襲）
-    - 戻り値は ORM User
+    firebase_uid → UserRecord。
+    キャッシュ → SELECT → 未登録なら INSERT ... ON CONFLICT で自動登録（同時初回リクエストでも安全）
     """
-    token = creds.credentials
-    decoded = verify_id_token(token)
-    uid = decoded.get("uid")
-    email = decoded.get("email")
-
+    if user_cache_enabled():
+        record = user_cache.get(uid)
+        if record is not None:
+            return record
+    row = get_user_record(db, uid) or upsert_user(db, uid, email)
+    record = UserRecord.from_row(row)
+    if user_cache_enabled():
+        user_cache.set(record)
+    return record
+
+
+def _load_user(db: Session, record: UserRecord, email: str | None) -> Any:
+    """ORM User を主キーで読む（キャッシュ後に削除されていたら登録し直す）"""
     from app.models.user import User  # 遅延 import
 
-    user = db.query(User).filter(User.firebase_uid == uid).first()
+    user = db.get(User, record.id)
     if user is None:
-        user = User(firebase_uid=uid, email=email)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        user_cache.invalidate(record.firebase_uid)
+        record = resolve_user(db, record.firebase_uid, email)
+        user = db.get(User, record.id)
     return user
 
 
+def resolve_auth(request: Request, token: str, db: Session) -> AuthContext:
+    """
+    トークン → AuthContext（request.state.auth に置き、同じリクエスト内では再検証しない）。
+    Bearer が任意のルート（AUTH_BYPASS 中の premium など）はこれを直接呼ぶ。
+    """
+    ctx: Optional[AuthContext] = getattr(request.state, "auth", None)
+    if ctx is None:
+        decoded = verify_id_token(token)
+        ctx = AuthContext(
+            uid=decoded.get("uid"),
+            email=decoded.get("email"),
+            claims=decoded.get("claims", {}),
+            db=db,
+        )
+        request.state.auth = ctx
+    return ctx
+
+
 def get_auth_context(
+    request: Request,
     creds: Annotated[HTTPAuthorizationCredentials, Depends(bearer_scheme)],
     db: Session = Depends(get_db),
 ) -> AuthContext:
     """
-    便利依存：Userだけでなくclaimsも欲しい場面用
+    認証の入口（他の認証依存はすべてここを経由する）。
+    - Firebaseトークンの検証はリクエストにつき1回。結果は request.state.auth に置いて使い回す
+    - users の参照・自動登録は ctx.record / ctx.user に触れたときだけ
     """
-    decoded = verify_id_token(creds.credentials)
-    uid = decoded.get("uid")
-    email = decoded.get("email")
-    claims: Dict[str, Any] = decoded.get("claims", {})
+    return resolve_auth(request, creds.credentials, db)
 
-    from app.models.user import User
-    user = db.query(User).filter(User.firebase_uid == uid).first()
-    if user is None:
-        user = User(firebase_uid=uid, email=email)
-        db.add(user); db.commit(); db.refresh(user)
 
-    return AuthContext(uid=uid, email=email, claims=claims, user=user)
+def get_current_user_record(ctx: AuthContext = Depends(get_auth_context)) -> UserRecord:
+    """
+    - users に存在しなければ自動登録
+    - 戻り値は UserRecord（id/firebase_uid/email/plan）。読み取りだけのルートはこちらを使う
+    """
+    return ctx.record
+
+
+def get_current_user(ctx: AuthContext = Depends(get_auth_context)) -> Any:
+    """
+    - users に存在しなければ自動登録（既存実装を踏襲）
+    - 戻り値は ORM User（ユーザー自身を更新するルート用）
+    """
+    return ctx.user
 
 
-def get_admin_user(ctx: AuthContext = Depends(get_auth_context)) -> Any:
+def get_admin_user(ctx: AuthContext = Depends(get_auth_context)) -> AuthContext:
     """
     管理者専用依存。claims.admin が True でなければ 403。
-    戻り値は ORM User（既存の処理に自然に入れ替え可能）
+    判定はトークンの claims だけで行う（users は読まない）。ユーザーが要るときは ctx.user
     """
-    if not bool(ctx.claims.get("admin", False)):
+    if not ctx.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privilege required")
-    return ctx.user
+    return ctx
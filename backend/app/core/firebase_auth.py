@@ -8,6 +8,9 @@ import firebase_admin
 from firebase_admin import auth, credentials
 from fastapi import HTTPException, status
 
+from app.core.jwt_verifier import get_offline_verifier, offline_enabled
+from app.core.token_cache import AUTH_CHECK_REVOKED, token_cache, token_cache_enabled
+
 PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
 CLIENT_EMAIL = os.getenv("FIREBASE_CLIENT_EMAIL")
 PRIVATE_KEY = os.getenv("FIREBASE_PRIVATE_KEY")  # ダブルクオートで囲み、\n 改行を保持
@@ -32,12 +35,24 @@ def verify_id_token(id_token: str) -> Dict[str, Any]:
     """
     Firebase IDトークンを厳密検証し、uid/email/custom claims を含めて返す。
     無効・期限切れ・別プロジェクト発行 → 401
+    検証済みトークンは exp まで token_cache に覚え、2回目以降はハッシュ引きだけで返す。
+    AUTH_VERIFIER=offline のときは SDK を通さず jwt_verifier でローカル検証する（失効確認時を除く）。
     """
-    _init_app()
+    if token_cache_enabled():
+        cached = token_cache.get(id_token)
+        if cached is not None:
+            return {**cached, "claims": dict(cached["claims"])}
+
     try:
-        decoded = auth.verify_id_token(id_token)  # exp/iss/audもSDK側で検証される
+        if offline_enabled() and not AUTH_CHECK_REVOKED:
+            # 公開鍵はメモリ上（バックグラウンド更新）。ネットワーク往復なしで署名と exp/iss/aud を検証
+            decoded = get_offline_verifier().verify(id_token)
+        else:
+            _init_app()
+            # exp/iss/audもSDK側で検証される。失効確認は AUTH_CHECK_REVOKED=1 のときだけ
+            decoded = auth.verify_id_token(id_token, check_revoked=AUTH_CHECK_REVOKED)
         # 正規化：claims は tokenの最上位に混ざるので、必要な値をまとめて返す
-        return {
+        result = {
             "uid": decoded.get("uid"),
             "email": decoded.get("email"),
             "claims": {
@@ -51,3 +66,8 @@ def verify_id_token(id_token: str) -> Dict[str, Any]:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired Firebase ID token",
         ) from e
+
+    if token_cache_enabled():
+        token_cache.set(id_token, result, decoded.get("exp"))
+        return {**result, "claims": dict(result["claims"])}
+    return result
@@ -0,0 +1,258 @@
+# backend/app/core/jwt_verifier.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+logger = logging.getLogger(__name__)
+
+# "firebase" = firebase_admin SDK で検証（既定） / "offline" = 公開鍵をメモリに持ってローカル検証
+AUTH_VERIFIER = os.getenv("AUTH_VERIFIER", "firebase")
+# 鍵の取得元: "google"（既定） / http(s)://...（同じ形式の JSON を返すサーバ） / file:/path/to/keys.json
+AUTH_KEYS_SOURCE = os.getenv("AUTH_KEYS_SOURCE", "google")
+# 秒。鍵の有効期限のこれだけ前にバックグラウンドで取り直す
+AUTH_KEYS_REFRESH_MARGIN = float(os.getenv("AUTH_KEYS_REFRESH_MARGIN", "300"))
+# 秒。時計ずれの許容
+AUTH_CLOCK_LEEWAY = float(os.getenv("AUTH_CLOCK_LEEWAY", "5"))
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+# 鍵の有効期限が取れないとき（ファイル等）の再読込間隔
+_DEFAULT_MAX_AGE = 3600.0
+# 未知の kid による同期再取得の最短間隔（不正トークンで取得元を叩かせない）
+_MIN_FORCED_REFRESH_SEC = 30.0
+
+PublicKeys = Dict[str, Any]   # {kid: 公開鍵オブジェクト}
+
+
+class TokenVerificationError(Exception):
+    """署名・クレームの検証失敗（呼び出し側で 401 にする）"""
+
+
+def _load_key(pem: str) -> Any:
+    """x509 証明書（Google 形式）または公開鍵 PEM を公開鍵オブジェクトにする"""
+    data = pem.encode("utf-8")
+    if b"BEGIN CERTIFICATE" in data:
+        return x509.load_pem_x509_certificate(data).public_key()
+    return load_pem_public_key(data)
+
+
+def parse_keys(doc: Dict[str, str]) -> PublicKeys:
+    return {kid: _load_key(pem) for kid, pem in doc.items()}
+
+
+# ---- 鍵の取得元（差し替え可能） -------------------------------------------
+class KeySource(ABC):
+    """fetch() → (公開鍵 {kid: key}, 有効秒数)"""
+
+    @abstractmethod
+    def fetch(self) -> Tuple[PublicKeys, float]:
+        ...
+
+
+class HttpKeySource(KeySource):
+    """Google の x509 形式（{kid: PEM}）を返す URL。Cache-Control: max-age を有効期限に使う"""
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, timeout: float = 5.0) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self) -> Tuple[PublicKeys, float]:
+        res = requests.get(self.url, timeout=self.timeout)
+        res.raise_for_status()
+        m = re.search(r"max-age=(\d+)", res.headers.get("Cache-Control", ""))
+        return parse_keys(res.json()), float(m.group(1)) if m else _DEFAULT_MAX_AGE
+
+
+class FileKeySource(KeySource):
+    """ローカルの JSON ファイル（{kid: PEM}）。テスト・ベンチマーク・オフライン環境用"""
+
+    def __init__(self, path: str, max_age: float = _DEFAULT_MAX_AGE) -> None:
+        self.path = path
+        self.max_age = max_age
+
+    def fetch(self) -> Tuple[PublicKeys, float]:
+        with open(self.path, encoding="utf-8") as f:
+            return parse_keys(json.load(f)), self.max_age
+
+
+class StaticKeySource(KeySource):
+    """プロセス内で作った鍵をそのまま使う（テスト用）"""
+
+    def __init__(self, keys: PublicKeys, max_age: float = _DEFAULT_MAX_AGE) -> None:
+        self.keys = keys
+        self.max_age = max_age
+
+    def fetch(self) -> Tuple[PublicKeys, float]:
+        return dict(self.keys), self.max_age
+
+
+def key_source_from_env(value: str = AUTH_KEYS_SOURCE) -> KeySource:
+    if value == "google":
+        return HttpKeySource(GOOGLE_CERTS_URL)
+    if value.startswith("file:"):
+        return FileKeySource(value[len("file:"):])
+    if value.startswith(("http://", "https://")):
+        return HttpKeySource(value)
+    raise ValueError(f"unknown AUTH_KEYS_SOURCE: {value}")
+
+
+# ---- 検証器 -----------------------------------------------------------------
+class OfflineVerifier:
+    """
+    Firebase ID トークン（RS256）をメモリ上の公開鍵でローカル検証する。
+    - 鍵は start() のバックグラウンドタスクが期限前に取り直す（リクエスト内で取得を待たない）
+    - 未知の kid（鍵ローテーション直後）のときだけ同期で1回取り直す
+    - 失効（revoke）確認はできない。必要なら AUTH_VERIFIER=firebase + AUTH_CHECK_REVOKED=1
+    """
+
+    def __init__(
+        self,
+        project_id: Optional[str],
+        source: KeySource,
+        refresh_margin: float = AUTH_KEYS_REFRESH_MARGIN,
+        leeway: float = AUTH_CLOCK_LEEWAY,
+    ) -> None:
+        self.project_id = project_id
+        self.source = source
+        self.refresh_margin = refresh_margin
+        self.leeway = leeway
+        self.refreshes = 0
+        self.errors = 0
+        self._keys: PublicKeys = {}
+        self._expires_at = 0.0
+        self._last_forced = 0.0
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- 鍵 ---------------------------------------------------------------
+    def refresh(self) -> None:
+        keys, max_age = self.source.fetch()
+        with self._lock:
+            self._keys = keys
+            self._expires_at = time.time() + max_age
+        self.refreshes += 1
+
+    def _key_for(self, kid: Optional[str]) -> Any:
+        key = self._keys.get(kid) if kid else None
+        if key is not None:
+            return key
+        # 初回 or 鍵ローテーション直後。短時間に何度も取りに行かない
+        now = time.monotonic()
+        if not self._keys or now - self._last_forced >= _MIN_FORCED_REFRESH_SEC:
+            self._last_forced = now
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                logger.warning({"event": "auth_keys_refresh_error", "error": str(e)})
+            key = self._keys.get(kid) if kid else None
+        if key is None:
+            raise TokenVerificationError("unknown key id")
+        return key
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            wait = max(self._expires_at - time.time() - self.refresh_margin, 60.0)
+            await asyncio.sleep(wait)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                self.errors += 1
+                logger.warning({"event": "auth_keys_refresh_error", "error": str(e)})
+                # 失敗時は短めに再試行（手元の鍵は期限まで使い続ける）
+                self._expires_at = time.time() + self.refresh_margin + 30.0
+
+    async def start(self) -> None:
+        """起動時に呼ぶ。鍵を先に読み込み、以降はバックグラウンドで更新"""
+        if not self._keys:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:  # 取得できなくても起動は続ける（初回検証時・次の周期で再取得）
+                self.errors += 1
+                logger.warning({"event": "auth_keys_refresh_error", "error": str(e)})
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    # ---- 検証 -------------------------------------------------------------
+    def verify(self, token: str) -> Dict[str, Any]:
+        """検証済みのクレームを返す（uid = sub を付ける）。失敗は TokenVerificationError"""
+        if not self.project_id:
+            raise TokenVerificationError("FIREBASE_PROJECT_ID is not set")
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e)) from e
+        if header.get("alg") != "RS256":
+            raise TokenVerificationError("unexpected alg")
+        key = self._key_for(header.get("kid"))
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=f"https://securetoken.google.com/{self.project_id}",
+                leeway=self.leeway,
+                options={"require": ["exp", "iat", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e)) from e
+        sub = claims.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise TokenVerificationError("invalid sub")
+        auth_time = claims.get("auth_time")
+        if auth_time is not None and float(auth_time) > time.time() + self.leeway:
+            raise TokenVerificationError("auth_time in the future")
+        claims["uid"] = sub
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "expires_in": max(self._expires_at - time.time(), 0.0),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+
+_verifier: Optional[OfflineVerifier] = None
+
+
+def offline_enabled() -> bool:
+    return AUTH_VERIFIER == "offline"
+
+
+def get_offline_verifier() -> OfflineVerifier:
+    """ワーカー単位で共有するインスタンス（初回呼び出し時に環境変数から作る）"""
+    global _verifier
+    if _verifier is None:
+        _verifier = OfflineVerifier(os.getenv("FIREBASE_PROJECT_ID"), key_source_from_env())
+    return _verifier
+
+
+def set_offline_verifier(verifier: Optional[OfflineVerifier]) -> None:
+    """鍵の取得元を差し替える（テスト・ベンチマーク用）"""
+    global _verifier
+    _verifier = verifier
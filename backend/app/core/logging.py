@@ -1,11 +1,20 @@
 # backend/app/core/logging.py
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import os
+import queue
 import re
 from datetime import datetime
-from typing import Any, Dict
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# 1=ON でログの整形・マスク・出力を別スレッドで行う（リクエスト側はキューに積むだけ。既定 ON）
+LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "1") == "1"
+# キューの上限件数。埋まってきたら DEBUG → INFO の順に捨てる（WARNING 以上は満杯まで受ける）
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
 # ---- 置換対象のキー名（小文字で比較）-----------------------------------------
 PII_KEYS = {"uid", "email", "authorization", "id_token", "id-token", "x-id-token"}
@@ -13,51 +22,85 @@ PII_KEYS = {"uid", "email", "authorization", "id_token", "id-token", "x-id-token
 # よくあるパターン（保守しやすいよう緩め）
 EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 BEARER_RE = re.compile(r"(Bearer\s+)[A-Za-z0-9._\-+=:/]+", re.IGNORECASE)
+# 上の2つを1回の走査で済ませる結合版（bearer グループがあればトークン、無ければメール）
+# トークン側は @ と % も含めて読む（"Bearer a@x.com" でメールの一部を残さない）
+PII_RE = re.compile(
+    r"(?P<bearer>(?i:bearer)\s+)[A-Za-z0-9._\-+=:/@%]+|[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}"
+)
+
+# LogRecord の標準属性（利用者のデータは入らないので走査しない）。これ以外は extra= で渡された値
+_STD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime"}
+_SCALARS = (int, float, bool, type(None))
+
+
+def _replace(m: "re.Match[str]") -> str:
+    bearer = m.group("bearer")
+    return bearer + "***" if bearer else "***"  # 'Bearer ' は残しつつトークン伏字
+
+
+def _mask_str(s: str) -> str:
+    # '@' も 'bearer' も無ければ正規表現を走らせない（大半のログはここで終わる）
+    if "@" not in s and "bearer" not in s.lower():
+        return s
+    return PII_RE.sub(_replace, s)
+
 
 def _mask_value(v: Any) -> Any:
     """値をマスク。辞書/配列は再帰的に処理。
     ※ 数値/真偽値は文字列化しない（uvicorn.access の %d 等を壊さないため）
+    ※ 置換が無ければ受け取ったオブジェクトをそのまま返す（辞書・配列も作り直さない）
     """
+    if isinstance(v, str):
+        return _mask_str(v)
+    if isinstance(v, _SCALARS):
+        return v  # ← ここが重要（%d/%f を壊さない）
     if isinstance(v, dict):
-        return {k: _mask_value(v) for k, v in v.items()}
+        out = None
+        for k, x in v.items():
+            y = _mask_value(x)
+            if y is not x:
+                if out is None:
+                    out = dict(v)
+                out[k] = y
+        return v if out is None else out
     if isinstance(v, (list, tuple)):
-        return type(v)(_mask_value(x) for x in v)
-    if v is None:
-        return None
-    if isinstance(v, (int, float, bool)):
-        return v  # ← ここが重要（%d/%f を壊さない）
+        items = [_mask_value(x) for x in v]
+        if all(y is x for x, y in zip(items, v)):
+            return v
+        return items if isinstance(v, list) else tuple(items)
 
     s = str(v)
-    s = EMAIL_RE.sub("***", s)
-    s = BEARER_RE.sub(r"\1***", s)  # 'Bearer ' は残しつつトークン伏字
-    return s
+    masked = _mask_str(s)
+    return v if masked is s else masked
+
+
+def _mask_keyed(key: Any, v: Any) -> Any:
+    return "***" if isinstance(key, str) and key.lower() in PII_KEYS else _mask_value(v)
+
 
 class PIIFilter(logging.Filter):
     """
     LogRecord とメッセージを通過前にスキャンし、PII を "***" に置換する。
-    - record.getMessage() に含まれるメールや Bearer トークンをマスク
-    - record.args や record.__dict__ 内に PII キーがあればマスク
+    - 見るのは msg / args / extra で渡された属性だけ（標準属性は走査しない）
+    - メールや Bearer トークンは値の中身で、PII_KEYS は属性名・args のキー名でマスク
     """
     def filter(self, record: logging.LogRecord) -> bool:  # True=出力を許可
-        # 1) 代表的な属性をマスク
-        for key in list(record.__dict__.keys()):
-            low = key.lower() if isinstance(key, str) else key
-            if isinstance(low, str) and low in PII_KEYS:
-                record.__dict__[key] = "***"
-            else:
-                record.__dict__[key] = _mask_value(record.__dict__[key])
+        # 1) msg 自体（dict 等も）
+        record.msg = _mask_value(record.msg)
 
         # 2) printf 形式 (%s など) の引数にも対応
-        if isinstance(record.args, dict):
-            record.args = {
-                k: ("***" if isinstance(k, str) and k.lower() in PII_KEYS else _mask_value(v))
-                for k, v in record.args.items()
-            }
-        elif isinstance(record.args, tuple):
-            record.args = tuple(_mask_value(v) for v in record.args)
-
-        # 3) msg 自体が dict 等の場合
-        record.msg = _mask_value(record.msg)
+        args = record.args
+        if isinstance(args, dict):
+            masked = {k: _mask_keyed(k, v) for k, v in args.items()}
+            if any(masked[k] is not args[k] for k in args):
+                record.args = masked
+        elif isinstance(args, tuple) and args:
+            record.args = _mask_value(args)
+
+        # 3) extra= で付けた属性
+        d = record.__dict__
+        for key in d.keys() - _STD_ATTRS:
+            d[key] = _mask_keyed(key, d[key])
         return True
 
 # --------- フォーマッタ（環境別） ---------------------------------------------
@@ -86,6 +129,83 @@ class JsonFormatter(logging.Formatter):
                 payload[k] = getattr(record, k)
         return json.dumps(payload, ensure_ascii=False)
 
+# --------- 非同期出力（キュー） -------------------------------------------------
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    ログを有界キューに積むだけのハンドラ（ブロックしない）。
+    - 整形・PII マスク・書き込みは QueueListener 側のスレッドで行う
+    - キューの埋まり具合でレベルごとに受け付けを止める:
+        DEBUG は 50% まで / INFO は 90% まで / WARNING 以上は満杯まで
+    - 捨てた件数はレベル名ごとに dropped に数える
+    """
+    DEBUG_LIMIT = 0.5
+    INFO_LIMIT = 0.9
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(q)
+        cap = q.maxsize
+        self._debug_cap = int(cap * self.DEBUG_LIMIT) if cap > 0 else 0
+        self._info_cap = int(cap * self.INFO_LIMIT) if cap > 0 else 0
+        self.enqueued = 0
+        self.dropped: Dict[str, int] = {}
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        既定の prepare はここで format してしまう。整形は出力スレッドに任せる。
+        ただし dict / list の msg・args は浅くコピーする（呼び出し側が記録後に書き換えても、
+        出力スレッドが読む内容と競合しない）。入れ子の中身までは複製しない。
+        """
+        msg, args = record.msg, record.args
+        if isinstance(msg, (dict, list)):
+            record.msg = msg.copy()
+        if isinstance(args, dict):
+            record.args = args.copy()
+        elif args and any(isinstance(a, (dict, list)) for a in args):
+            record.args = tuple(a.copy() if isinstance(a, (dict, list)) else a for a in args)
+        return record
+
+    def _drop(self, record: logging.LogRecord) -> None:
+        self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self._info_cap and record.levelno < logging.WARNING:
+            size = self.queue.qsize()
+            if size >= self._info_cap or (record.levelno < logging.INFO and size >= self._debug_cap):
+                self._drop(record)
+                return
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self._drop(record)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": dict(self.dropped),
+        }
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def shutdown_logging() -> None:
+    """キューに残ったログを書き出して出力スレッドを止める（プロセス終了時に自動で呼ばれる）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_stats() -> Dict[str, Any]:
+    """ログキューの状況（キュー未使用なら空）"""
+    return _queue_handler.stats() if _queue_handler is not None else {}
+
+
 # --------- 初期化 -------------------------------------------------------------
 
 def setup_logging(env: str | None) -> None:
@@ -99,17 +219,28 @@ def setup_logging(env: str | None) -> None:
     level = logging.DEBUG if mode == "development" else logging.INFO
     formatter = DevFormatter() if mode == "development" else JsonFormatter()
 
+    global _queue_handler, _listener
+
     # 既存ハンドラをリセット（Uvicorn が先に作っていても上書き）
     root = logging.getLogger()
     for h in list(root.handlers):
         root.removeHandler(h)
+    shutdown_logging()
 
     handler = logging.StreamHandler()
     handler.setFormatter(formatter)
     handler.addFilter(PIIFilter())
 
     root.setLevel(level)
-    root.addHandler(handler)
+    if LOG_QUEUE_ENABLED:
+        # リクエスト側はキューに積むだけ。PIIFilter・整形・stdout への書き込みは出力スレッドで
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _listener = QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_queue_handler)
+    else:
+        _queue_handler = None
+        root.addHandler(handler)
 
     # Uvicorn 系ロガーにも同じ設定を適用（access/error など）
     for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
@@ -120,3 +251,6 @@ def setup_logging(env: str | None) -> None:
 
     # 念のため自分のアプリ系にも最低レベルを合わせる
     logging.getLogger("app").setLevel(level)
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,144 @@
+# backend/app/core/metrics.py
+from __future__ import annotations
+
+import hmac
+import os
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 1=ON でリクエストの所要時間などを集計し GET /system/metrics で出す（既定 ON）
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# 収集用トークン（Prometheus の bearer_token）。未設定なら管理者の ID トークンでだけ読める
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# 秒。SLO（/shelters p95 ≤ 300ms・距離検索 p95 ≤ 50ms）の境目を必ず含める
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5, 5.0)
+# 1つの指標が持てるラベルの組み合わせ数の上限（超えた分は "other" にまとめる）
+MAX_SERIES = 512
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Histogram:
+    """
+    Prometheus 形式のヒストグラム（ワーカー内）。
+    observe はバケット探索（bisect）と、競合しないロック1回での加算だけ。累積は出力時に計算する。
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # ラベル → [各バケットの件数..., +Inf の件数, 合計値]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                if len(self._series) >= MAX_SERIES:
+                    labels = ("other",) * len(self.labelnames)
+                s = self._series.setdefault(labels, [0] * (len(self.buckets) + 1) + [0.0])
+            s[i] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, s in sorted(series.items()):
+            acc = 0
+            for bound, n in zip((*self.buckets, float("inf")), s):
+                acc += n
+                le = 'le="' + _fmt_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {acc}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {s[-1]!r}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {acc}")
+        return lines
+
+
+class Gauge:
+    """増減するだけの値（イベントループ上でだけ更新する想定なのでロック無し）"""
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self) -> None:
+        self.value += 1
+
+    def dec(self) -> None:
+        self.value -= 1
+
+    def render(self) -> List[str]:
+        return render_samples(self.name, self.help, "gauge", [((), self.value)])
+
+
+def render_samples(
+    name: str,
+    help: str,
+    kind: str,
+    samples: Iterable[Tuple[Sequence[Tuple[str, str]], float]],
+) -> List[str]:
+    """出力時に集める値（プールの状態・キャッシュ統計など）を1指標ぶん書き出す"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        names = [k for k, _ in labels]
+        values = [v for _, v in labels]
+        lines.append(f"{name}{_fmt_labels(names, values)} {_fmt_value(value)}")
+    return lines
+
+
+# ---- ワーカー単位で共有する指標 -------------------------------------------------
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round-trip latency by client",
+    ("client",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2),
+)
+
+
+def metrics_enabled() -> bool:
+    return METRICS_ENABLED
+
+
+def metrics_token_matches(token: str) -> bool:
+    """METRICS_TOKEN と一致するか（未設定なら常に False。比較は定数時間）"""
+    return bool(METRICS_TOKEN) and hmac.compare_digest(token.encode("utf-8"), METRICS_TOKEN.encode("utf-8"))
+
+
+def observe_request(method: str, route: Optional[str], status: int, elapsed: float) -> None:
+    http_request_duration.observe(elapsed, method, route or "<unmatched>", str(status))
@@ -1,19 +1,125 @@
 from __future__ import annotations
+import logging
+import os
+import random
+import time
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from starlette.responses import Response
+from typing import Dict, Optional
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import http_requests_in_flight, metrics_enabled, observe_request
+
+logger = logging.getLogger("app.access")
+
+# 1=ON で1リクエスト1行のアクセスログ（method / 経路テンプレート / status / 所要ms / bytes）
+ACCESS_LOG_ENABLED = os.getenv("ACCESS_LOG_ENABLED", "1") == "1"
+# リクエスト詳細（クエリ・主なヘッダ）を出す割合。既定 0=出さない
+ACCESS_LOG_DETAIL_RATE = float(os.getenv("ACCESS_LOG_DETAIL_RATE", "0"))
+# 経路テンプレートごとの割合（例: "/shelters=0.01,/users/me=1"）。指定があればこちらを優先
+ACCESS_LOG_DETAIL_ROUTES = os.getenv("ACCESS_LOG_DETAIL_ROUTES", "")
+
+# アクセスログを出さない経路（ヘルスチェック・メトリクス収集などのノイズ）
+SKIP_PATHS = frozenset({"/system/health", "/system/metrics"})
+# 所要時間ヒストグラム・処理中リクエスト数に含めない経路（接続を張り続ける SSE。分単位の値で p95 を歪めるため）
+UNTIMED_PATHS = frozenset({"/shelters/stream"})
+# 詳細ログでも出さないヘッダ（資格情報）
+_SECRET_HEADERS = frozenset({b"authorization", b"cookie", b"x-id-token"})
+
+
+def parse_route_rates(spec: str) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for part in spec.split(","):
+        path, sep, rate = part.strip().rpartition("=")
+        if sep and path:
+            try:
+                rates[path] = float(rate)
+            except ValueError:
+                continue
+    return rates
+
+
+def route_template(scope: Scope) -> Optional[str]:
+    """ルーティング後に決まる経路テンプレート（例: /shelters/{shelter_id}）。未一致なら None"""
+    route = scope.get("route")
+    return getattr(route, "path", None)
+
+
+class RequestContextMiddleware:
     """
-    各リクエストに trace_id を付与し、レスポンスヘッダ x-trace-id にも出す。
+    素の ASGI ミドルウェア（BaseHTTPMiddleware のタスク・ストリーム包みを通さない）。
+    - 各リクエストに trace_id を付与し（request.state.trace_id）、レスポンスヘッダ x-trace-id にも出す
+    - 終了時にアクセスログを1行だけ出す。ヘッダの辞書化は詳細ログを出すときだけ
+    - 同じ計測値で経路テンプレート別の所要時間ヒストグラムと処理中リクエスト数も更新する（SSE は除く）
     """
-    def __init__(self, app: ASGIApp) -> None:
-        super().__init__(app)
 
-    async def dispatch(self, request, call_next):
+    def __init__(
+        self,
+        app: ASGIApp,
+        detail_rate: float = ACCESS_LOG_DETAIL_RATE,
+        detail_routes: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.app = app
+        self.detail_rate = detail_rate
+        self.detail_routes = parse_route_rates(ACCESS_LOG_DETAIL_ROUTES) if detail_routes is None else detail_routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         trace_id = uuid.uuid4().hex
-        request.state.trace_id = trace_id
-        response: Response = await call_next(request)
-        response.headers["x-trace-id"] = trace_id
-        return response
+        scope.setdefault("state", {})["trace_id"] = trace_id
+        trace_header = (b"x-trace-id", trace_id.encode("ascii"))
+        start = time.perf_counter()
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), trace_header]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        metrics = metrics_enabled() and scope["path"] not in UNTIMED_PATHS
+        if metrics:
+            http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            if metrics:
+                http_requests_in_flight.dec()
+                observe_request(scope["method"], route_template(scope), status, elapsed)
+            if ACCESS_LOG_ENABLED and scope["path"] not in SKIP_PATHS:
+                self._log(scope, trace_id, status, sent, elapsed)
+
+    def _log(self, scope: Scope, trace_id: str, status: int, sent: int, elapsed: float) -> None:
+        template = route_template(scope)
+        logger.info({
+            "event": "access",
+            "method": scope["method"],
+            "path": template or scope["path"],
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 1),
+            "bytes": sent,
+            "trace_id": trace_id,
+        })
+        rate = self.detail_routes.get(template, self.detail_rate) if template else self.detail_rate
+        if rate > 0 and (rate >= 1 or random.random() < rate):
+            headers = {
+                k.decode("latin-1"): v.decode("latin-1")
+                for k, v in scope["headers"] if k not in _SECRET_HEADERS
+            }
+            client = scope.get("client")
+            logger.info({
+                "event": "request_detail",
+                "trace_id": trace_id,
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "client": client[0] if client else None,
+                "headers": headers,
+            })
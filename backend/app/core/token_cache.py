@@ -0,0 +1,94 @@
+# backend/app/core/token_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# 1=ON で検証済み ID トークンを exp まで覚える（既定 ON。失効チェックなしの SDK 既定と同じ意味）
+AUTH_TOKEN_CACHE_ENABLED = os.getenv("AUTH_TOKEN_CACHE_ENABLED", "1") == "1"
+# 保持するトークン数の上限（超えたら最も使われていないものから捨てる）
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+# 1=ON で失効（revoke）も確認する。その場合キャッシュは AUTH_REVOKED_RECHECK_SEC 秒で再検証
+AUTH_CHECK_REVOKED = os.getenv("AUTH_CHECK_REVOKED", "0") == "1"
+AUTH_REVOKED_RECHECK_SEC = float(os.getenv("AUTH_REVOKED_RECHECK_SEC", "300"))
+
+
+class VerifiedTokenCache:
+    """
+    検証済みトークン → 正規化済みペイロード の LRU + TTL。
+    - キーはトークンの SHA-256（生トークンはメモリに残さない）
+    - 期限はトークンの exp（失効チェック時は AUTH_REVOKED_RECHECK_SEC で頭打ち）
+    - exp の無いペイロードは覚えない
+    """
+
+    def __init__(self, maxsize: int = AUTH_TOKEN_CACHE_SIZE, max_ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self.key_for(token)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def set(self, token: str, payload: Dict[str, Any], exp: Any) -> None:
+        if not exp or self.maxsize <= 0:
+            return
+        expires_at = float(exp)
+        if self.max_ttl is not None:
+            expires_at = min(expires_at, time.time() + self.max_ttl)
+        if expires_at <= time.time():
+            return
+        key = self.key_for(token)
+        with self._lock:
+            self._data[key] = (expires_at, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+# ワーカー単位で共有するインスタンス
+token_cache = VerifiedTokenCache(max_ttl=AUTH_REVOKED_RECHECK_SEC if AUTH_CHECK_REVOKED else None)
+
+
+def token_cache_enabled() -> bool:
+    return AUTH_TOKEN_CACHE_ENABLED
@@ -0,0 +1,182 @@
+# backend/app/core/user_cache.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# 1=ON で firebase_uid → ユーザー（id/email/plan）をワーカー内に覚える（既定 ON）
+AUTH_USER_CACHE_ENABLED = os.getenv("AUTH_USER_CACHE_ENABLED", "1") == "1"
+# 秒。plan 変更などの反映はこの時間まで遅れうる（自ワーカー内の更新は即時に無効化）
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+# 1=ON でワーカー間共有の2段目として Redis も使う（無効化も全ワーカーに効く）
+AUTH_USER_CACHE_REDIS = os.getenv("AUTH_USER_CACHE_REDIS", "0") == "1"
+
+# FastAPILimiter / shelter_cache と同じ Redis を使う
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+KEY_PREFIX = "auth:user"
+
+# Redis 障害時はしばらく問い合わせない
+_BACKOFF_SEC = 30.0
+
+
+@dataclass(frozen=True)
+class UserRecord:
+    """認証済みリクエストで使う軽量なユーザー情報（ORM User の代わりに依存から渡す）"""
+    id: uuid.UUID
+    firebase_uid: str
+    email: Optional[str]
+    plan: str
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "UserRecord":
+        uid = row["id"]
+        return cls(
+            id=uid if isinstance(uid, uuid.UUID) else uuid.UUID(str(uid)),
+            firebase_uid=row["firebase_uid"],
+            email=row.get("email"),
+            plan=str(row.get("plan") or "free"),
+        )
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "id": str(self.id)}, separators=(",", ":"))
+
+
+class UserRecordCache:
+    """
+    firebase_uid → UserRecord の TTL + LRU（ワーカー内）。任意で Redis を2段目にする。
+    - 見つかった（登録済みの）ユーザーだけを覚える
+    - ユーザー情報を更新した側は invalidate(uid) を呼ぶ
+    """
+
+    def __init__(
+        self,
+        maxsize: int = AUTH_USER_CACHE_SIZE,
+        ttl: float = AUTH_USER_CACHE_TTL,
+        use_redis: bool = AUTH_USER_CACHE_REDIS,
+        url: str = REDIS_URL,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self.url = url
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.errors = 0
+        self._data: "OrderedDict[str, Tuple[float, UserRecord]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._client: Optional[redis.Redis] = None
+        self._down_until = 0.0
+
+    # ---- Redis ------------------------------------------------------------
+    def _redis(self) -> Optional[redis.Redis]:
+        if not self.use_redis or time.monotonic() < self._down_until:
+            return None
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(
+                        self.url, socket_timeout=0.2, socket_connect_timeout=0.2,
+                    )
+        return self._client
+
+    def _failed(self, e: Exception) -> None:
+        self.errors += 1
+        self._down_until = time.monotonic() + _BACKOFF_SEC
+        logger.warning({"event": "user_cache_error", "error": str(e)})
+
+    # ---- 読み書き ---------------------------------------------------------
+    def _put_local(self, firebase_uid: str, record: UserRecord) -> None:
+        with self._lock:
+            self._data[firebase_uid] = (time.monotonic() + self.ttl, record)
+            self._data.move_to_end(firebase_uid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, firebase_uid: str) -> Optional[UserRecord]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(firebase_uid)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(firebase_uid)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[firebase_uid]
+        r = self._redis()
+        if r is not None:
+            try:
+                raw = r.get(f"{KEY_PREFIX}:{firebase_uid}")
+            except redis.RedisError as e:
+                self._failed(e)
+                raw = None
+            if raw is not None:
+                try:
+                    record = UserRecord.from_row(json.loads(raw))
+                except (ValueError, KeyError, TypeError):
+                    record = None
+                if record is not None:
+                    self._put_local(firebase_uid, record)
+                    self.redis_hits += 1
+                    return record
+        self.misses += 1
+        return None
+
+    def set(self, record: UserRecord) -> None:
+        if self.maxsize <= 0:
+            return
+        self._put_local(record.firebase_uid, record)
+        r = self._redis()
+        if r is not None:
+            try:
+                r.set(f"{KEY_PREFIX}:{record.firebase_uid}", record.to_json(), ex=int(self.ttl))
+            except redis.RedisError as e:
+                self._failed(e)
+
+    def invalidate(self, firebase_uid: Optional[str]) -> None:
+        if not firebase_uid:
+            return
+        with self._lock:
+            self._data.pop(firebase_uid, None)
+        r = self._redis()
+        if r is not None:
+            try:
+                r.delete(f"{KEY_PREFIX}:{firebase_uid}")
+            except redis.RedisError as e:
+                self._failed(e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.redis_hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": ((self.hits + self.redis_hits) / total) if total else 0.0,
+        }
+
+
+# ワーカー単位で共有するインスタンス
+user_cache = UserRecordCache()
+
+
+def user_cache_enabled() -> bool:
+    return AUTH_USER_CACHE_ENABLED
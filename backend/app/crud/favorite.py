@@ -30,8 +30,8 @@ def list_user_favorites_with_shelter(db: Session, user_id: str) -> List[Dict[str
             s.name,
             s.address,
             s.type::text AS type,
-            ST_Y(s.geom::geometry) AS lat,
-            ST_X(s.geom::geometry) AS lng
+            s.lat,
+            s.lng
         FROM favorites f
         JOIN shelters s ON s.id = f.shelter_id
         WHERE f.user_id = :uid
@@ -1,10 +1,93 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import base64
+import json
+import unicodedata
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.models.shelter import ShelterCapability
+
+# 部分 GiST 索引（migration a8）があるビット。索引と同じ形の述語を添えるとプランナが選べる
+INDEXED_CAPABILITIES = (ShelterCapability.pet_space, ShelterCapability.flood)
+
+
+def normalize_shelter_type(type: Optional[str]) -> Optional[str]:
+    """日本語の種別表記を Enum 値（companion/accompany）に正規化"""
+    if type in ["同伴", "同伴避難", "同伴可"]:
+        return "companion"
+    if type in ["同行", "同行避難", "同行可"]:
+        return "accompany"
+    return type
+
+
+# ひらがな → カタカナ（DB 関数 shelter_search_normalize と同じ規則）
+_KANA_TABLE = {c: c + 0x60 for c in range(0x3041, 0x3097)}
+
+
+def normalize_search_text(s: str) -> str:
+    """検索語の正規化: NFKC（全角/半角の統一）→ ひらがなをカタカナへ → 小文字化"""
+    return unicodedata.normalize("NFKC", s).translate(_KANA_TABLE).lower()
+
+
+def sort_kind(
+    lat: Optional[float], lng: Optional[float], q: Optional[str], sort: Optional[str] = None,
+) -> Optional[str]:
+    """
+    並び順の種類: "d"=距離順 / "s"=類似度順（キーワードのみ） / "n"=名称順
+    sort="none" は並べ替えなし（None。地図ピン描画用でカーソルも使えない）
+    sort="recommended" はスコア順（None。候補数が限られるのでカーソルは使わない）
+    """
+    if sort in ("none", "recommended"):
+        return None
+    if lat is not None and lng is not None:
+        return "d"
+    return "s" if q else "n"
+
+
+_SORT_VALUE_KEY = {"d": "distance_m", "s": "similarity", "n": "name"}
+
+# 一覧の距離は球面距離（PostGIS の use_spheroid=false。半径は WGS84 の (2a+b)/3）。
+# インメモリ索引（services.shelter_index）も同じ球面で計るので、どちらの経路でも半径の境目・距離順・カーソルがそろう
+SPHERE_RADIUS_M = (2 * 6378137.0 + 6356752.314245179) / 3
+# 距離カーソルの比較で同じ距離とみなす幅（m）。計算式の違いによる浮動小数点の誤差を吸収する
+CURSOR_DISTANCE_EPS_M = 1e-6
+
+
+def encode_cursor(kind: str, value: Any, shelter_id: str) -> str:
+    """
+    keyset ページング用の不透明カーソル。
+      kind: "d"=距離順（value=distance_m） / "s"=類似度順（value=similarity） / "n"=名称順（value=name）
+    """
+    raw = json.dumps({"k": kind, "v": value, "id": shelter_id}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any, str]:
+    """encode_cursor の逆。壊れたカーソルは ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        kind, value, sid = data["k"], data["v"], str(uuid.UUID(str(data["id"])))
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if kind in ("d", "s") and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return kind, float(value), sid
+    if kind == "n" and isinstance(value, str):
+        return kind, value, sid
+    raise ValueError("invalid cursor")
+
+
+def next_cursor_for(items: List[Dict[str, Any]], limit: int, kind: Optional[str]) -> Optional[str]:
+    """ページが埋まっていれば末尾行から次ページのカーソルを作る（kind は sort_kind の値）"""
+    if kind is None or len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(kind, last[_SORT_VALUE_KEY[kind]], last["id"])
+
 
 def get_shelters(
     db: Session,
@@ -16,24 +99,39 @@ def get_shelters(
     q: Optional[str],
     limit: int,
     offset: int,
+    cursor: Optional[str] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    sort: Optional[str] = None,
+    capabilities: int = 0,
 ) -> List[Dict[str, Any]]:
     """
     避難所一覧取得:
       - type: 種別フィルタ（companion/accompany）
       - crowd_level: 混雑度フィルタ（low/medium/high など任意の文字列）
-      - q   : 名称/住所の部分一致（ILIKE）
+      - q   : 名称/読み/住所のあいまい検索（正規化 + pg_trgm）。位置未指定時は類似度順
       - lat/lng: 位置があれば ST_DWithin で半径抽出し、近い順で並べる
       - limit/offset: 軽量ページング
+      - cursor: 指定時は (distance_m, id) / (similarity, id) / (name, id) の keyset で続きを取得（offset は無視）
+      - bbox: (min_lng, min_lat, max_lng, max_lat)。geom && envelope（GiST）で表示範囲を抽出。
+              指定時は半径では絞らず、lat/lng は距離順のためだけに使う
+      - sort: "none" で並べ替え・距離計算を省略（地図ピン描画用）
+      - capabilities: ShelterCapability のビット和。すべて満たす避難所だけに絞る
     """
 
     # ✅ 追加: 日本語→英語Enum正規化
-    if type in ["同伴", "同伴避難", "同伴可"]:
-        type = "companion"
-    elif type in ["同行", "同行避難", "同行可"]:
-        type = "accompany"
+    type = normalize_shelter_type(type)
+    kind = sort_kind(lat, lng, q, sort)
+    located = kind == "d"
 
     params: Dict[str, Any] = {"limit": limit, "offset": offset}
-    sql = """
+    distance_col = ""
+    if located:
+        distance_col = """,
+            ST_Distance(geom, ST_MakePoint(:lng, :lat)::geography, false) AS distance_m"""
+    elif kind == "s":
+        distance_col = """,
+            word_similarity(:kw_norm, search_text)::float8 AS similarity"""
+    sql = f"""
         SELECT
             id::text AS id,
             name,
@@ -41,8 +139,8 @@ def get_shelters(
             type::text AS type,
             capacity,
             crowd_level,
-            ST_Y(geom::geometry) AS lat,
-            ST_X(geom::geometry) AS lng
+            lat,
+            lng{distance_col}
         FROM shelters
         WHERE 1=1
     """
@@ -52,32 +150,74 @@ def get_shelters(
         params["type"] = type
 
     if q:
-        sql += " AND (name ILIKE :kw OR address ILIKE :kw)"
-        params["kw"] = f"%{q}%"
+        # search_text は正規化済みの生成列（GIN gin_trgm_ops）。部分一致 or 語類似度で拾う
+        kw_norm = normalize_search_text(q)
+        sql += " AND (search_text LIKE :kw OR :kw_norm <% search_text)"
+        params.update({"kw": f"%{kw_norm}%", "kw_norm": kw_norm})
 
     if crowd_level:
         sql += " AND crowd_level = :crowd_level"
         params["crowd_level"] = crowd_level
 
-    # 既定は名称昇順（位置未指定時）
-    order_clause = " ORDER BY name"
+    if capabilities:
+        # ビット述語1つで絞る（mask は Enum 由来の整数なので定数として埋め込む）
+        mask = int(capabilities)
+        sql += f" AND (capabilities & {mask}) = {mask}"
+        for bit in INDEXED_CAPABILITIES:
+            if mask & bit and mask != bit:
+                sql += f" AND (capabilities & {int(bit)}) = {int(bit)}"
 
-    if lat is not None and lng is not None:
+    # 既定は名称昇順（位置未指定時）。id を第2キーにして順序を安定させる
+    # COLLATE "C" = コードポイント順。DB の照合順序に依らず、インメモリ索引・カーソルと同じ並びにする
+    order_clause = ' ORDER BY name COLLATE "C", id'
+    if kind == "s":
+        # キーワードのみのときは類似度の高い順
+        order_clause = " ORDER BY similarity DESC, id"
+
+    if bbox is not None:
+        sql += " AND geom && ST_MakeEnvelope(:min_lng, :min_lat, :max_lng, :max_lat, 4326)::geography"
+        params.update(dict(zip(("min_lng", "min_lat", "max_lng", "max_lat"), bbox)))
+
+    if kind is None:
+        order_clause = ""
+
+    if located:
+        params.update({"lat": lat, "lng": lng})
+        # 位置が指定されたときは「距離の近い順」
+        order_clause = " ORDER BY distance_m ASC, id"
+
+    if lat is not None and lng is not None and bbox is None:
         sql += """
             AND ST_DWithin(
                 geom,
                 ST_MakePoint(:lng, :lat)::geography,
-                :dist_m
+                :dist_m,
+                false
             )
         """
         params.update({"lat": lat, "lng": lng, "dist_m": float(radius_km) * 1000.0})
-        # 位置が指定されたときは「距離の近い順」
-        order_clause = """
-            ORDER BY ST_Distance(
-                geom,
-                ST_MakePoint(:lng, :lat)::geography
-            ) ASC
-        """
+
+    if cursor:
+        c_kind, value, cursor_id = decode_cursor(cursor)
+        if kind is None or c_kind != kind:
+            raise ValueError("cursor does not match sort order")
+        # 直前ページの末尾より後ろへシーク（OFFSET で読み捨てない）
+        if located:
+            # 誤差幅内は同じ距離として id で比べる（索引が作ったカーソルでも末尾行を重複・欠落させない）
+            sql += """
+                AND (ST_Distance(geom, ST_MakePoint(:lng, :lat)::geography, false) > :c_value + :c_eps
+                     OR (ST_Distance(geom, ST_MakePoint(:lng, :lat)::geography, false) >= :c_value - :c_eps
+                         AND id > CAST(:c_id AS uuid)))
+            """
+            params["c_eps"] = CURSOR_DISTANCE_EPS_M
+        elif kind == "s":
+            sql += """
+                AND (word_similarity(:kw_norm, search_text)::float8 < :c_value
+                     OR (word_similarity(:kw_norm, search_text)::float8 = :c_value AND id > CAST(:c_id AS uuid)))
+            """
+        else:
+            sql += ' AND (name COLLATE "C", id) > (:c_value, CAST(:c_id AS uuid))'
+        params.update({"c_value": value, "c_id": cursor_id, "offset": 0})
 
     sql += f"{order_clause} LIMIT :limit OFFSET :offset"
 
@@ -85,6 +225,121 @@ def get_shelters(
     return [dict(row) for row in rows]
 
 
+# sort=recommended の重み（合計 1.0）。各要素は 0..1 に正規化してから掛ける
+RECOMMEND_WEIGHTS = {"distance": 0.45, "crowd": 0.30, "capacity": 0.10, "hazard": 0.15}
+# この収容人数以上は capacity 要素を満点にする
+RECOMMEND_CAPACITY_REF = 300
+# KNN で取る候補数（limit + offset の何倍か・上限）
+RECOMMEND_CANDIDATE_FACTOR = 5
+RECOMMEND_MAX_CANDIDATES = 500
+
+
+def get_recommended_shelters(
+    db: Session,
+    lat: float,
+    lng: float,
+    radius_km: float,
+    limit: int,
+    offset: int = 0,
+    type: Optional[str] = None,
+    crowd_level: Optional[str] = None,
+    q: Optional[str] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    capabilities: int = 0,
+    hazard: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    おすすめ順（sort=recommended）:
+      1. 距離順の KNN（geom <-> 点, GiST）で近い候補だけを取り出す
+      2. 候補に対して1回の SQL でスコアを付け、高い順に返す
+    スコア = Σ 重み × 要素（0..1）
+      - distance: 半径の端で 0、中心で 1
+      - crowd   : empty=1 / few=0.5 / full=0。未設定なら latest_congestion(%) から、それも無ければ 0.5
+      - capacity: RECOMMEND_CAPACITY_REF 人で頭打ち
+      - hazard  : hazard（ビット和）をすべて満たせば 1、満たさなければ 0（未指定なら全件 1）
+    hazard は絞り込みではなくスコアに使う（対応外でも近ければ候補に残す）。capabilities は絞り込み。
+    """
+    type = normalize_shelter_type(type)
+    dist_m = max(float(radius_km) * 1000.0, 1.0)
+    candidates = min((limit + offset) * RECOMMEND_CANDIDATE_FACTOR, RECOMMEND_MAX_CANDIDATES)
+    params: Dict[str, Any] = {
+        "lat": lat, "lng": lng, "dist_m": dist_m, "candidates": max(candidates, limit + offset),
+        "limit": limit, "offset": offset, "hazard": int(hazard), "cap_ref": float(RECOMMEND_CAPACITY_REF),
+    }
+    params.update({f"w_{k}": v for k, v in RECOMMEND_WEIGHTS.items()})
+
+    where = ""
+    if type:
+        where += " AND type = :type"
+        params["type"] = type
+    if crowd_level:
+        where += " AND crowd_level = :crowd_level"
+        params["crowd_level"] = crowd_level
+    if q:
+        kw_norm = normalize_search_text(q)
+        where += " AND (search_text LIKE :kw OR :kw_norm <% search_text)"
+        params.update({"kw": f"%{kw_norm}%", "kw_norm": kw_norm})
+    if capabilities:
+        mask = int(capabilities)
+        where += f" AND (capabilities & {mask}) = {mask}"
+    if bbox is not None:
+        where += " AND geom && ST_MakeEnvelope(:min_lng, :min_lat, :max_lng, :max_lat, 4326)::geography"
+        params.update(dict(zip(("min_lng", "min_lat", "max_lng", "max_lat"), bbox)))
+    else:
+        where += " AND ST_DWithin(geom, ST_MakePoint(:lng, :lat)::geography, :dist_m)"
+
+    sql = f"""
+        WITH candidates AS (
+            SELECT
+                id, name, address, type, capacity, crowd_level, latest_congestion, capabilities, lat, lng,
+                ST_Distance(geom, ST_MakePoint(:lng, :lat)::geography) AS distance_m
+            FROM shelters
+            WHERE 1=1 {where}
+            ORDER BY geom <-> ST_MakePoint(:lng, :lat)::geography
+            LIMIT :candidates
+        ), scored AS (
+            SELECT
+                c.*,
+                greatest(0.0, 1.0 - c.distance_m / :dist_m) AS s_distance,
+                CASE c.crowd_level
+                    WHEN 'empty' THEN 1.0
+                    WHEN 'few' THEN 0.5
+                    WHEN 'full' THEN 0.0
+                    ELSE coalesce(1.0 - least(greatest(c.latest_congestion, 0), 100) / 100.0, 0.5)
+                END AS s_crowd,
+                least(coalesce(c.capacity, 0) / :cap_ref, 1.0) AS s_capacity,
+                CASE WHEN (c.capabilities & :hazard) = :hazard THEN 1.0 ELSE 0.0 END AS s_hazard
+            FROM candidates c
+        )
+        SELECT
+            id::text AS id,
+            name,
+            address,
+            type::text AS type,
+            capacity,
+            crowd_level,
+            lat,
+            lng,
+            distance_m,
+            (:w_distance * s_distance + :w_crowd * s_crowd
+             + :w_capacity * s_capacity + :w_hazard * s_hazard)::float8 AS score,
+            s_distance::float8 AS s_distance,
+            s_crowd::float8 AS s_crowd,
+            s_capacity::float8 AS s_capacity,
+            s_hazard::float8 AS s_hazard
+        FROM scored
+        ORDER BY score DESC, distance_m, id
+        LIMIT :limit OFFSET :offset
+    """
+    items = []
+    for row in db.execute(text(sql), params).mappings().all():
+        item = dict(row)
+        item["score_breakdown"] = {k: round(item.pop(f"s_{k}"), 4) for k in RECOMMEND_WEIGHTS}
+        item["score"] = round(item["score"], 4)
+        items.append(item)
+    return items
+
+
 def get_shelter_by_id(db: Session, shelter_id: str) -> Optional[Dict[str, Any]]:
     """
     避難所詳細取得（存在しない場合は None）
@@ -97,11 +352,339 @@ def get_shelter_by_id(db: Session, shelter_id: str) -> Optional[Dict[str, Any]]:
             type::text AS type,
             capacity,
             crowd_level,
-            ST_Y(geom::geometry) AS lat,
-            ST_X(geom::geometry) AS lng
+            lat,
+            lng
         FROM shelters
         WHERE id = :id
         LIMIT 1
     """
     row = db.execute(text(sql), {"id": shelter_id}).mappings().first()
     return dict(row) if row else None
+
+
+def get_shelters_by_ids(db: Session, shelter_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    複数 ID の詳細を1クエリ（id = ANY）で取得し {id: 行} で返す（見つからない ID は含まれない）。
+    ID は小文字ハイフン区切りの UUID 文字列で渡すこと。
+    """
+    if not shelter_ids:
+        return {}
+    sql = """
+        SELECT
+            id::text AS id,
+            name,
+            address,
+            type::text AS type,
+            capacity,
+            crowd_level,
+            lat,
+            lng
+        FROM shelters
+        WHERE id = ANY(CAST(:ids AS uuid[]))
+    """
+    rows = db.execute(text(sql), {"ids": list(shelter_ids)}).mappings().all()
+    return {row["id"]: dict(row) for row in rows}
+
+
+# クラスタ件数の上限（極端に広い bbox で応答が肥大化しないように）
+MAX_CLUSTERS = 2000
+
+
+def get_shelter_clusters(
+    db: Session,
+    min_lat: float,
+    min_lng: float,
+    max_lat: float,
+    max_lng: float,
+    cell_deg: float,
+    type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    bbox 内の避難所を cell_deg 度のグリッド（ST_SnapToGrid）で集約する。
+      - geom && envelope で GiST 索引を使って範囲を絞る
+      - 重心は平均座標、混雑度は crowd_level ごとの件数
+    """
+    type = normalize_shelter_type(type)
+    params: Dict[str, Any] = {
+        "min_lat": min_lat, "min_lng": min_lng, "max_lat": max_lat, "max_lng": max_lng,
+        "cell": cell_deg, "max_clusters": MAX_CLUSTERS,
+    }
+    sql = """
+        SELECT
+            avg(lat) AS lat,
+            avg(lng) AS lng,
+            count(*) AS count,
+            count(*) FILTER (WHERE crowd_level::text = 'empty') AS empty,
+            count(*) FILTER (WHERE crowd_level::text = 'few') AS few,
+            count(*) FILTER (WHERE crowd_level::text = 'full') AS full,
+            count(*) FILTER (WHERE crowd_level IS NULL) AS unknown,
+            CASE WHEN count(*) = 1 THEN min(id::text) END AS shelter_id
+        FROM shelters
+        WHERE geom && ST_MakeEnvelope(:min_lng, :min_lat, :max_lng, :max_lat, 4326)::geography
+    """
+    if type:
+        sql += " AND type = :type"
+        params["type"] = type
+    sql += """
+        GROUP BY ST_SnapToGrid(geom::geometry, :cell)
+        ORDER BY count DESC
+        LIMIT :max_clusters
+    """
+    rows = db.execute(text(sql), params).mappings().all()
+    return [
+        {
+            "lat": r["lat"],
+            "lng": r["lng"],
+            "count": r["count"],
+            "crowd": {k: r[k] for k in ("empty", "few", "full", "unknown")},
+            "shelter_id": r["shelter_id"],
+        }
+        for r in rows
+    ]
+
+
+def get_nearest_shelters_batch(
+    db: Session,
+    points: List[Tuple[float, float]],
+    k: int,
+    type: Optional[str] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    複数地点それぞれの近傍 k 件を1クエリで取得（LATERAL + geom <-> point の KNN、GiST 索引を使用）。
+    points は (lat, lng) のリスト。戻り値は points と同じ順のリスト。
+    """
+    type = normalize_shelter_type(type)
+    params: Dict[str, Any] = {
+        "lats": [p[0] for p in points],
+        "lngs": [p[1] for p in points],
+        "k": k,
+    }
+    type_clause = ""
+    if type:
+        type_clause = "WHERE s.type = :type"
+        params["type"] = type
+
+    sql = f"""
+        SELECT
+            p.idx AS idx,
+            n.id, n.name, n.address, n.type, n.capacity, n.crowd_level, n.lat, n.lng, n.distance_m
+        FROM unnest(CAST(:lats AS float8[]), CAST(:lngs AS float8[])) WITH ORDINALITY AS p(lat, lng, idx)
+        CROSS JOIN LATERAL (
+            SELECT
+                s.id::text AS id,
+                s.name,
+                s.address,
+                s.type::text AS type,
+                s.capacity,
+                s.crowd_level,
+                s.lat,
+                s.lng,
+                ST_Distance(s.geom, ST_MakePoint(p.lng, p.lat)::geography) AS distance_m
+            FROM shelters s
+            {type_clause}
+            ORDER BY s.geom <-> ST_MakePoint(p.lng, p.lat)::geography
+            LIMIT :k
+        ) n
+        ORDER BY p.idx, n.distance_m
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in points]
+    for row in db.execute(text(sql), params).mappings().all():
+        item = dict(row)
+        results[int(item.pop("idx")) - 1].append(item)
+    return results
+
+
+def get_data_version(db: Session) -> Tuple[int, Any]:
+    """避難所データ版（version, updated_at）。行が無い環境では (0, None)"""
+    row = db.execute(
+        text("SELECT version, updated_at FROM shelters_data_version WHERE id = 1")
+    ).first()
+    return (int(row[0]), row[1]) if row else (0, None)
+
+
+def bump_data_version(db: Any) -> Tuple[int, Any]:
+    """
+    避難所データを書き換えた処理と同じトランザクション内で呼ぶ（Session / Connection どちらも可）。
+    コミットされて初めて他のリクエストから見える。
+    """
+    row = db.execute(text("""
+        UPDATE shelters_data_version
+        SET version = version + 1, updated_at = now()
+        WHERE id = 1
+        RETURNING version, updated_at
+    """)).first()
+    return (int(row[0]), row[1]) if row else (0, None)
+
+
+def update_crowd_levels(db: Session, updates: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    {shelter_id: level} を1本の UPDATE ... FROM (VALUES ...) で反映し（履歴にも追記）、
+    更新できた {id: {crowd_level, lat, lng}} を返す（lat/lng は配信の bbox 絞り込み用）。
+    UUID として不正な id は問い合わせずに除外（呼び出し側で not_found 扱い）。commit は呼び出し側。
+    """
+    params: Dict[str, Any] = {}
+    values: List[str] = []
+    for i, (shelter_id, level) in enumerate(updates.items()):
+        try:
+            uuid.UUID(str(shelter_id))
+        except ValueError:
+            continue
+        params[f"id{i}"] = str(shelter_id)
+        params[f"lv{i}"] = level
+        values.append(f"(CAST(:id{i} AS uuid), CAST(:lv{i} AS text))")
+    if not values:
+        return {}
+
+    # 同じ文の中で履歴（shelter_crowd_observations）にも追記する
+    sql = f"""
+        WITH updated AS (
+            UPDATE shelters AS s
+            SET crowd_level = v.level
+            FROM (VALUES {", ".join(values)}) AS v(id, level)
+            WHERE s.id = v.id
+            RETURNING s.id, s.crowd_level, s.lat, s.lng
+        ), observed AS (
+            INSERT INTO shelter_crowd_observations (shelter_id, crowd_level)
+            SELECT id, crowd_level FROM updated
+        )
+        SELECT
+            id::text AS id,
+            crowd_level,
+            lat,
+            lng
+        FROM updated
+    """
+    rows = db.execute(text(sql), params).mappings().all()
+    return {row["id"]: {k: row[k] for k in ("crowd_level", "lat", "lng")} for row in rows}
+
+
+# 1回の履歴取得で返すバケット数の上限
+MAX_HISTORY_BUCKETS = 2000
+
+
+def get_crowd_history(
+    db: Session,
+    shelter_id: str,
+    since: Any,
+    until: Any,
+    bucket_minutes: int,
+) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    混雑度履歴を date_bin でバケット化して返す（生の行は Python に持ち込まない）。
+    戻り値: (期間開始時点の混雑度, [{start, observations, empty, few, full, last_level}])
+    観測の無いバケットは返さない（直前の last_level が続いているとみなす）。
+    """
+    params = {"id": shelter_id, "since": since, "until": until, "bucket": f"{int(bucket_minutes)} minutes"}
+    initial = db.execute(text("""
+        SELECT crowd_level
+        FROM shelter_crowd_observations
+        WHERE shelter_id = CAST(:id AS uuid) AND observed_at < :since
+        ORDER BY observed_at DESC
+        LIMIT 1
+    """), params).scalar()
+
+    rows = db.execute(text("""
+        SELECT
+            date_bin(CAST(:bucket AS interval), observed_at, CAST(:since AS timestamptz)) AS start,
+            count(*)::int AS observations,
+            count(*) FILTER (WHERE crowd_level = 'empty')::int AS empty,
+            count(*) FILTER (WHERE crowd_level = 'few')::int AS few,
+            count(*) FILTER (WHERE crowd_level = 'full')::int AS full,
+            (array_agg(crowd_level ORDER BY observed_at DESC, id DESC))[1] AS last_level
+        FROM shelter_crowd_observations
+        WHERE shelter_id = CAST(:id AS uuid)
+          AND observed_at >= :since
+          AND observed_at < :until
+        GROUP BY 1
+        ORDER BY 1
+    """), params).mappings().all()
+    return initial, [dict(r) for r in rows]
+
+
+# オフライン用の列（GET /shelters/snapshot と GET /shelters/changes で共通。列指向 JSON の列順）
+OFFLINE_COLUMNS = [
+    "id", "name", "name_kana", "address", "phone", "website_url", "type", "capacity",
+    "crowd_level", "lat", "lng", "capabilities", "emergency_space_note", "notes",
+    "contact_hq", "source_asof_date", "pin_icon",
+]
+
+OFFLINE_SELECT = """
+    id::text AS id,
+    name,
+    name_kana,
+    address,
+    phone,
+    website_url,
+    type::text AS type,
+    capacity,
+    crowd_level::text AS crowd_level,
+    round(lat::numeric, 6)::float8 AS lat,
+    round(lng::numeric, 6)::float8 AS lng,
+    capabilities,
+    emergency_space_note,
+    notes,
+    contact_hq,
+    source_asof_date::text AS source_asof_date,
+    pin_icon
+"""
+
+# 実行中トランザクションの最小 xid。これ未満の change_version はすべて確定済み
+_SAFE_XID = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+
+def get_change_watermark(db: Session) -> int:
+    """
+    この値以下の変更は確定済み（スナップショット取得の直前に読み、changes?since= の起点にする）。
+    以降に読んだ行と重複して返ることはあるが、取りこぼしは起きない。
+    """
+    return int(db.execute(text(f"SELECT {_SAFE_XID} - 1")).scalar())
+
+
+def get_shelter_changes(db: Session, since: int, limit: int, watermark: Optional[int] = None) -> Dict[str, Any]:
+    """
+    change_version > since の upsert / 削除を古い順に返す（change_version 索引の範囲走査のみ）。
+    1トランザクションの変更は途中で切らないので、件数が limit をやや超えることがある。
+    watermark 未満の xid だけを返す。既定（None）は実行中トランザクションより前（確定済み）まで。
+    戻り値: {"next_since", "has_more", "upserted": [行dict], "deleted": [id]}
+    """
+    params: Dict[str, Any] = {"since": since, "limit": limit + 1}
+    upper = _SAFE_XID
+    if watermark is not None:
+        params["watermark"] = watermark
+        upper = ":watermark"
+    changes_union = f"""
+        SELECT change_version FROM shelters
+        WHERE change_version > :since AND change_version < {upper}
+        UNION ALL
+        SELECT change_version FROM shelter_tombstones
+        WHERE change_version > :since AND change_version < {upper}
+    """
+    versions = db.execute(
+        text(f"SELECT change_version FROM ({changes_union}) c ORDER BY change_version LIMIT :limit"),
+        params,
+    ).scalars().all()
+    if not versions:
+        return {"next_since": since, "has_more": False, "upserted": [], "deleted": []}
+
+    upto = versions[min(limit, len(versions)) - 1]
+    has_more = len(versions) > limit
+    params["upto"] = upto
+
+    upserted = db.execute(text(f"""
+        SELECT {OFFLINE_SELECT}
+        FROM shelters
+        WHERE change_version > :since AND change_version <= :upto
+        ORDER BY change_version, id
+    """), params).mappings().all()
+    deleted = db.execute(text("""
+        SELECT id::text
+        FROM shelter_tombstones
+        WHERE change_version > :since AND change_version <= :upto
+        ORDER BY change_version, id
+    """), params).scalars().all()
+    return {
+        "next_since": int(upto),
+        "has_more": has_more,
+        "upserted": [dict(r) for r in upserted],
+        "deleted": list(deleted),
+    }
@@ -0,0 +1,32 @@
+# app/crud/user.py
+from __future__ import annotations
+import uuid
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# 認証の毎リクエストで要るのはこれだけ（ORM User は更新するルートでだけ読む）
+USER_RECORD_SELECT = "id, firebase_uid, email, plan::text AS plan"
+
+
+def get_user_record(db: Session, firebase_uid: str) -> Optional[Dict[str, Any]]:
+    sql = text(f"SELECT {USER_RECORD_SELECT} FROM users WHERE firebase_uid = :uid")
+    row = db.execute(sql, {"uid": firebase_uid}).mappings().first()
+    return dict(row) if row else None
+
+
+def upsert_user(db: Session, firebase_uid: str, email: Optional[str]) -> Dict[str, Any]:
+    """
+    初回ログイン時の自動登録を1文で行う（commit まで実施）。
+    同じ uid の初回リクエストが同時に来ても一意制約違反にならず、どちらも同じ行を受け取る。
+    DO UPDATE は既存行を RETURNING で返すための no-op（DO NOTHING だと行が返らない）。
+    """
+    sql = text(f"""
+        INSERT INTO users (id, firebase_uid, email)
+        VALUES (CAST(:id AS uuid), :uid, :email)
+        ON CONFLICT (firebase_uid) DO UPDATE SET firebase_uid = EXCLUDED.firebase_uid
+        RETURNING {USER_RECORD_SELECT}
+    """)
+    row = db.execute(sql, {"id": str(uuid.uuid4()), "uid": firebase_uid, "email": email}).mappings().one()
+    db.commit()
+    return dict(row)
@@ -5,7 +5,7 @@ from app.db.base_class import Base  # Base 定義だけを持ち込む
 
 # ↓ Alembic のために全モデルを import（未使用でもOKにするため noqa）
 from app.models.user import User            # noqa: F401
-from app.models.shelter import Shelter      # noqa: F401
+from app.models.shelter import Shelter, ShelterDataVersion, ShelterCrowdObservation, ShelterTombstone  # noqa: F401
 from app.models.pet import Pet              # noqa: F401
 from app.models.favorite import Favorite    # noqa: F401
 from app.models.family import FamilyMember, FamilyCheckin  # noqa: F401
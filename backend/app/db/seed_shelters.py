@@ -5,6 +5,8 @@ from pathlib import Path
 from typing import Any, Dict, Optional
 from sqlalchemy import text
 from app.db.session import engine
+from app.crud.shelter import bump_data_version
+from app.services.shelter_cache import shelter_cache
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]   # .../backend
 DEFAULT_CSV = PROJECT_ROOT / "data" / "processed" / "fujisawa_shelters_with_geo.csv"
@@ -12,7 +14,7 @@ CSV_PATH = Path(os.getenv("CSV_PATH") or DEFAULT_CSV)
 
 SQL = text("""
 INSERT INTO shelters (
-  id, name, address, phone, website_url, type, capacity,
+  id, name, name_kana, address, phone, website_url, type, capacity,
   geom,
   is_emergency_flood, is_emergency_landslide, is_emergency_tidalwave, is_emergency_large_fire,
   emergency_space_note, has_parking, has_barrier_free_toilet, has_pet_space,
@@ -20,7 +22,7 @@ INSERT INTO shelters (
   latest_status, latest_congestion, latest_reported_at, pin_icon, image_urls
 )
 VALUES (
-  :id, :name, :address, :phone, :website_url, :type, :capacity,
+  :id, :name, :name_kana, :address, :phone, :website_url, :type, :capacity,
   ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography,
   :is_emergency_flood, :is_emergency_landslide, :is_emergency_tidalwave, :is_emergency_large_fire,
   :emergency_space_note, :has_parking, :has_barrier_free_toilet, :has_pet_space,
@@ -29,6 +31,7 @@ VALUES (
 )
 ON CONFLICT (id) DO UPDATE SET
   name = EXCLUDED.name,
+  name_kana = EXCLUDED.name_kana,
   address = EXCLUDED.address,
   phone = EXCLUDED.phone,
   website_url = EXCLUDED.website_url,
@@ -97,6 +100,8 @@ def run():
 
             params: Dict[str, Any] = {
                 "id": sid, "name": name, "address": address,
+                # 読み（任意列）。search_text 生成列で正規化されキーワード検索に効く
+                "name_kana": (row.get("name_kana") or "").strip() or None,
                 "phone": (row.get("phone") or "").strip(),
                 "website_url": (row.get("website_url") or "").strip(),
                 "type": typ, "capacity": _int(row.get("capacity")) or 0,
@@ -119,6 +124,10 @@ def run():
             ]:
                 params[col] = _bool(row.get(col))
             conn.execute(SQL, params); count += 1
+        # 同じトランザクションでデータ版を上げる（/shelters の ETag が変わる）
+        bump_data_version(conn)
+    # /shelters の応答キャッシュを無効化（Redis 不通なら何もしない）
+    shelter_cache.bump_version()
     print(f"✅ shelters seed completed (rows: {count})")
 
 if __name__ == "__main__":
@@ -1,8 +1,11 @@
 from __future__ import annotations
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
+from app.core.metrics import db_pool_wait
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set")
@@ -13,6 +16,7 @@ MAX_OVERFLOW = int(os.getenv("MAX_OVERFLOW", "4"))
 POOL_RECYCLE = int(os.getenv("POOL_RECYCLE", "1800"))  # 秒。DB接続を再利用
 POOL_TIMEOUT = int(os.getenv("POOL_TIMEOUT", "30"))    # 秒。待ち時間（安全策）
 
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,        # 切断を自動復旧
@@ -23,3 +27,22 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# ---- 接続の取り出し待ち時間（/system/metrics の db_pool_wait） -------------------
+# セッションがトランザクション外で実行を始めた時刻から、接続が割り当てられる（after_begin）までを計る。
+# プール待ち・溢れ分の新規接続・pre_ping を含む。engine.begin() など Session を通らない利用は対象外。
+_POOL_WAIT_T0 = "pool_wait_t0"
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_checkout_start(state) -> None:
+    if not state.session.in_transaction():
+        state.session.info[_POOL_WAIT_T0] = time.perf_counter()
+
+
+@event.listens_for(SessionLocal, "after_begin")
+def _observe_checkout(session, transaction, connection) -> None:
+    t0 = session.info.pop(_POOL_WAIT_T0, None)
+    if t0 is not None:
+        db_pool_wait.observe(time.perf_counter() - t0)
@@ -7,7 +7,7 @@ load_dotenv()  # .env の内容を環境変数として読み込む
 
 import os
 import logging
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -17,13 +17,13 @@ from app.core.logging import setup_logging
 
 # ルーター
 
-from app.routers import shelter, users, favorites, premium, pets, family, checklists, news, auth,stripe_webhook # ← premium を追加！
+from app.routers import shelter, users, favorites, premium, pets, family, checklists, news, auth,stripe_webhook, system # ← premium を追加！
 
 
 
 # 共通エラーハンドラ
 from app.core.errors import register_exception_handlers
-from app.core.request_id import RequestIDMiddleware
+from app.core.request_id import RequestContextMiddleware
 
 # レート制限
 from fastapi_limiter import FastAPILimiter
@@ -51,10 +51,6 @@ tags_metadata = [
 
 app = FastAPI(title="Pet Evacuation App API", openapi_tags=tags_metadata)
 
-# (1) trace_id ミドルウェア
-app.add_middleware(RequestIDMiddleware)
-
-
 # (2) CORS（本番ドメイン固定／必要時のみPreviewを許可）
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000").rstrip("/")
 ALLOW_VERCEL_PREVIEW = os.getenv("ALLOW_VERCEL_PREVIEW", "0") == "1"
@@ -73,24 +69,10 @@ if ALLOW_VERCEL_PREVIEW:
 
 app.add_middleware(CORSMiddleware, **cors_kwargs)
 
-# (2.5) リクエスト/レスポンスの構造化ログ（PIIマスキング対象）
-@app.middleware("http")
-async def log_request_middleware(request: Request, call_next):
-    """
-    すべてのHTTPリクエストを構造化してログ出力。
-    app.core.logging.PIIFilter により、メールや Bearer トークンは自動で "***" に伏字。
-    """
-    # ノイズを減らすならヘルスチェックは除外
-    if request.url.path == "/system/health":
-        return await call_next(request)
-
-    headers = dict(request.headers)  # Authorizationなども含む（PIIフィルタが伏字にする）
-    logger.info({"event": "request", "path": request.url.path, "method": request.method, "headers": headers})
-
-    response = await call_next(request)
-
-    logger.info({"event": "response", "path": request.url.path, "status": response.status_code})
-    return response
+# (2.5) trace_id 付与 + アクセスログ（素の ASGI。最後に足す＝最も外側で全体の所要時間を測る）
+#   1リクエスト1行: method / 経路テンプレート / status / 所要ms / bytes
+#   詳細（クエリ・ヘッダ）は ACCESS_LOG_DETAIL_RATE / ACCESS_LOG_DETAIL_ROUTES で抽出したときだけ
+app.add_middleware(RequestContextMiddleware)
 
 # (3) 例外ハンドラ
 register_exception_handlers(app)
@@ -102,6 +84,25 @@ async def _init_rate_limiter():
     redis = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
     await FastAPILimiter.init(redis)
 
+# (4.2) ID トークンのローカル検証用の公開鍵を先読みし、期限前の自動更新を開始
+@app.on_event("startup")
+async def _start_jwt_verifier():
+    from app.core.jwt_verifier import get_offline_verifier, offline_enabled
+    if offline_enabled():
+        await get_offline_verifier().start()
+
+@app.on_event("shutdown")
+async def _stop_jwt_verifier():
+    from app.core.jwt_verifier import get_offline_verifier, offline_enabled
+    if offline_enabled():
+        await get_offline_verifier().stop()
+
+# (4.5) SSE 配信の Redis 購読を停止（終了時）
+@app.on_event("shutdown")
+async def _close_crowd_stream():
+    from app.services.crowd_stream import crowd_stream
+    await crowd_stream.close()
+
 # (5) ルーター登録
 app.include_router(shelter.router)
 app.include_router(users.router)
@@ -113,6 +114,7 @@ app.include_router(checklists.router)
 app.include_router(news.router)
 app.include_router(auth.router)
 app.include_router(stripe_webhook.router)
+app.include_router(system.router)   # /system/metrics
 
 # (6) ヘルスチェック
 @app.get("/system/health", tags=["admin"], summary="ヘルスチェック")
@@ -1,5 +1,6 @@
 import enum, uuid
-from sqlalchemy import Column, String, Integer, Boolean, Text, Date, text
+from sqlalchemy import Column, String, Integer, Float, Boolean, Text, Date, Computed, text
+from sqlalchemy import BigInteger, SmallInteger, ForeignKey, Index, CheckConstraint, TIMESTAMP
 from sqlalchemy import Enum as SAEnum
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from geoalchemy2 import Geography
@@ -14,11 +15,54 @@ class CrowdLevel(str, enum.Enum):
     few = "few"
     full = "full"
 
+class ShelterCapability(enum.IntFlag):
+    """
+    PDF 由来の boolean 群を1つの整数にまとめたビット（shelters.capabilities）。
+    ビット割り当ては migration a8_shelters_capabilities と一致させること。
+    """
+    flood = 1                   # is_emergency_flood
+    landslide = 2               # is_emergency_landslide
+    tidalwave = 4               # is_emergency_tidalwave
+    large_fire = 8              # is_emergency_large_fire
+    parking = 16                # has_parking
+    barrier_free_toilet = 32    # has_barrier_free_toilet
+    pet_space = 64              # has_pet_space
+    designated = 128            # is_designated_shelter
+    welfare_primary = 256       # is_welfare_shelter_primary
+
+# API の hazard= / facility= に指定できる名前
+HAZARD_CAPABILITIES = {
+    "flood": ShelterCapability.flood,
+    "landslide": ShelterCapability.landslide,
+    "tidalwave": ShelterCapability.tidalwave,
+    "large_fire": ShelterCapability.large_fire,
+}
+FACILITY_CAPABILITIES = {
+    "parking": ShelterCapability.parking,
+    "barrier_free_toilet": ShelterCapability.barrier_free_toilet,
+    "pet_space": ShelterCapability.pet_space,
+    "designated": ShelterCapability.designated,
+    "welfare_primary": ShelterCapability.welfare_primary,
+}
+
+_CAPABILITY_COLUMNS = [
+    ("is_emergency_flood", ShelterCapability.flood),
+    ("is_emergency_landslide", ShelterCapability.landslide),
+    ("is_emergency_tidalwave", ShelterCapability.tidalwave),
+    ("is_emergency_large_fire", ShelterCapability.large_fire),
+    ("has_parking", ShelterCapability.parking),
+    ("has_barrier_free_toilet", ShelterCapability.barrier_free_toilet),
+    ("has_pet_space", ShelterCapability.pet_space),
+    ("is_designated_shelter", ShelterCapability.designated),
+    ("is_welfare_shelter_primary", ShelterCapability.welfare_primary),
+]
+
 class Shelter(Base):
     __tablename__ = "shelters"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False, index=True)
+    name_kana = Column(Text, nullable=True)  # 読み（カナ）。キーワード検索用
     address = Column(String, nullable=True)
     phone = Column(Text, nullable=True)
     website_url = Column(Text, nullable=True)
@@ -28,8 +72,11 @@ class Shelter(Base):
 
     capacity = Column(Integer, server_default=text("0"))
 
-    # 位置情報は lat/lng 列ではなく geom(Geography(Point,4326)) に保持
+    # 位置情報の正は geom(Geography(Point,4326))。lat/lng はそこからの生成列
     geom = Column(Geography(geometry_type="POINT", srid=4326), nullable=False)
+    # geom から生成する保存列（読み取り時の geography→geometry 変換と ST_Y/ST_X を省く）
+    lat = Column(Float, Computed("ST_Y(geom::geometry)", persisted=True))
+    lng = Column(Float, Computed("ST_X(geom::geometry)", persisted=True))
 
     # 混雑度は Enum（Text での二重定義は削除）
     crowd_level = Column(SAEnum(CrowdLevel, name="crowd_level"), nullable=True, default=CrowdLevel.empty)
@@ -45,10 +92,32 @@ class Shelter(Base):
     has_pet_space = Column(Boolean, server_default=text("false"))
     is_designated_shelter = Column(Boolean, server_default=text("false"))
     is_welfare_shelter_primary = Column(Boolean, server_default=text("false"))
+    # 上の boolean 群をビットにまとめた生成列（ShelterCapability）。部分 GiST 索引あり
+    capabilities = Column(
+        Integer,
+        Computed(
+            " | ".join(
+                f"(CASE WHEN coalesce({col}, false) THEN {int(bit)} ELSE 0 END)"
+                for col, bit in _CAPABILITY_COLUMNS
+            ),
+            persisted=True,
+        ),
+        nullable=False,
+    )
     notes = Column(Text)
     contact_hq = Column(Text)
     source_asof_date = Column(Date)
 
+    # キーワード検索用（NFKC + ひらがな→カタカナ + 小文字）。pg_trgm GIN 索引あり
+    search_text = Column(
+        Text,
+        Computed(
+            "shelter_search_normalize("
+            "coalesce(name, '') || ' ' || coalesce(name_kana, '') || ' ' || coalesce(address, ''))",
+            persisted=True,
+        ),
+    )
+
     # 最新ステータス
     latest_status = Column(Text)
     latest_congestion = Column(Integer)
@@ -56,5 +125,48 @@ class Shelter(Base):
     pin_icon = Column(Text)
     image_urls = Column(ARRAY(Text))
 
-    created_at = Column(String, server_default=text("now()"))
-    updated_at = Column(String, server_default=text("now()"))
+    created_at = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    # updated_at / change_version はトリガ（shelters_track_change）が内容の変更時に更新する
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=text("now()"))
+    # 差分同期（GET /shelters/changes）用。書き込んだトランザクションの xid
+    change_version = Column(
+        BigInteger, nullable=False, index=True, server_default=text("pg_current_xact_id()::text::bigint"),
+    )
+
+
+class ShelterDataVersion(Base):
+    """避難所データ版（1行のみ）。ETag / 条件付き GET 用。更新は crud.shelter.bump_data_version"""
+    __tablename__ = "shelters_data_version"
+    __table_args__ = (CheckConstraint("id = 1", name="ck_shelters_data_version_single_row"),)
+
+    id = Column(SmallInteger, primary_key=True, server_default=text("1"))
+    version = Column(BigInteger, nullable=False, server_default=text("1"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
+class ShelterCrowdObservation(Base):
+    """
+    混雑度の変更履歴（追記のみ）。時刻順に追記されるので observed_at は BRIN で小さく索引する。
+    集計は crud.shelter.get_crowd_history（SQL 側でバケット化）
+    """
+    __tablename__ = "shelter_crowd_observations"
+    __table_args__ = (
+        Index("ix_shelter_crowd_observations_observed_at_brin", "observed_at", postgresql_using="brin"),
+        Index("ix_shelter_crowd_observations_shelter_time", "shelter_id", "observed_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    shelter_id = Column(UUID(as_uuid=True), ForeignKey("shelters.id", ondelete="CASCADE"), nullable=False)
+    crowd_level = Column(Text, nullable=False)
+    observed_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
+
+
+class ShelterTombstone(Base):
+    """削除された避難所（差分同期で deleted として返す）。shelters の DELETE トリガが書く"""
+    __tablename__ = "shelter_tombstones"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    change_version = Column(
+        BigInteger, nullable=False, index=True, server_default=text("pg_current_xact_id()::text::bigint"),
+    )
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
@@ -4,7 +4,7 @@ from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_current_user, get_db
+from app.core.deps import get_current_user_record, get_db
 from app.core.errors import ErrorResponse
 from app.models.checklist import Checklist
 from app.schemas.checklist import (
@@ -26,7 +26,7 @@ def _own_or_404(db: Session, user_id: str, cid: str) -> Checklist:
 )
 def list_checklists(
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> ChecklistListResponse:
     rows = (
         db.query(Checklist)
@@ -45,7 +45,7 @@ def list_checklists(
 def create_checklist(
     payload: ChecklistCreate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> ChecklistItem:
     c = Checklist(user_id=current_user.id, title=payload.title, items_json=payload.items_json)
     db.add(c); db.commit(); db.refresh(c)
@@ -60,7 +60,7 @@ def update_checklist(
     cid: str,
     payload: ChecklistUpdate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> ChecklistItem:
     c = _own_or_404(db, current_user.id, cid)
     if payload.title is not None: c.title = payload.title
@@ -76,7 +76,7 @@ def update_checklist(
 def delete_checklist(
     cid: str,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ):
     c = _own_or_404(db, current_user.id, cid)
     db.delete(c); db.commit()
@@ -91,7 +91,7 @@ def patch_items(
     cid: str,
     payload: ChecklistItemsPatch,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> ChecklistItem:
     c = _own_or_404(db, current_user.id, cid)
     c.items_json = payload.items_json
@@ -4,7 +4,7 @@ from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_current_user, get_db
+from app.core.deps import get_current_user_record, get_db
 from app.core.errors import ErrorResponse
 from app.models.family import FamilyMember, FamilyCheckin
 from app.schemas.family import (
@@ -27,7 +27,7 @@ def _own_member_or_404(db: Session, user_id: str, member_id: str) -> FamilyMembe
 )
 def list_members(
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> FamilyMemberListResponse:
     rows = db.query(FamilyMember).where(FamilyMember.user_id == current_user.id).order_by(FamilyMember.created_at.asc()).all()
     return FamilyMemberListResponse(items=[FamilyMemberItem.model_validate(r) for r in rows])
@@ -41,7 +41,7 @@ def list_members(
 def create_member(
     payload: FamilyMemberCreate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> FamilyMemberItem:
     m = FamilyMember(user_id=current_user.id, name=payload.name, relation=payload.relation, contact=payload.contact)
     db.add(m); db.commit(); db.refresh(m)
@@ -56,7 +56,7 @@ def update_member(
     member_id: str,
     payload: FamilyMemberUpdate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> FamilyMemberItem:
     m = _own_member_or_404(db, current_user.id, member_id)
     if payload.name is not None: m.name = payload.name
@@ -73,7 +73,7 @@ def update_member(
 def delete_member(
     member_id: str,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ):
     m = _own_member_or_404(db, current_user.id, member_id)
     db.delete(m); db.commit()
@@ -88,7 +88,7 @@ def delete_member(
 def create_checkin(
     payload: FamilyCheckinCreate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> FamilyCheckinItem:
     _ = _own_member_or_404(db, current_user.id, payload.member_id)
     c = FamilyCheckin(
@@ -108,7 +108,7 @@ def create_checkin(
 def get_latest_checkin(
     member_id: str = Query(..., description="家族メンバーID"),
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> FamilyCheckinLatestResponse:
     _ = _own_member_or_404(db, current_user.id, member_id)
     c = (
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, Path, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
-from app.core.deps import get_current_user, get_db
+from app.core.deps import get_current_user_record, get_db
 from app.core.errors import ErrorResponse
 from app.schemas.favorite import (
     FavoriteItem,
@@ -59,7 +59,7 @@ def _extract_user_id(current_user: Any) -> str:
 def get_favorites(
     include_shelter: bool = Query(False, description="避難所情報を含める場合は true"),
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ):
     """お気に入り一覧を取得。include_shelter=True で避難所情報も含む"""
     user_id = _extract_user_id(current_user)
@@ -83,7 +83,7 @@ def get_favorites(
 def put_favorite(
     shelter_id: str = Path(..., description="避難所ID"),
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ):
     print("✅ PUT /favorites called")
     print("current_user =", current_user)
@@ -114,7 +114,7 @@ def put_favorite(
 def delete_favorite_endpoint(
     shelter_id: str = Path(..., description="避難所ID"),
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ):
     """お気に入り解除"""
     user_id = _extract_user_id(current_user)
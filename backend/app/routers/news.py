@@ -4,7 +4,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db, get_current_user  # ★ 認証を必須化
+from app.core.deps import get_db, get_current_user_record  # ★ 認証を必須化
 from app.core.errors import ErrorResponse
 from app.models.news import News
 from app.schemas.news import NewsItem, NewsListResponse
@@ -24,7 +24,7 @@ def list_news(
     area: Optional[str] = Query(None, description="任意：エリアでフィルタ"),
     level: Optional[str] = Query(None, description="info|alert|emergency"),
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),  # ★ 認証（値は使わなくてもOK）
+    current_user = Depends(get_current_user_record),  # ★ 認証（値は使わなくてもOK）
 ) -> NewsListResponse:
     """
     認証済みユーザー向けニュース一覧。将来的に current_user に紐づく
@@ -50,7 +50,7 @@ def list_news(
 def get_news(
     news_id: str,
     db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),  # ★ 認証
+    current_user = Depends(get_current_user_record),  # ★ 認証
 ) -> NewsItem:
     n = db.query(News).get(news_id)
     if not n:
@@ -5,7 +5,7 @@ from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, Path, Response, status
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_current_user, get_db
+from app.core.deps import get_current_user_record, get_db
 from app.core.errors import ErrorResponse
 from app.models.pet import Pet
 from app.schemas.pet import PetItem, PetCreate, PetUpdate, PetListResponse
@@ -29,7 +29,7 @@ def _get_owned_pet_or_404(db: Session, pet_id: str, user_id: Any) -> Pet:
 )
 def list_pets(
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> PetListResponse:
     try:
         rows = (
@@ -59,7 +59,7 @@ def list_pets(
 def create_pet(
     payload: PetCreate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> PetItem:
     try:
         pet = Pet(
@@ -96,7 +96,7 @@ def update_pet(
     pet_id: str = Path(...),
     payload: PetUpdate = None,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> PetItem:
     try:
         pet = _get_owned_pet_or_404(db, pet_id, current_user.id)
@@ -134,7 +134,7 @@ def update_pet(
 def delete_pet(
     pet_id: str = Path(...),
     db: Session = Depends(get_db),
-    current_user: Any = Depends(get_current_user),
+    current_user: Any = Depends(get_current_user_record),
 ) -> Response:
     try:
         pet = _get_owned_pet_or_404(db, pet_id, current_user.id)
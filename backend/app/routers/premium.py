@@ -2,8 +2,12 @@ from __future__ import annotations
 
 import os
 import stripe
-from fastapi import APIRouter, Header, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.core.deps import get_db, resolve_auth
 
 router = APIRouter(prefix="/premium", tags=["premium"])
 
@@ -35,11 +39,8 @@ class CheckoutIn(BaseModel):
 _error_example_401 = {"application/json": {"example": {"error": "http_error", "detail": "Missing bearer token", "status": 401, "trace_id": "abcd1234"}}}
 _error_example_500 = {"application/json": {"example": {"error": "internal_error", "detail": "Stripe env vars not set", "status": 500, "trace_id": "abcd1234"}}}
 
-def verify_id_token(authorization: str | None) -> dict:
-    # TODO: 後で Firebase Admin 検証に差し替え
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing bearer token")
-    return {"uid": "dev-user-id", "email": "dev@example.com"}
+# AUTH_BYPASS 中は Bearer 無しでも通すため auto_error=False（無いときの 401 は下で返す）
+optional_bearer = HTTPBearer(auto_error=False)
 
 def get_or_create_customer(user_id: str, email: str | None) -> str:
     customer = stripe.Customer.create(email=email or None, metadata={"app_user_id": user_id})
@@ -54,7 +55,9 @@ def get_or_create_customer(user_id: str, email: str | None) -> str:
 )
 def create_checkout_session(
     body: CheckoutIn,
-    authorization: str | None = Header(None),
+    request: Request,
+    creds: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+    db: Session = Depends(get_db),
 ):
     # 必須envを毎回チェック & 取得
     price_id, frontend = configure_stripe()
@@ -64,9 +67,12 @@ def create_checkout_session(
         user_id = (body.user_id or "dev-user-id").strip()
         email = "dev@example.com"
     else:
-        decoded = verify_id_token(authorization)
-        user_id = decoded["uid"]
-        email = decoded.get("email")
+        if creds is None:
+            raise HTTPException(status_code=401, detail="Missing bearer token")
+        # 他ルートと同じ認証結果（request.state.auth）を使う。購入前のユーザーも通すので premium 判定はしない
+        ctx = resolve_auth(request, creds.credentials, db)
+        user_id = ctx.uid
+        email = ctx.email
 
     # Checkout セッション作成
     session = stripe.checkout.Session.create(
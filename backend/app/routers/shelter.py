@@ -1,65 +1,542 @@
 from __future__ import annotations
-from typing import Literal, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
+import asyncio
+import math
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db, get_admin_user
-from app.crud.shelter import get_shelters, get_shelter_by_id
-from app.schemas.shelter import ShelterItem, ShelterListResponse
+from app.crud.shelter import (
+    get_shelters, get_shelter_by_id, get_shelters_by_ids, get_shelter_clusters, get_nearest_shelters_batch,
+    next_cursor_for, sort_kind, bump_data_version, update_crowd_levels,
+    get_crowd_history, MAX_HISTORY_BUCKETS, get_recommended_shelters, get_shelter_changes, OFFLINE_COLUMNS,
+)
+from app.schemas.shelter import (
+    ShelterItem, ShelterListResponse, ShelterClusterResponse,
+    NearestBatchRequest, NearestBatchResponse, NearestResult,
+    CrowdBulkRequest, CrowdBulkResponse, CrowdBulkResult, CrowdHistoryResponse,
+    ShelterChangesResponse, ShelterBatchGetRequest, ShelterBatchGetResponse,
+)
 from app.core.errors import ErrorResponse
-from app.models.shelter import CrowdLevel, Shelter
+from app.models.shelter import CrowdLevel, HAZARD_CAPABILITIES, FACILITY_CAPABILITIES
+from app.services.crowd_stream import crowd_stream, format_sse, stream_enabled, SHELTER_STREAM_HEARTBEAT
+from app.services.shelter_cache import BYPASS_HEADER, SHELTER_CACHE_TTL, cache_enabled, shelter_cache
+from app.services.shelter_index import index_enabled, shelter_index
+from app.services.shelter_version import shelter_version
+from app.services.shelter_snapshot import choose_encoding, shelter_snapshot, strong_match
 
 router = APIRouter(prefix="/shelters", tags=["shelters"])
 
+# 表示範囲（bbox）指定時の1リクエストあたり最大件数（bbox 未指定時は従来どおり 200）
+SHELTER_BBOX_MAX_ROWS = int(os.getenv("SHELTER_BBOX_MAX_ROWS", "1000"))
+LIST_MAX_ROWS = 200
+
+HazardName = Literal["flood", "landslide", "tidalwave", "large_fire"]
+FacilityName = Literal["parking", "barrier_free_toilet", "pet_space", "designated", "welfare_primary"]
+
+# オフライン用スナップショットのブラウザ/CDN キャッシュ秒数（更新有無は ETag で確認）
+SHELTER_SNAPSHOT_MAX_AGE = int(os.getenv("SHELTER_SNAPSHOT_MAX_AGE", "60"))
+
+# SSE: ids で絞り込める避難所数の上限
+STREAM_MAX_IDS = 500
+
+# クラスタ: 1タイル（360/2^zoom 度）を何分割したグリッドでまとめるか
+CLUSTER_CELLS_PER_TILE = 8
+
+
+def _cached_json(request: Request, key_params: Any, build: Callable[[], BaseModel]) -> Any:
+    """
+    SHELTER_CACHE_ENABLED=1 のとき Redis を先に引き、無ければ build() の結果を JSON で保存して返す。
+    無効時は build() のモデルをそのまま返す（FastAPI が通常どおりシリアライズ）。
+    """
+    if not cache_enabled():
+        return build()
+    bypass = request.headers.get(BYPASS_HEADER) == "1"
+    cached, key = shelter_cache.get(key_params, read=not bypass)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+    body = build().model_dump_json().encode("utf-8")
+    if key:
+        shelter_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "BYPASS" if bypass else "MISS"})
+
+
+def _validators(
+    request: Request,
+    db: Session,
+    key_params: Any,
+    version: Optional[Tuple[int, Any]] = None,
+) -> Tuple[Optional[Response], Dict[str, str]]:
+    """
+    データ版 + パラメータから ETag / Last-Modified を作る。
+    If-None-Match が一致すれば 304 を返す（版はワーカー内でメモ化しているので通常 DB を引かない）
+    version: 応答を作る内容の (版, 更新時刻)。省略時は shelter_version の値
+    """
+    version, updated_at = version or shelter_version.current(db)
+    headers = {"ETag": shelter_version.etag_for(version, key_params)}
+    last_modified = shelter_version.last_modified(updated_at)
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if shelter_version.matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
+
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    """"minLng,minLat,maxLng,maxLat" を検証して返す（不正なら 400）"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be minLng,minLat,maxLng,maxLat")
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox must be minLng,minLat,maxLng,maxLat")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def _canonical_id(shelter_id: str) -> str:
+    """UUID は小文字ハイフン区切りにそろえる（不正な文字列はそのまま＝見つからない扱い）"""
+    try:
+        return str(uuid.UUID(shelter_id))
+    except ValueError:
+        return shelter_id
+
+
+def _apply_crowd_updates(db: Session, wanted: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """
+    混雑度の更新を1トランザクションで反映し、後続の無効化・通知を1回ずつ行う。
+    データ版（ETag）→ インメモリ索引 → 一覧キャッシュ → SSE 配信の順。
+    """
+    updated = update_crowd_levels(db, wanted)
+    if not updated:
+        return updated
+    # データ版も同じトランザクションで上げる（ETag が変わる）
+    version = bump_data_version(db)
+    db.commit()
+    shelter_version.remember(*version)
+    # インメモリ索引にも即時反映（他ワーカーは版の変化を見て読み直す）
+    for shelter_id, row in updated.items():
+        shelter_index.apply_crowd_level(shelter_id, row["crowd_level"])
+    shelter_index.advance_version(version[0])
+    # 一覧キャッシュを版上げで無効化
+    if cache_enabled():
+        shelter_cache.bump_version()
+    # 全ワーカーの /shelters/stream 接続へ（Redis pub/sub 経由）
+    if stream_enabled():
+        crowd_stream.publish([
+            {"id": shelter_id, **row, "version": version[0]} for shelter_id, row in updated.items()
+        ])
+    return updated
+
+
 # ✅ 修正ポイント: "category" を受け取るよう変更
 @router.get(
     "",
     response_model=ShelterListResponse,
     summary="避難所一覧を取得",
     responses={
+        304: {"description": "Not modified（If-None-Match が一致）"},
         422: {"description": "Validation error", "model": ErrorResponse},
         500: {"description": "Internal server error", "model": ErrorResponse},
     },
 )
 def list_shelters(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     category: Optional[Literal["companion", "accompany"]] = Query(None, description="避難種別（フロント送信と一致）"),
     crowd_level: Optional[str] = Query(None, description="混雑度"),
     lat: float | None = Query(None, ge=-90, le=90),
     lng: float | None = Query(None, ge=-180, le=180),
     radius: float = Query(5.0, ge=0, le=50),
-    keyword: str | None = Query(None),
-    limit: int = Query(50, ge=1, le=200),
+    keyword: str | None = Query(None, description="名称/読み/住所（全角半角・ひらがなカタカナを同一視）"),
+    limit: int = Query(50, ge=1, le=max(LIST_MAX_ROWS, SHELTER_BBOX_MAX_ROWS),
+                       description=f"bbox 指定時は最大 {SHELTER_BBOX_MAX_ROWS}、それ以外は {LIST_MAX_ROWS}"),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="前ページの next_cursor（指定時は offset を無視）"),
+    min_lat: float | None = Query(None, ge=-90, le=90, description="表示範囲（4つ揃えて指定）"),
+    min_lng: float | None = Query(None, ge=-180, le=180),
+    max_lat: float | None = Query(None, ge=-90, le=90),
+    max_lng: float | None = Query(None, ge=-180, le=180),
+    sort: Optional[Literal["none", "recommended"]] = Query(
+        None, description="none=並べ替えなし（地図ピン描画用） / recommended=距離・混雑・収容・災害適合のスコア順（lat/lng 必須）",
+    ),
+    hazard: Optional[List[HazardName]] = Query(
+        None, description="対応災害（複数指定はすべて満たすもの）。sort=recommended では絞らずスコアに反映",
+    ),
+    facility: Optional[List[FacilityName]] = Query(None, description="設備（例: pet_space。複数指定はすべて満たすもの）"),
 ) -> ShelterListResponse:
     """避難所一覧を取得するエンドポイント"""
-    items = get_shelters(
-        db=db,
-        type=category,           # ★ 内部で type に渡す
-        crowd_level=crowd_level,
-        lat=lat,
-        lng=lng,
-        radius_km=radius,
-        q=keyword,
-        limit=limit,
-        offset=offset,
+    corners = (min_lng, min_lat, max_lng, max_lat)
+    bbox = None
+    if any(v is not None for v in corners):
+        if any(v is None for v in corners) or min_lat > max_lat or min_lng > max_lng:
+            raise HTTPException(status_code=400, detail="min_lat/min_lng/max_lat/max_lng must be given together")
+        bbox = corners
+    recommended = sort == "recommended"
+    if recommended and (lat is None or lng is None):
+        raise HTTPException(status_code=400, detail="sort=recommended requires lat and lng")
+    capabilities = 0
+    hazard_mask = 0
+    for name in hazard or []:
+        hazard_mask |= HAZARD_CAPABILITIES[name]
+    if not recommended:
+        capabilities |= hazard_mask
+    for name in facility or []:
+        capabilities |= FACILITY_CAPABILITIES[name]
+    # 行数上限はサーバ側で丸める（bbox なしは従来の 200 件）
+    limit = min(limit, SHELTER_BBOX_MAX_ROWS if bbox else LIST_MAX_ROWS)
+
+    # キャッシュ有効時は座標を格子に丸め、近くの利用者で同じエントリを共有する
+    if cache_enabled():
+        lat, lng = shelter_cache.snap(lat), shelter_cache.snap(lng)
+    key_params = sorted(
+        (k, v) for k, v in request.query_params.multi_items() if k not in ("lat", "lng")
+    ) + [("lat", lat), ("lng", lng)]
+
+    # ETag・キャッシュキーの版は、本文を作る内容の版にそろえる。
+    # 索引で答えるときは索引をその版まで追いつかせ（再読込中なら SQL へ回す）、索引の版を使う
+    version, updated_at = shelter_version.current(db)
+    # キーワード付きはあいまい検索・類似度順のため pg_trgm（SQL）側で処理
+    use_index = index_enabled() and not keyword and not recommended
+    if use_index:
+        index_version = shelter_index.ensure_version(db, version)
+        use_index = index_version is not None
+        version = index_version if index_version is not None else version
+
+    not_modified, validators = _validators(request, db, key_params, (version, updated_at))
+    if not_modified is not None:
+        return not_modified
+
+    def build() -> ShelterListResponse:
+        if recommended:
+            if cursor:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            items = get_recommended_shelters(
+                db, lat=lat, lng=lng, radius_km=radius, limit=limit, offset=offset,
+                type=category, crowd_level=crowd_level, q=keyword, bbox=bbox,
+                capabilities=int(capabilities), hazard=int(hazard_mask),
+            )
+            return ShelterListResponse(items=items, next_cursor=None)
+        # SHELTER_INDEX_ENABLED=1 のときはインメモリ索引で応答（DB は再読込時のみ）
+        search = shelter_index.query if use_index else get_shelters
+        try:
+            items = search(
+                db=db,
+                type=category,           # ★ 内部で type に渡す
+                crowd_level=crowd_level,
+                lat=lat,
+                lng=lng,
+                radius_km=radius,
+                q=keyword,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                bbox=bbox,
+                sort=sort,
+                capabilities=int(capabilities),
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        kind = sort_kind(lat, lng, keyword, sort)
+        return ShelterListResponse(items=items, next_cursor=next_cursor_for(items, limit, kind))
+
+    # キーにも版を入れる（古い版の内容を新しい版のエントリとして保存しない）
+    result = _cached_json(request, key_params + [("version", version)], build)
+    (result if isinstance(result, Response) else response).headers.update(validators)
+    return result
+
+
+@router.get(
+    "/clusters",
+    response_model=ShelterClusterResponse,
+    summary="地図表示用に避難所をズームレベル別グリッドでクラスタリング",
+    responses={
+        400: {"description": "Invalid bbox", "model": ErrorResponse},
+        422: {"description": "Validation error", "model": ErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+    },
+)
+def list_shelter_clusters(
+    request: Request,
+    response: Response,
+    bbox: str = Query(..., description="minLng,minLat,maxLng,maxLat"),
+    zoom: int = Query(..., ge=0, le=22),
+    category: Optional[Literal["companion", "accompany"]] = Query(None, description="避難種別"),
+    db: Session = Depends(get_db),
+) -> ShelterClusterResponse:
+    """
+    zoom に応じたグリッド（ST_SnapToGrid）で集約し、重心・件数・混雑度内訳を返す。
+    bbox はタイル境界まで広げてから集計するので、同じ (zoom, タイル範囲) は同じ結果＝キャッシュ可能。
+    """
+    min_lng, min_lat, max_lng, max_lat = _parse_bbox(bbox)
+
+    # タイル境界へ外側に丸める
+    tile = 360.0 / (2 ** zoom)
+    min_lng = max(math.floor(min_lng / tile) * tile, -180.0)
+    min_lat = max(math.floor(min_lat / tile) * tile, -90.0)
+    max_lng = min(math.ceil(max_lng / tile) * tile, 180.0)
+    max_lat = min(math.ceil(max_lat / tile) * tile, 90.0)
+    cell = tile / CLUSTER_CELLS_PER_TILE
+
+    def build() -> ShelterClusterResponse:
+        items = get_shelter_clusters(
+            db, min_lat=min_lat, min_lng=min_lng, max_lat=max_lat, max_lng=max_lng,
+            cell_deg=cell, type=category,
+        )
+        return ShelterClusterResponse(zoom=zoom, bbox=[min_lng, min_lat, max_lng, max_lat], items=items)
+
+    response.headers["Cache-Control"] = f"public, max-age={SHELTER_CACHE_TTL}"
+    result = _cached_json(request, [("clusters", zoom, min_lng, min_lat, max_lng, max_lat, category)], build)
+    if isinstance(result, Response):
+        result.headers["Cache-Control"] = response.headers["Cache-Control"]
+    return result
+
+@router.post(
+    "/nearest:batch",
+    response_model=NearestBatchResponse,
+    summary="複数地点それぞれの最寄り避難所をまとめて取得",
+    responses={
+        422: {"description": "Validation error", "model": ErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+    },
+)
+def nearest_shelters_batch(
+    payload: NearestBatchRequest,
+    db: Session = Depends(get_db),
+) -> NearestBatchResponse:
+    """
+    家族全員の現在地や避難訓練の地点一覧など、多地点の近傍 k 件を1クエリ（KNN）で返す。
+    """
+    per_point = get_nearest_shelters_batch(
+        db,
+        points=[(p.lat, p.lng) for p in payload.points],
+        k=payload.k,
+        type=payload.category,
     )
-    return ShelterListResponse(items=items)
+    return NearestBatchResponse(results=[
+        NearestResult(index=i, ref=p.ref, items=items)
+        for i, (p, items) in enumerate(zip(payload.points, per_point))
+    ])
 
-# 詳細取得（変更なし）
+# オフライン用の全件スナップショット（"/{shelter_id}" より前に定義すること）
+@router.get(
+    "/snapshot",
+    summary="全避難所のオフライン用スナップショット（列指向 JSON・圧縮済み）",
+    response_class=Response,
+    responses={
+        200: {"description": "application/json（gzip / br）。columns 順の列配列"},
+        304: {"description": "Not modified（If-None-Match が一致）"},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+    },
+)
+def shelter_snapshot_export(request: Request, db: Session = Depends(get_db)) -> Response:
+    """
+    データ版が変わったときだけ作り直し、圧縮済みバイト列をそのまま返す（リクエストごとの変換なし）。
+    ETag は内容ハッシュ（強い ETag・圧縮方式ごとに別）。
+    """
+    snap = shelter_snapshot.get(db)
+    encoding = choose_encoding(request.headers.get("accept-encoding"), snap.bodies)
+    headers = {
+        "ETag": snap.etag(encoding),
+        "Cache-Control": f"public, max-age={SHELTER_SNAPSHOT_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+        "X-Shelters-Version": str(snap.version),
+        # 差分同期の開始位置（GET /shelters/changes?since=）。304 でも付けるので取り直し不要
+        "X-Shelters-Change-Version": str(snap.change_version),
+    }
+    if strong_match(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=snap.bodies[encoding], media_type="application/json", headers=headers)
+
+
+# 差分同期（snapshot 取得後・再接続時に変更分だけ取る）
+@router.get(
+    "/changes",
+    response_model=ShelterChangesResponse,
+    summary="指定バージョン以降に追加・更新・削除された避難所を取得",
+    responses={
+        422: {"description": "Validation error", "model": ErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+    },
+)
+def shelter_changes(
+    since: int = Query(..., ge=0, description="snapshot の X-Shelters-Change-Version または前回の next_since"),
+    limit: int = Query(500, ge=1, le=5000, description="目安の件数（1トランザクション分は分割しない）"),
+    db: Session = Depends(get_db),
+) -> ShelterChangesResponse:
+    """
+    change_version 索引の範囲走査だけで返すので、コストはテーブル全体ではなく変更件数に比例する。
+    実行中のトランザクションが書いた行は確定するまで返さない（後からコミットされても取りこぼさない）。
+    """
+    changes = get_shelter_changes(db, since=since, limit=limit)
+    return ShelterChangesResponse(
+        since=since,
+        next_since=changes["next_since"],
+        has_more=changes["has_more"],
+        columns=OFFLINE_COLUMNS,
+        upserted=[[row[c] for c in OFFLINE_COLUMNS] for row in changes["upserted"]],
+        deleted=changes["deleted"],
+    )
+
+
+# 混雑度の変更をプッシュ配信（ポーリングの代わり）。"/{shelter_id}" より前に定義すること
+@router.get(
+    "/stream",
+    summary="混雑度の変更を Server-Sent Events で受け取る",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "text/event-stream（event: crowd / resync）"},
+        400: {"description": "Invalid bbox", "model": ErrorResponse},
+        503: {"description": "Stream disabled", "model": ErrorResponse},
+    },
+)
+async def shelter_stream(
+    bbox: Optional[str] = Query(None, description="minLng,minLat,maxLng,maxLat（この範囲の避難所だけ）"),
+    ids: Optional[List[str]] = Query(None, description=f"避難所ID（複数指定可・最大 {STREAM_MAX_IDS}）"),
+) -> StreamingResponse:
+    """
+    event: crowd  … {"id", "crowd_level", "lat", "lng", "version"}（id: 行はデータ版）
+    event: resync … 送信が追いつかず変更を取りこぼした。GET /shelters を取り直すこと
+    無通信時は SHELTER_STREAM_HEARTBEAT 秒ごとにコメント行（: ping）を送る。
+    """
+    if not stream_enabled():
+        raise HTTPException(status_code=503, detail="Stream disabled")
+    area = _parse_bbox(bbox) if bbox else None
+    if ids is not None and len(ids) > STREAM_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"ids must be at most {STREAM_MAX_IDS}")
+    sub = crowd_stream.subscribe(ids=[_canonical_id(i) for i in ids or []], bbox=area)
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), timeout=SHELTER_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                # 送信待ちの間に溜まった変更は避難所ごとに最新1件へまとまっている
+                batch, overflow = sub.drain()
+                if overflow:
+                    yield format_sse("resync", {"reason": "overflow"})
+                for event in batch:
+                    yield format_sse("crowd", event, event.get("version"))
+        finally:
+            crowd_stream.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post(
+    ":batchGet",
+    response_model=ShelterBatchGetResponse,
+    summary="複数の避難所詳細を ID 指定でまとめて取得",
+    responses={
+        422: {"description": "Validation error", "model": ErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+    },
+)
+def batch_get_shelters(
+    payload: ShelterBatchGetRequest,
+    db: Session = Depends(get_db),
+) -> ShelterBatchGetResponse:
+    """
+    お気に入り一覧や地図ポップアップ用。GET /shelters/{id} を件数分呼ぶ代わりに1クエリで返す。
+    items はリクエスト順、見つからない（または UUID として不正な）ID は missing に入れる。
+    """
+    canonical = [_canonical_id(i) for i in payload.ids]
+    valid = []
+    for cid in dict.fromkeys(canonical):
+        try:
+            uuid.UUID(cid)
+        except ValueError:
+            continue
+        valid.append(cid)
+    found = get_shelters_by_ids(db, valid)
+
+    items, missing, seen = [], [], set()
+    for raw, cid in zip(payload.ids, canonical):
+        if cid in seen:
+            continue
+        seen.add(cid)
+        if cid in found:
+            items.append(found[cid])
+        else:
+            missing.append(raw)
+    return ShelterBatchGetResponse(items=items, missing=missing)
+
+# 管理者専用の混雑度一括更新（災害対策本部が数十件まとめて入力する）
+@router.patch(
+    "/crowd:bulk",
+    response_model=CrowdBulkResponse,
+    summary="複数避難所の混雑度を一括更新（管理者専用）",
+    responses={
+        403: {"description": "Admin privilege required", "model": ErrorResponse},
+        422: {"description": "Validation error", "model": ErrorResponse},
+        500: {"description": "サーバーエラーです", "model": ErrorResponse},
+    },
+)
+def bulk_update_crowd_level(
+    payload: CrowdBulkRequest,
+    db: Session = Depends(get_db),
+    _admin=Depends(get_admin_user),
+) -> CrowdBulkResponse:
+    """
+    1トランザクション・1本の UPDATE で反映し、無効化（データ版・キャッシュ）も1回だけ行う。
+    存在しない ID は全体を失敗にせず、その項目だけ not_found で返す。同じ ID が複数あれば後勝ち。
+    """
+    wanted = {_canonical_id(item.shelter_id): item.level.value for item in payload.items}
+    updated = _apply_crowd_updates(db, wanted)
+
+    results = []
+    for i, item in enumerate(payload.items):
+        row = updated.get(_canonical_id(item.shelter_id))
+        results.append(CrowdBulkResult(
+            index=i,
+            shelter_id=item.shelter_id,
+            status="updated" if row is not None else "not_found",
+            crowd_level=row["crowd_level"] if row else None,
+        ))
+    return CrowdBulkResponse(
+        updated=sum(r.status == "updated" for r in results),
+        not_found=sum(r.status == "not_found" for r in results),
+        results=results,
+    )
+
+# 詳細取得（ETag 付き）
 @router.get(
     "/{shelter_id}",
     response_model=ShelterItem,
     summary="避難所詳細を取得",
     responses={
+        304: {"description": "Not modified（If-None-Match が一致）"},
         404: {"description": "Shelter not found", "model": ErrorResponse},
         500: {"description": "Internal server error", "model": ErrorResponse},
     },
 )
-def shelter_detail(shelter_id: str, db: Session = Depends(get_db)) -> ShelterItem:
+def shelter_detail(
+    shelter_id: str,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+) -> ShelterItem:
+    not_modified, validators = _validators(request, db, [("id", shelter_id)])
+    if not_modified is not None:
+        return not_modified
     item = get_shelter_by_id(db, shelter_id)
     if not item:
         raise HTTPException(status_code=404, detail="Shelter not found")
+    response.headers.update(validators)
     return item
 
 # 管理者専用の混雑度更新
@@ -80,11 +557,49 @@ def update_crowd_level(
     _admin=Depends(get_admin_user),
 ) -> dict:
     """管理者が避難所の混雑度を更新"""
-    shelter = db.query(Shelter).filter(Shelter.id == shelter_id).first()
-    if not shelter:
+    shelter_id = _canonical_id(shelter_id)
+    updated = _apply_crowd_updates(db, {shelter_id: level.value})
+    if shelter_id not in updated:
         raise HTTPException(status_code=404, detail="Shelter not found")
+    return {"id": shelter_id, "crowd_level": updated[shelter_id]["crowd_level"]}
 
-    shelter.crowd_level = level
-    db.commit()
-    db.refresh(shelter)
-    return {"id": str(shelter.id), "crowd_level": shelter.crowd_level}
+# 混雑度の推移（「直近30分で埋まりつつある」表示・事後分析用）
+@router.get(
+    "/{shelter_id}/crowd/history",
+    response_model=CrowdHistoryResponse,
+    summary="避難所の混雑度履歴を時間バケットで集計して取得",
+    responses={
+        400: {"description": "Invalid range", "model": ErrorResponse},
+        404: {"description": "Shelter not found", "model": ErrorResponse},
+        422: {"description": "Validation error", "model": ErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+    },
+)
+def shelter_crowd_history(
+    shelter_id: str,
+    since: Optional[datetime] = Query(None, description="開始（既定: until の24時間前）。タイムゾーン無しは UTC"),
+    until: Optional[datetime] = Query(None, description="終了（既定: 現在）"),
+    bucket_minutes: int = Query(15, ge=1, le=1440, description="バケット幅（分）"),
+    db: Session = Depends(get_db),
+) -> CrowdHistoryResponse:
+    until = (until or datetime.now(timezone.utc))
+    since = since or (until - timedelta(hours=24))
+    until, since = (t if t.tzinfo else t.replace(tzinfo=timezone.utc) for t in (until, since))
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if (until - since) / timedelta(minutes=bucket_minutes) > MAX_HISTORY_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"range / bucket_minutes must be at most {MAX_HISTORY_BUCKETS} buckets")
+
+    shelter_id = _canonical_id(shelter_id)
+    try:
+        uuid.UUID(shelter_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Shelter not found")
+    if not get_shelter_by_id(db, shelter_id):
+        raise HTTPException(status_code=404, detail="Shelter not found")
+
+    initial, buckets = get_crowd_history(db, shelter_id, since, until, bucket_minutes)
+    return CrowdHistoryResponse(
+        shelter_id=shelter_id, since=since, until=until, bucket_minutes=bucket_minutes,
+        initial_level=initial, buckets=buckets,
+    )
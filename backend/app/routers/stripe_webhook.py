@@ -12,6 +12,7 @@ import stripe
 from app.core.deps import get_db   # ← 依存関数がここにあります
 from sqlalchemy.orm import Session
 from app.models.user import User   # ユーザーモデル
+from app.core.user_cache import user_cache
 # 必要に応じて: from app.db.session import SessionLocal でもOK
 from datetime import datetime, timezone
 
@@ -62,6 +63,7 @@ def _update_premium_true(
 
     db.add(user)
     db.commit()
+    user_cache.invalidate(user.firebase_uid)  # plan の変更を認証キャッシュにも反映
      # 変更後（整理：期限・サブスクIDもクリアしておくと運用が楽）
 def _update_premium_false(db: Session, *, stripe_customer_id: Optional[str]) -> None:
     if not stripe_customer_id:
@@ -81,6 +83,7 @@ def _update_premium_false(db: Session, *, stripe_customer_id: Optional[str]) ->
 
     db.add(user)
     db.commit()
+    user_cache.invalidate(user.firebase_uid)
 
 
 
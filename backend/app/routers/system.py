@@ -0,0 +1,148 @@
+# backend/app/routers/system.py
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi_limiter import FastAPILimiter
+from sqlalchemy.orm import Session
+
+from app.core.deps import get_db, resolve_auth
+
+from app.core.jwt_verifier import get_offline_verifier, offline_enabled
+from app.core.logging import log_stats
+from app.core.metrics import (
+    db_pool_wait,
+    http_request_duration,
+    http_requests_in_flight,
+    metrics_enabled,
+    metrics_token_matches,
+    redis_command_duration,
+    render_samples,
+)
+from app.core.token_cache import token_cache
+from app.core.user_cache import user_cache
+from app.db.session import engine
+from app.services.crowd_stream import crowd_stream
+from app.services.shelter_cache import shelter_cache
+
+router = APIRouter(prefix="/system", tags=["admin"])
+
+# 秒。レートリミッタの Redis へ PING する上限（落ちていても収集を待たせない）
+_PING_TIMEOUT = 0.2
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+def require_metrics_reader(
+    request: Request,
+    creds: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+    db: Session = Depends(get_db),
+) -> None:
+    """
+    /system/metrics の読み取り権限。
+    Bearer が METRICS_TOKEN と一致すれば通す（収集サーバ用）。それ以外は管理者の Firebase ID トークンが必要
+    """
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if creds is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
+    if metrics_token_matches(creds.credentials):
+        return
+    if not resolve_auth(request, creds.credentials, db).is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privilege required")
+
+
+def _pool_metrics() -> List[str]:
+    pool = engine.pool
+    lines: List[str] = []
+    for name, help, value in (
+        ("db_pool_size", "Configured pool size", pool.size()),
+        ("db_pool_checked_out", "Connections currently checked out", pool.checkedout()),
+        ("db_pool_checked_in", "Idle connections in the pool", pool.checkedin()),
+        ("db_pool_overflow", "Connections opened beyond pool_size (negative = unused capacity)", pool.overflow()),
+    ):
+        lines += render_samples(name, help, "gauge", [((), value)])
+    return lines
+
+
+def _cache_metrics() -> List[str]:
+    caches: Dict[str, Dict[str, Any]] = {
+        "shelter_list": shelter_cache.stats(),
+        "auth_token": token_cache.stats(),
+        "auth_user": user_cache.stats(),
+    }
+    hits, misses, ratio = [], [], []
+    for name, st in caches.items():
+        label = (("cache", name),)
+        hits.append((label, st["hits"] + st.get("redis_hits", 0)))
+        misses.append((label, st["misses"]))
+        ratio.append((label, st["hit_ratio"]))
+    return (
+        render_samples("cache_hits_total", "Cache hits", "counter", hits)
+        + render_samples("cache_misses_total", "Cache misses", "counter", misses)
+        + render_samples("cache_hit_ratio", "Cache hit ratio since worker start", "gauge", ratio)
+    )
+
+
+def _misc_metrics() -> List[str]:
+    lines = render_samples(
+        "crowd_stream_connections", "Open SSE connections on this worker", "gauge",
+        [((), crowd_stream.stats()["connections"])],
+    )
+    st = log_stats()
+    if st:
+        lines += render_samples("log_queue_size", "Log records waiting to be written", "gauge", [((), st["queued"])])
+        lines += render_samples(
+            "log_records_dropped_total", "Log records dropped because the queue was full", "counter",
+            [((("level", level),), n) for level, n in sorted(st["dropped"].items())],
+        )
+    if offline_enabled():
+        v = get_offline_verifier().stats()
+        lines += render_samples("auth_keys_expires_in_seconds", "Seconds until the cached signing keys expire", "gauge", [((), v["expires_in"])])
+    return lines
+
+
+async def _limiter_ping() -> List[str]:
+    """レートリミッタ（FastAPILimiter）の Redis へ PING した往復時間"""
+    r = FastAPILimiter.redis
+    up, elapsed = 0, 0.0
+    if r is not None:
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(r.ping(), timeout=_PING_TIMEOUT)
+            up, elapsed = 1, time.perf_counter() - t0
+        except Exception:
+            up = 0
+    label = (("client", "limiter"),)
+    return (
+        render_samples("redis_up", "Whether the Redis ping succeeded", "gauge", [(label, up)])
+        + render_samples("redis_ping_seconds", "Redis ping round-trip time", "gauge", [(label, elapsed)])
+    )
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus 形式のメトリクス（ワーカー単位）",
+)
+async def metrics(_reader: None = Depends(require_metrics_reader)) -> PlainTextResponse:
+    """
+    リクエスト所要時間（経路テンプレート × status）・処理中リクエスト数・DB プール・Redis 往復・キャッシュ命中率。
+    値はワーカーごと（マルチワーカー時は Prometheus 側で合算する）。
+    METRICS_TOKEN の Bearer か、管理者の ID トークンが必要。
+    """
+    lines: List[str] = []
+    for metric in (http_request_duration, http_requests_in_flight, db_pool_wait, redis_command_duration):
+        lines += metric.render()
+    lines += _pool_metrics()
+    lines += _cache_metrics()
+    lines += _misc_metrics()
+    lines += await _limiter_ping()
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
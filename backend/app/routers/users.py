@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.core.deps import get_current_user, get_db
 from app.core.errors import ErrorResponse
+from app.core.user_cache import user_cache
 from app.schemas.user import UserMeResponse, UserMeUpdate, UserPlanResponse
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -55,6 +56,7 @@ def update_me(
         current_user.qr = payload.qr; updated = True
     if updated:
         db.add(current_user); db.commit(); db.refresh(current_user)
+        user_cache.invalidate(current_user.firebase_uid)
     return UserMeResponse(
         id=str(current_user.id),
         display_name=getattr(current_user, "display_name", None),
@@ -1,6 +1,7 @@
 from __future__ import annotations
-from typing import List, Optional
-from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
 
 class CrowdLevel(str, Enum):
@@ -17,8 +18,100 @@ class ShelterItem(BaseModel):
     crowd_level: Optional[str] = None   # ← これだけにする（重複定義を削除）
     lat: float
     lng: float
+    distance_m: Optional[float] = None  # 位置指定時のみ（中心からの距離 m）
+    score: Optional[float] = None       # sort=recommended のときだけ（0..1）
+    score_breakdown: Optional[Dict[str, float]] = None  # {"distance", "crowd", "capacity", "hazard"}（各 0..1）
     # Enum を値で出す
     model_config = ConfigDict(from_attributes=True, use_enum_values=True)
 
 class ShelterListResponse(BaseModel):
     items: List[ShelterItem]
+    next_cursor: Optional[str] = None   # 次ページ用（GET /shelters?cursor=... に渡す）
+
+class ShelterCluster(BaseModel):
+    lat: float                          # 重心
+    lng: float
+    count: int
+    crowd: Dict[str, int]               # {"empty": n, "few": n, "full": n, "unknown": n}
+    shelter_id: Optional[str] = None    # count == 1 のときだけ（そのままピン表示できる）
+
+class ShelterClusterResponse(BaseModel):
+    zoom: int
+    bbox: List[float]                   # タイル境界に丸めた [minLng, minLat, maxLng, maxLat]
+    items: List[ShelterCluster]
+
+# 複数 ID 一括取得の上限
+BATCH_GET_MAX_IDS = 200
+
+class ShelterBatchGetRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_GET_MAX_IDS)
+
+class ShelterBatchGetResponse(BaseModel):
+    items: List[ShelterItem]            # リクエストの ids の順（重複は最初の1回、見つからないものは除く）
+    missing: List[str]                  # 見つからなかった ID（リクエストの表記のまま）
+
+# 1リクエストで受け付ける地点数の上限
+NEAREST_BATCH_MAX_POINTS = 500
+
+class NearestPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    ref: Optional[str] = None           # 呼び出し側の識別子（家族メンバーID等）。そのまま返す
+
+class NearestBatchRequest(BaseModel):
+    points: List[NearestPoint] = Field(..., min_length=1, max_length=NEAREST_BATCH_MAX_POINTS)
+    k: int = Field(3, ge=1, le=20)
+    category: Optional[Literal["companion", "accompany"]] = None
+
+class NearestResult(BaseModel):
+    index: int                          # points 内の位置（0始まり）
+    ref: Optional[str] = None
+    items: List[ShelterItem]            # 近い順。distance_m 付き
+
+class NearestBatchResponse(BaseModel):
+    results: List[NearestResult]
+
+# 混雑度一括更新で1リクエストに受け付ける件数の上限
+CROWD_BULK_MAX_ITEMS = 500
+
+class CrowdUpdateItem(BaseModel):
+    shelter_id: str
+    level: CrowdLevel
+
+class CrowdBulkRequest(BaseModel):
+    items: List[CrowdUpdateItem] = Field(..., min_length=1, max_length=CROWD_BULK_MAX_ITEMS)
+
+class CrowdBulkResult(BaseModel):
+    index: int                          # items 内の位置（0始まり）
+    shelter_id: str
+    status: Literal["updated", "not_found"]
+    crowd_level: Optional[str] = None   # updated のときの反映後の値
+
+class CrowdBulkResponse(BaseModel):
+    updated: int
+    not_found: int
+    results: List[CrowdBulkResult]
+
+class CrowdHistoryBucket(BaseModel):
+    start: datetime                     # バケット開始時刻
+    observations: int                   # このバケット内の更新回数
+    empty: int
+    few: int
+    full: int
+    last_level: str                     # バケット末尾時点の混雑度
+
+class CrowdHistoryResponse(BaseModel):
+    shelter_id: str
+    since: datetime
+    until: datetime
+    bucket_minutes: int
+    initial_level: Optional[str] = None # since 時点の混雑度（直前の観測。無ければ null）
+    buckets: List[CrowdHistoryBucket]   # 観測のあるバケットのみ・時刻順
+
+class ShelterChangesResponse(BaseModel):
+    since: int
+    next_since: int                     # 次回の since（snapshot の change_version と同じ系列）
+    has_more: bool                      # true ならすぐ next_since で続きを取る
+    columns: List[str]                  # upserted の各行の並び（snapshot の columns と同じ）
+    upserted: List[List[Any]]           # 追加・更新された避難所（行ごとの配列）
+    deleted: List[str]                  # 削除された避難所 ID
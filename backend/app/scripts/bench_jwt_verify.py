@@ -0,0 +1,73 @@
+# backend/app/scripts/bench_jwt_verify.py
+"""
+ID トークン検証のベンチマーク（ネットワーク不要）。
+ローカルで RSA 鍵を作り、SDK と同じ形式のトークンを OfflineVerifier で検証する。
+  python -m app.scripts.bench_jwt_verify --tokens 200 --rounds 20
+--keys-file を付けると {kid: 公開鍵PEM} を書き出す（AUTH_KEYS_SOURCE=file:... で API の負荷試験に使える）。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.core.jwt_verifier import OfflineVerifier, StaticKeySource
+from app.core.token_cache import VerifiedTokenCache
+
+PROJECT = "bench-project"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--keys-file")
+    args = parser.parse_args()
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if args.keys_file:
+        pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+        with open(args.keys_file, "w", encoding="utf-8") as f:
+            json.dump({"bench": pem}, f)
+
+    now = int(time.time())
+    tokens = [
+        jwt.encode(
+            {"iss": f"https://securetoken.google.com/{PROJECT}", "aud": PROJECT, "sub": f"uid-{i}",
+             "iat": now, "auth_time": now, "exp": now + 3600},
+            key, algorithm="RS256", headers={"kid": "bench"},
+        )
+        for i in range(args.tokens)
+    ]
+    verifier = OfflineVerifier(PROJECT, StaticKeySource({"bench": key.public_key()}))
+    verifier.refresh()
+    cache = VerifiedTokenCache(maxsize=args.tokens)
+
+    n = args.tokens * args.rounds
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for t in tokens:
+            verifier.verify(t)
+    verify_sec = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for t in tokens:
+            if cache.get(t) is None:
+                claims = verifier.verify(t)
+                cache.set(t, claims, claims["exp"])
+    cached_sec = time.perf_counter() - t0
+
+    print(f"tokens={args.tokens} rounds={args.rounds}")
+    print(f"  offline verify : {n / verify_sec:10.0f} ops/s  ({verify_sec / n * 1e6:7.1f} us/op)")
+    print(f"  + token cache  : {n / cached_sec:10.0f} ops/s  ({cached_sec / n * 1e6:7.1f} us/op)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+保存列 lat/lng と ST_Y/ST_X(geom::geometry) の1行あたりコストを比較するベンチマーク。
+一時テーブル（TEMP）に合成データを作るので本番データには触れない。
+
+使い方:
+  docker compose exec backend bash -lc "python -m app.scripts.bench_latlng --rows 200000 --repeat 5"
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app.db.session import engine
+
+SETUP_SQL = """
+    CREATE TEMP TABLE bench_shelters (
+        id bigint PRIMARY KEY,
+        geom geography(Point, 4326) NOT NULL,
+        lat double precision GENERATED ALWAYS AS (ST_Y(geom::geometry)) STORED,
+        lng double precision GENERATED ALWAYS AS (ST_X(geom::geometry)) STORED
+    ) ON COMMIT DROP
+"""
+
+# 日本付近にランダムな点を作る
+FILL_SQL = """
+    INSERT INTO bench_shelters (id, geom)
+    SELECT g, ST_SetSRID(ST_MakePoint(129 + random() * 16, 30 + random() * 15), 4326)::geography
+    FROM generate_series(1, :rows) AS g
+"""
+
+# 集約だけして結果転送のコストを除く（読み取り経路の式評価コストを比べる）
+QUERIES = {
+    "ST_Y/ST_X(geom::geometry)": "SELECT sum(ST_Y(geom::geometry) + ST_X(geom::geometry)) FROM bench_shelters",
+    "stored lat/lng": "SELECT sum(lat + lng) FROM bench_shelters",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        conn.execute(text(SETUP_SQL))
+        conn.execute(text(FILL_SQL), {"rows": args.rows})
+        conn.execute(text("ANALYZE bench_shelters"))
+        # 1回空読みしてキャッシュを温める
+        for sql in QUERIES.values():
+            conn.execute(text(sql)).scalar()
+
+        print(f"rows={args.rows} repeat={args.repeat}")
+        results = {}
+        for name, sql in QUERIES.items():
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                conn.execute(text(sql)).scalar()
+                samples.append(time.perf_counter() - t0)
+            med = statistics.median(samples)
+            results[name] = med
+            print(f"  {name:<28} median {med * 1000:8.1f} ms  ({med / args.rows * 1e9:7.1f} ns/row)")
+
+        base, stored = results["ST_Y/ST_X(geom::geometry)"], results["stored lat/lng"]
+        print(f"  speedup: x{base / stored:.2f}  (saved {(base - stored) / args.rows * 1e9:.1f} ns/row)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 import sys, os, csv, uuid
 from sqlalchemy import text
 from app.db.session import engine
+from app.crud.shelter import bump_data_version
+from app.services.shelter_cache import shelter_cache
 
 CSV_PATH = os.path.join(os.path.dirname(__file__), "../../data/shelters_seed.csv")
 
@@ -43,6 +45,10 @@ def run():
                 "lat": lat,              # ← CSVはlat,lng
                 "lng": lng,              # ← ST_MakePointはlng,latで呼び出す（正）
             })
+        # 同じトランザクションでデータ版を上げる（/shelters の ETag が変わる）
+        bump_data_version(conn)
+    # /shelters の応答キャッシュを無効化（Redis 不通なら何もしない）
+    shelter_cache.bump_version()
 
 if __name__ == "__main__":
     run()
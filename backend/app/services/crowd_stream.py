@@ -0,0 +1,195 @@
+# backend/app/services/crowd_stream.py
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from app.services.shelter_cache import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# 1=ON で混雑度の変更を Redis に publish し、GET /shelters/stream で配信（既定は OFF）
+SHELTER_STREAM_ENABLED = os.getenv("SHELTER_STREAM_ENABLED", "0") == "1"
+# 秒。無通信でも切られないよう SSE コメントを送る間隔
+SHELTER_STREAM_HEARTBEAT = float(os.getenv("SHELTER_STREAM_HEARTBEAT", "15"))
+# 1接続あたり未送信で溜めておく避難所数。超えたら個別送信をやめ resync を1回送る
+SHELTER_STREAM_MAX_PENDING = int(os.getenv("SHELTER_STREAM_MAX_PENDING", "256"))
+
+CHANNEL = "shelters:crowd"
+
+# Redis 障害時の再接続・再 publish までの待ち時間
+_BACKOFF_SEC = 5.0
+
+Event = Dict[str, Any]   # {"id", "crowd_level", "lat", "lng", "version"}
+
+
+class Subscriber:
+    """
+    1接続ぶんの状態。数万接続を保持できるよう最小限にする。
+    - pending は避難所ID→最新イベント（同じ避難所の変更は上書きで1件にまとまる）
+    - 上限を超えたら中身を捨てて overflow を立てる（クライアントは一覧を取り直す）
+    """
+
+    __slots__ = ("ids", "bbox", "pending", "overflow", "wakeup")
+
+    def __init__(self, ids: Optional[FrozenSet[str]], bbox: Optional[Tuple[float, float, float, float]]) -> None:
+        self.ids = ids
+        self.bbox = bbox
+        self.pending: Optional[Dict[str, Event]] = None
+        self.overflow = False
+        self.wakeup = asyncio.Event()
+
+    def wants(self, event: Event) -> bool:
+        if self.ids is not None and event["id"] not in self.ids:
+            return False
+        if self.bbox is not None:
+            lat, lng = event.get("lat"), event.get("lng")
+            if lat is None or lng is None:
+                return False
+            min_lng, min_lat, max_lng, max_lat = self.bbox
+            return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        return True
+
+    def push(self, event: Event) -> None:
+        if self.overflow:
+            return
+        if self.pending is None:
+            self.pending = {}
+        self.pending[event["id"]] = event
+        if len(self.pending) > SHELTER_STREAM_MAX_PENDING:
+            self.pending = None
+            self.overflow = True
+        self.wakeup.set()
+
+    def drain(self) -> Tuple[List[Event], bool]:
+        events = list(self.pending.values()) if self.pending else []
+        overflow = self.overflow
+        self.pending = None
+        self.overflow = False
+        self.wakeup.clear()
+        return events, overflow
+
+
+class CrowdStreamHub:
+    """
+    ワーカー単位のファンアウト。
+    - Redis チャンネルの購読はワーカーごとに1本だけ（最初の接続時に開始）
+    - 受け取ったイベントを接続中の Subscriber に配る（各接続は自分の wakeup を待つだけ）
+    - Redis へ publish できないときは自ワーカーの接続にだけ直接配る
+    """
+
+    def __init__(self, url: str = REDIS_URL) -> None:
+        self.url = url
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.delivered = 0
+        self.errors = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[redis.Redis] = None
+        self._down_until = 0.0
+
+    # ---- 購読側 -----------------------------------------------------------
+    def subscribe(self, ids=None, bbox=None) -> Subscriber:
+        """async コンテキストから呼ぶ"""
+        self._loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._listen())
+        sub = Subscriber(frozenset(ids) if ids else None, bbox)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    def dispatch(self, events: List[Event]) -> None:
+        """イベントループ上で呼ぶ"""
+        for sub in self.subscribers:
+            for event in events:
+                if sub.wants(event):
+                    sub.push(event)
+                    self.delivered += 1
+
+    async def _listen(self) -> None:
+        while True:
+            client = aioredis.from_url(self.url)
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    try:
+                        self.dispatch(json.loads(message["data"]))
+                    except (ValueError, TypeError, KeyError) as e:
+                        logger.warning({"event": "crowd_stream_bad_message", "error": str(e)})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # 接続断など。少し待って張り直す
+                self.errors += 1
+                logger.warning({"event": "crowd_stream_subscribe_error", "error": str(e)})
+                await asyncio.sleep(_BACKOFF_SEC)
+            finally:
+                await client.close()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    # ---- 配信側（同期ハンドラから呼ぶ） -----------------------------------
+    def publish(self, events: List[Event]) -> None:
+        """commit 後に呼ぶ。まとめて1メッセージで送る"""
+        if not events:
+            return
+        payload = json.dumps(events, ensure_ascii=False, separators=(",", ":"))
+        if time.monotonic() >= self._down_until:
+            try:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(
+                        self.url, socket_timeout=0.2, socket_connect_timeout=0.2,
+                    )
+                self._client.publish(CHANNEL, payload)
+                self.published += 1
+                return
+            except redis.RedisError as e:
+                self.errors += 1
+                self._down_until = time.monotonic() + _BACKOFF_SEC
+                logger.warning({"event": "crowd_stream_publish_error", "error": str(e)})
+        # Redis 不通: 少なくとも自ワーカーの接続には届ける
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.dispatch, events)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self.subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "errors": self.errors,
+        }
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+# ワーカー単位で共有するインスタンス
+crowd_stream = CrowdStreamHub()
+
+
+def stream_enabled() -> bool:
+    return SHELTER_STREAM_ENABLED
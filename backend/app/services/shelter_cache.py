@@ -0,0 +1,146 @@
+# backend/app/services/shelter_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+from app.core.metrics import redis_command_duration
+
+logger = logging.getLogger(__name__)
+
+# 1=ON で GET /shelters の応答を Redis にキャッシュ（既定は OFF）
+SHELTER_CACHE_ENABLED = os.getenv("SHELTER_CACHE_ENABLED", "0") == "1"
+# 秒。短 TTL（性能設計書 4章: 読み取り中心はキャッシュ層）
+SHELTER_CACHE_TTL = int(os.getenv("SHELTER_CACHE_TTL", "30"))
+# 度。lat/lng をこの格子に丸めて近くの利用者で同じエントリを共有する（0.005度 ≒ 550m）
+SHELTER_CACHE_GRID_DEG = float(os.getenv("SHELTER_CACHE_GRID_DEG", "0.005"))
+# FastAPILimiter と同じ Redis を使う
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+# デバッグ用: このヘッダが付いたリクエストはキャッシュを読まない（結果は書き戻す）
+BYPASS_HEADER = "x-cache-bypass"
+
+VERSION_KEY = "shelters:version"
+KEY_PREFIX = "shelters:list"
+
+# Redis 障害時はしばらく問い合わせない（毎リクエストでタイムアウトを待たない）
+_BACKOFF_SEC = 30.0
+
+
+class ShelterCache:
+    """
+    /shelters 応答の read-through キャッシュ。
+    - キー: shelters:list:v{データ版}:{パラメータのハッシュ}
+    - 無効化: 書き込み側が bump_version() で版を上げる（古いキーは TTL で消える）
+    - Redis が落ちていても例外は出さず、DB 直行にフォールバックする
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = SHELTER_CACHE_TTL) -> None:
+        self.url = url
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._client: Optional[redis.Redis] = None
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    # ---- 接続 -------------------------------------------------------------
+    def _redis(self) -> Optional[redis.Redis]:
+        if time.monotonic() < self._down_until:
+            return None
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(
+                        self.url, socket_timeout=0.2, socket_connect_timeout=0.2,
+                    )
+        return self._client
+
+    def _failed(self, e: Exception) -> None:
+        self.errors += 1
+        self._down_until = time.monotonic() + _BACKOFF_SEC
+        logger.warning({"event": "shelter_cache_error", "error": str(e)})
+
+    # ---- キー -------------------------------------------------------------
+    @staticmethod
+    def snap(value: Optional[float]) -> Optional[float]:
+        """座標を格子点に丸める（None はそのまま）"""
+        if value is None:
+            return None
+        return round(round(value / SHELTER_CACHE_GRID_DEG) * SHELTER_CACHE_GRID_DEG, 6)
+
+    @staticmethod
+    def key_for(version: int, params: Any) -> str:
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:v{version}:{digest}"
+
+    # ---- 読み書き ---------------------------------------------------------
+    def get(self, params: Any, read: bool = True) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        (キャッシュ済み JSON, 書き戻し用キー) を返す。Redis 不通ならキーも None。
+        read=False はキーだけ求める（バイパス時。ヒット/ミスには数えない）
+        """
+        r = self._redis()
+        if r is None:
+            return None, None
+        t0 = time.perf_counter()
+        try:
+            version = int(r.get(VERSION_KEY) or 0)
+            key = self.key_for(version, params)
+            body = r.get(key) if read else None
+        except redis.RedisError as e:
+            self._failed(e)
+            return None, None
+        redis_command_duration.observe(time.perf_counter() - t0, "shelter_cache")
+        if not read:
+            return None, key
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body, key
+
+    def set(self, key: str, body: bytes) -> None:
+        r = self._redis()
+        if r is None:
+            return
+        try:
+            r.set(key, body, ex=self.ttl)
+        except redis.RedisError as e:
+            self._failed(e)
+
+    def bump_version(self) -> None:
+        """避難所データが変わったら呼ぶ。全エントリが一斉に無効になる"""
+        r = self._redis()
+        if r is None:
+            return
+        try:
+            r.incr(VERSION_KEY)
+        except redis.RedisError as e:
+            self._failed(e)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+# ワーカー単位で共有するインスタンス
+shelter_cache = ShelterCache()
+
+
+def cache_enabled() -> bool:
+    return SHELTER_CACHE_ENABLED
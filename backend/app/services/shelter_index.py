@@ -0,0 +1,322 @@
+# backend/app/services/shelter_index.py
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.crud.shelter import (
+    CURSOR_DISTANCE_EPS_M,
+    SPHERE_RADIUS_M,
+    decode_cursor,
+    get_data_version,
+    normalize_search_text,
+    normalize_shelter_type,
+)
+
+# 1=ON で GET /shelters をインメモリ索引で応答（既定は OFF = 従来どおり PostGIS）
+SHELTER_INDEX_ENABLED = os.getenv("SHELTER_INDEX_ENABLED", "0") == "1"
+# 秒。データ版を上げない更新も拾うための全件再読込間隔（版が上がった更新は次のリクエストで拾う）
+SHELTER_INDEX_TTL = float(os.getenv("SHELTER_INDEX_TTL", "60"))
+# グリッド1セルの大きさ（度）。0.05度 ≒ 5.5km
+SHELTER_INDEX_GRID_DEG = float(os.getenv("SHELTER_INDEX_GRID_DEG", "0.05"))
+
+# SQL 側（ST_Distance / ST_DWithin の use_spheroid=false）と同じ球
+EARTH_RADIUS_M = SPHERE_RADIUS_M
+_M_PER_DEG_LAT = EARTH_RADIUS_M * math.pi / 180.0
+
+LOAD_SQL = text("""
+    SELECT
+        id::text AS id,
+        name,
+        address,
+        type::text AS type,
+        capacity,
+        crowd_level::text AS crowd_level,
+        lat,
+        lng,
+        search_text,
+        capabilities
+    FROM shelters
+""")
+
+
+def haversine_m(lat1: float, lng1: float, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    """1点 → 多点の大円距離（m）をベクトル化して計算"""
+    p1 = math.radians(lat1)
+    p2 = np.radians(lat2)
+    dphi = p2 - p1
+    dlmb = np.radians(lng2) - math.radians(lng1)
+    a = np.sin(dphi / 2.0) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dlmb / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+@dataclass
+class _Snapshot:
+    """読み込み時点の全避難所（列指向）。差し替えは丸ごと行うので参照中は不変。"""
+    ids: np.ndarray          # object(str)
+    names: np.ndarray        # object(str)
+    addresses: np.ndarray    # object(str | None)
+    types: np.ndarray        # object(str)
+    capacities: np.ndarray   # int64
+    crowd: np.ndarray        # object(str | None) ※混雑度だけはその場で更新する
+    lat: np.ndarray          # float64
+    lng: np.ndarray          # float64
+    caps: np.ndarray         # int64（ShelterCapability のビット和）
+    haystack: np.ndarray     # str（DB の search_text = 正規化済み name/読み/address）
+    pos: Dict[str, int]      # id -> 行番号
+    grid: Dict[Tuple[int, int], np.ndarray]  # セル -> 行番号配列
+    loaded_at: float
+    version: int = 0         # 内容が表すデータ版（shelters_data_version。読み込み前に読んだ値）
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return (math.floor(lat / SHELTER_INDEX_GRID_DEG), math.floor(lng / SHELTER_INDEX_GRID_DEG))
+
+
+def _build_snapshot(rows: List[Dict[str, Any]], version: int = 0) -> _Snapshot:
+    n = len(rows)
+    ids = np.array([r["id"] for r in rows], dtype=object)
+    names = np.array([r["name"] or "" for r in rows], dtype=object)
+    addresses = np.array([r["address"] for r in rows], dtype=object)
+    types = np.array([r["type"] for r in rows], dtype=object)
+    capacities = np.array([r["capacity"] or 0 for r in rows], dtype=np.int64)
+    crowd = np.array([r["crowd_level"] for r in rows], dtype=object)
+    lat = np.array([r["lat"] for r in rows], dtype=np.float64)
+    lng = np.array([r["lng"] for r in rows], dtype=np.float64)
+    caps = np.array([r["capabilities"] or 0 for r in rows], dtype=np.int64)
+    haystack = np.array([r["search_text"] or "" for r in rows], dtype=str) if n else np.array([], dtype=str)
+
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for i in range(n):
+        buckets.setdefault(_cell(lat[i], lng[i]), []).append(i)
+    grid = {k: np.array(v, dtype=np.int64) for k, v in buckets.items()}
+
+    return _Snapshot(
+        ids=ids, names=names, addresses=addresses, types=types, capacities=capacities,
+        crowd=crowd, lat=lat, lng=lng, caps=caps, haystack=haystack,
+        pos={sid: i for i, sid in enumerate(ids)}, grid=grid, loaded_at=time.monotonic(),
+        version=version,
+    )
+
+
+class ShelterIndex:
+    """
+    shelters テーブルのインメモリスナップショット + グリッド索引。
+    - 半径検索: 候補セルだけを取り出し、haversine をベクトル計算
+    - 表示範囲（bbox）検索: 掛かるセルだけを取り出し、緯度経度の範囲で絞る
+    - type/crowd_level/capabilities/keyword（search_text の部分一致）はマスクで絞り込み
+      ※ あいまい検索・類似度順は pg_trgm 側の担当（router はキーワード付きを SQL へ回す）
+    - 混雑度更新は apply_crowd_level で自ワーカー分を即時反映。
+      他ワーカーの更新はデータ版で検知して全件再読込（ensure_version）。版を上げない更新は TTL で拾う
+    """
+
+    def __init__(self, ttl: float = SHELTER_INDEX_TTL) -> None:
+        self.ttl = ttl
+        self._snap: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    # ---- 読み込み ---------------------------------------------------------
+    def load(self, db: Session) -> _Snapshot:
+        # 版を先に読む（後から読む行はその版以降の内容。版を実際より古く見積もるだけで、新しく見積もらない）
+        version, _ = get_data_version(db)
+        rows = [dict(r) for r in db.execute(LOAD_SQL).mappings().all()]
+        snap = _build_snapshot(rows, version)
+        self._snap = snap
+        return snap
+
+    def ensure_version(self, db: Session, version: int) -> Optional[int]:
+        """
+        データ版 version 以降の内容で応答できるようにし、その版を返す。
+        古ければ再読込する。他スレッドが再読込中なら待たずに None（呼び出し側は SQL で応答する）
+        """
+        snap = self._snap
+        if snap is not None and snap.version >= version:
+            return snap.version
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            snap = self._snap
+            if snap is None or snap.version < version:
+                snap = self.load(db)
+        finally:
+            self._lock.release()
+        return snap.version if snap.version >= version else None
+
+    def invalidate(self) -> None:
+        self._snap = None
+
+    def _ensure(self, db: Session) -> _Snapshot:
+        snap = self._snap
+        if snap is not None and time.monotonic() - snap.loaded_at < self.ttl:
+            return snap
+        if snap is None:
+            with self._lock:
+                return self._snap or self.load(db)
+        # 期限切れ: 再読込は1スレッドだけ。他は古いスナップショットで応答を続ける
+        if self._lock.acquire(blocking=False):
+            try:
+                return self.load(db)
+            finally:
+                self._lock.release()
+        return snap
+
+    # ---- 更新 -------------------------------------------------------------
+    def apply_crowd_level(self, shelter_id: str, level: Optional[str]) -> bool:
+        """混雑度の変更を1行だけ反映（commit 後に呼ぶ）。未読込/未登録なら False"""
+        snap = self._snap
+        if snap is None:
+            return False
+        i = snap.pos.get(str(shelter_id))
+        if i is None:
+            # 新規行は次回の全件再読込で拾う
+            self.invalidate()
+            return False
+        snap.crowd[i] = getattr(level, "value", level)
+        return True
+
+    def advance_version(self, version: int) -> None:
+        """
+        自ワーカーの更新（apply_crowd_level 済み）で上がった版を記録する。
+        直前の版の内容を持っているときだけ（間に他ワーカーの更新があれば再読込に任せる）
+        """
+        snap = self._snap
+        if snap is not None and snap.version == version - 1:
+            snap.version = version
+
+    # ---- 検索 -------------------------------------------------------------
+    def _cells(self, snap: _Snapshot, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> np.ndarray:
+        """矩形に掛かるセルの行番号をまとめて返す（矩形内かどうかの厳密判定は呼び出し側）"""
+        (y0, x0), (y1, x1) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > len(snap.grid):
+            # 範囲がセル数より広い → 全セルを走査した方が速い
+            parts = list(snap.grid.values())
+        else:
+            parts = [
+                snap.grid[(y, x)]
+                for y in range(y0, y1 + 1)
+                for x in range(x0, x1 + 1)
+                if (y, x) in snap.grid
+            ]
+        if not parts:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(parts)
+
+    def _candidates(self, snap: _Snapshot, lat: float, lng: float, dist_m: float) -> np.ndarray:
+        dlat = dist_m / _M_PER_DEG_LAT
+        coslat = max(math.cos(math.radians(lat)), 1e-6)
+        # 球面上の円の経度方向の最大幅（距離/cos(緯度) より少し広い。境目の点を候補から落とさない）
+        ratio = math.sin(min(dist_m / EARTH_RADIUS_M, math.pi / 2)) / coslat
+        dlng = 180.0 if ratio >= 1.0 else min(math.degrees(math.asin(ratio)), 180.0)
+        return self._cells(snap, lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+    def query(
+        self,
+        db: Session,
+        type: Optional[str],
+        crowd_level: Optional[str],
+        lat: Optional[float],
+        lng: Optional[float],
+        radius_km: float,
+        q: Optional[str],
+        limit: int,
+        offset: int,
+        cursor: Optional[str] = None,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        sort: Optional[str] = None,
+        capabilities: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """crud.shelter.get_shelters と同じ引数・同じ並び順・同じ形で返す"""
+        snap = self._ensure(db)
+        type = normalize_shelter_type(type)
+        has_point = lat is not None and lng is not None
+        kind = None if sort == "none" else ("d" if has_point else "n")
+        seek = decode_cursor(cursor) if cursor else None
+        if seek and (kind is None or seek[0] != kind):
+            raise ValueError("cursor does not match sort order")
+
+        if bbox is not None:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            idx = self._cells(snap, min_lat, min_lng, max_lat, max_lng)
+            if idx.size:
+                la, ln = snap.lat[idx], snap.lng[idx]
+                idx = idx[(la >= min_lat) & (la <= max_lat) & (ln >= min_lng) & (ln <= max_lng)]
+        elif has_point:
+            idx = self._candidates(snap, lat, lng, float(radius_km) * 1000.0)
+        else:
+            idx = np.arange(len(snap), dtype=np.int64)
+
+        if idx.size and type:
+            idx = idx[snap.types[idx] == type]
+        if idx.size and crowd_level:
+            idx = idx[snap.crowd[idx] == crowd_level]
+        if idx.size and capabilities:
+            mask = int(capabilities)
+            idx = idx[(snap.caps[idx] & mask) == mask]
+        if idx.size and q:
+            idx = idx[np.char.find(snap.haystack[idx], normalize_search_text(q)) >= 0]
+
+        dist: Optional[np.ndarray] = None
+        if has_point and idx.size and (kind == "d" or bbox is None):
+            dist = haversine_m(lat, lng, snap.lat[idx], snap.lng[idx])
+            if bbox is None:
+                keep = dist <= float(radius_km) * 1000.0
+                idx, dist = idx[keep], dist[keep]
+            if kind is None:
+                dist = None  # sort=none では距離を返さない（SQL 側と同じ形）
+
+        if idx.size and kind is None:
+            idx = idx[offset:offset + limit]
+        elif idx.size:
+            primary = dist if dist is not None else snap.names[idx].astype(str)
+            ids = snap.ids[idx].astype(str)
+            if seek:
+                _, c_value, c_id = seek
+                if dist is not None:
+                    # SQL 側と同じく誤差幅内は同じ距離として id で比べる
+                    after = (primary > c_value + CURSOR_DISTANCE_EPS_M) | (
+                        (primary >= c_value - CURSOR_DISTANCE_EPS_M) & (ids > c_id)
+                    )
+                else:
+                    after = (primary > c_value) | ((primary == c_value) & (ids > c_id))
+                idx, primary, ids = idx[after], primary[after], ids[after]
+                if dist is not None:
+                    dist = dist[after]
+                offset = 0
+            order = np.lexsort((ids, primary))[offset:offset + limit]
+            idx = idx[order]
+            if dist is not None:
+                dist = dist[order]
+
+        return [
+            {
+                "id": snap.ids[i],
+                "name": snap.names[i],
+                "address": snap.addresses[i],
+                "type": snap.types[i],
+                "capacity": int(snap.capacities[i]),
+                "crowd_level": snap.crowd[i],
+                "lat": float(snap.lat[i]),
+                "lng": float(snap.lng[i]),
+                **({"distance_m": float(dist[k])} if dist is not None else {}),
+            }
+            for k, i in enumerate(idx.tolist())
+        ]
+
+
+# ワーカー単位で共有するインスタンス
+shelter_index = ShelterIndex()
+
+
+def index_enabled() -> bool:
+    return SHELTER_INDEX_ENABLED
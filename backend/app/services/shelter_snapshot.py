@@ -0,0 +1,128 @@
+# backend/app/services/shelter_snapshot.py
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.crud.shelter import OFFLINE_COLUMNS, OFFLINE_SELECT, get_change_watermark
+from app.models.shelter import ShelterCapability
+from app.services.shelter_version import shelter_version
+
+try:  # brotli は任意（入っていれば br も配る）
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+SNAPSHOT_SQL = text(f"SELECT {OFFLINE_SELECT} FROM shelters ORDER BY id")
+
+
+@dataclass
+class Snapshot:
+    """1つのデータ版に対する圧縮済み表現（生成後は不変。リクエストごとに再シリアライズしない）"""
+    version: int
+    etag_base: str                          # 非圧縮 JSON の内容ハッシュ
+    count: int
+    change_version: int                     # 差分同期の開始位置（本文には含めずヘッダで返す）
+    bodies: Dict[str, bytes] = field(default_factory=dict)   # {"identity"|"gzip"|"br": bytes}
+
+    def etag(self, encoding: str) -> str:
+        # 強い ETag は表現（圧縮方式）ごとに別にする
+        suffix = "" if encoding == "identity" else f"-{encoding}"
+        return f'"{self.etag_base}{suffix}"'
+
+
+def encode_snapshot(version: int, rows: List[Dict[str, Any]]) -> bytes:
+    """
+    列指向 JSON: {"version", "count", "columns", "capability_bits", "data": [[列0...], [列1...], ...]}
+    キー名の繰り返しが無いので行指向より小さく、gzip も効きやすい。
+    本文は行データだけで決まる（同じ版ならどのワーカーが作っても同じバイト列＝同じ強い ETag）。
+    作成時点で変わる change_version は本文に入れず X-Shelters-Change-Version ヘッダで返す。
+    """
+    doc = {
+        "version": version,
+        "count": len(rows),
+        "columns": OFFLINE_COLUMNS,
+        "capability_bits": {c.name: int(c) for c in ShelterCapability},
+        "data": [[r[c] for r in rows] for c in OFFLINE_COLUMNS],
+    }
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ShelterSnapshotStore:
+    """
+    全避難所のオフライン用スナップショットをメモリに保持する。
+    データ版（shelter_version）が変わったときだけ DB から作り直す。
+    """
+
+    def __init__(self) -> None:
+        self._snap: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+
+    def build(self, db: Session, version: int) -> Snapshot:
+        # 先に確定済みの位置を読む（後から読む行と重複はしても取りこぼさない）
+        change_version = get_change_watermark(db)
+        rows = [dict(r) for r in db.execute(SNAPSHOT_SQL).mappings().all()]
+        raw = encode_snapshot(version, rows)
+        digest = hashlib.sha256(raw).hexdigest()[:32]
+        snap = Snapshot(version=version, etag_base=digest, count=len(rows), change_version=change_version)
+        snap.bodies["identity"] = raw
+        snap.bodies["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+        if brotli is not None:
+            snap.bodies["br"] = brotli.compress(raw, quality=11)
+        return snap
+
+    def get(self, db: Session) -> Snapshot:
+        version, _ = shelter_version.current(db)
+        snap = self._snap
+        if snap is not None and snap.version == version:
+            return snap
+        with self._lock:
+            snap = self._snap
+            if snap is None or snap.version != version:
+                snap = self.build(db, version)
+                self._snap = snap
+        return snap
+
+    def invalidate(self) -> None:
+        self._snap = None
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Dict[str, bytes]) -> str:
+    """Accept-Encoding から br > gzip > identity の順で選ぶ（q=0 は除外）"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and _q_is_zero(q[2:]):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    for enc in ("br", "gzip"):
+        if enc in available and (enc in accepted or "*" in accepted):
+            return enc
+    return "identity"
+
+
+def _q_is_zero(value: str) -> bool:
+    try:
+        return float(value) == 0.0
+    except ValueError:
+        return False
+
+
+def strong_match(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match の比較（スナップショットは強い ETag なので完全一致）"""
+    if not if_none_match:
+        return False
+    return any(t.strip() in (etag, "*") for t in if_none_match.split(","))
+
+
+# ワーカー単位で共有するインスタンス
+shelter_snapshot = ShelterSnapshotStore()
@@ -0,0 +1,76 @@
+# backend/app/services/shelter_version.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from datetime import timezone
+from email.utils import format_datetime
+from typing import Any, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.crud.shelter import get_data_version
+
+# 秒。データ版をワーカー内で覚えておく時間（この間の条件付き GET は DB を引かない）
+# 他ワーカーでの更新はこの秒数以内に ETag へ反映される
+SHELTER_VERSION_TTL = float(os.getenv("SHELTER_VERSION_TTL", "2"))
+
+
+class ShelterVersion:
+    """
+    shelters_data_version（DB が正）を短時間メモ化して ETag / Last-Modified を作る。
+    - 同じワーカーでの更新は remember() で即時反映
+    - 他ワーカーの更新は TTL 経過後の再読込で反映
+    """
+
+    def __init__(self, ttl: float = SHELTER_VERSION_TTL) -> None:
+        self.ttl = ttl
+        # (version, updated_at, 取得時刻) をまとめて差し替える（ロック不要）
+        self._memo: Optional[Tuple[int, Any, float]] = None
+
+    def current(self, db: Session) -> Tuple[int, Any]:
+        memo = self._memo
+        if memo is not None and time.monotonic() - memo[2] < self.ttl:
+            return memo[0], memo[1]
+        version, updated_at = get_data_version(db)
+        self.remember(version, updated_at)
+        return version, updated_at
+
+    def remember(self, version: int, updated_at: Any) -> None:
+        """書き込み側がコミット後に呼ぶ"""
+        self._memo = (version, updated_at, time.monotonic())
+
+    def invalidate(self) -> None:
+        self._memo = None
+
+    # ---- 検証子 -----------------------------------------------------------
+    @staticmethod
+    def etag_for(version: int, params: Any) -> str:
+        """版 + リクエストパラメータから弱い ETag（同じ意味の JSON なら一致すればよい）"""
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+        return f'W/"v{version}-{digest}"'
+
+    @staticmethod
+    def last_modified(updated_at: Any) -> Optional[str]:
+        if updated_at is None:
+            return None
+        return format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        """If-None-Match の弱い比較（W/ の有無は無視、* は常に一致）"""
+        if not if_none_match:
+            return False
+        want = etag.removeprefix("W/")
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == want:
+                return True
+        return False
+
+
+# ワーカー単位で共有するインスタンス
+shelter_version = ShelterVersion()
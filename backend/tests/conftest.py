@@ -70,6 +70,14 @@ def override_get_db(db_session: Session):
     yield
     app.dependency_overrides.clear()
 
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """uid → ユーザーのキャッシュはワーカー共有。巻き戻したテストの行を次のテストに持ち越さない"""
+    from app.core.user_cache import user_cache
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
 # ---------- Firebase / Stripe モック ----------
 @pytest.fixture(autouse=True)
 def mock_firebase(monkeypatch):
@@ -13,6 +13,9 @@ def create_shelter(
     type: str = "accompany",   # ← Enumに合わせる：accompany / companion
     capacity: int = 0,
     address: Optional[str] = None,
+    name_kana: Optional[str] = None,
+    has_pet_space: bool = False,
+    is_emergency_flood: bool = False,
 ):
     """
     shelters は id(UUID), name, type(Enum), geom(Geography(Point,4326)) が必須。
@@ -22,8 +25,10 @@ def create_shelter(
     sid = str(uuid.uuid4())
 
     sql = text("""
-        INSERT INTO shelters (id, name, address, type, capacity, geom)
-        VALUES (:id, :name, :address, :type, :capacity,
+        INSERT INTO shelters (id, name, name_kana, address, type, capacity,
+                              has_pet_space, is_emergency_flood, geom)
+        VALUES (:id, :name, :name_kana, :address, :type, :capacity,
+                :has_pet_space, :is_emergency_flood,
                 ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography)
         RETURNING id
     """)
@@ -31,9 +36,12 @@ def create_shelter(
     rid = db.execute(sql, {
         "id": sid,
         "name": name,
+        "name_kana": name_kana,
         "address": address,
         "type": type,   # "accompany" or "companion"
         "capacity": capacity,
+        "has_pet_space": has_pet_space,
+        "is_emergency_flood": is_emergency_flood,
         "lat": lat,
         "lng": lng,
     }).scalar_one()
@@ -0,0 +1,74 @@
+# backend/tests/test_auth_context.py
+from __future__ import annotations
+
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+
+from app.core import deps
+from app.core import firebase_auth as fb
+from app.core.deps import (
+    AuthContext,
+    get_auth_context,
+    get_current_user,
+    get_current_user_record,
+)
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.fixture()
+def verify_calls(monkeypatch):
+    calls = []
+
+    def fake_verify(id_token, *args, **kwargs):
+        calls.append(id_token)
+        return {"uid": "test-uid-ctx", "email": "ctx@example.com", "premium": True}
+
+    monkeypatch.setattr(fb.auth, "verify_id_token", fake_verify, raising=True)
+    monkeypatch.setattr(fb, "_init_app", lambda: None)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_auth_resolved_once_per_request(db_session, verify_calls):
+    """レコード・ORM User・claims を同時に要求しても検証は1回、ユーザーは同じもの"""
+    mini = FastAPI()
+
+    @mini.get("/probe")
+    def probe(
+        record=Depends(get_current_user_record),
+        user=Depends(get_current_user),
+        ctx: AuthContext = Depends(get_auth_context),
+    ):
+        return {"record": str(record.id), "user": str(user.id), "ctx": str(ctx.user_id), "premium": ctx.is_premium}
+
+    def _db():
+        yield db_session
+
+    mini.dependency_overrides[deps.get_db] = _db
+    transport = ASGITransport(app=mini)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/probe", headers={"Authorization": "Bearer ctx.token"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["record"] == body["user"] == body["ctx"]
+    assert body["premium"] is True
+    assert verify_calls == ["ctx.token"]
+
+
+@pytest.mark.asyncio
+async def test_admin_check_uses_claims_only(db_session, verify_calls):
+    """管理者判定は claims だけで行い、非管理者なら 403（users の登録も起きない）"""
+    s = create_shelter(db_session, name="CtxAdmin", lat=35.0, lng=139.0)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.patch(
+            f"/shelters/{s.id}/crowd",
+            params={"level": "full"},
+            headers={"Authorization": "Bearer admin.token"},
+        )
+    assert r.status_code == 403
+    assert verify_calls == ["admin.token"]
+    from app.crud.user import get_user_record
+    assert get_user_record(db_session, "test-uid-ctx") is None
@@ -0,0 +1,78 @@
+# backend/tests/test_jwt_verifier.py
+from __future__ import annotations
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.core.jwt_verifier import KeySource, OfflineVerifier, StaticKeySource, TokenVerificationError
+
+PROJECT = "test-project"
+
+
+def _key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _token(private_key, kid="k1", **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT}",
+        "aud": PROJECT,
+        "sub": "uid-1",
+        "iat": now,
+        "auth_time": now,
+        "exp": now + 3600,
+        "email": "a@example.com",
+        "premium": True,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def test_offline_verifier_accepts_valid_and_rejects_bad_claims():
+    key = _key()
+    verifier = OfflineVerifier(PROJECT, StaticKeySource({"k1": key.public_key()}), leeway=0)
+
+    claims = verifier.verify(_token(key))
+    assert claims["uid"] == "uid-1" and claims["premium"] is True
+
+    bad = [
+        _token(key, aud="other-project"),
+        _token(key, iss="https://securetoken.google.com/other-project"),
+        _token(key, exp=int(time.time()) - 10),
+        _token(key, sub=""),
+        _token(key, auth_time=int(time.time()) + 600),
+        _token(_key()),                          # 別の鍵で署名
+    ]
+    for token in bad:
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(token)
+
+
+def test_offline_verifier_refetches_on_unknown_kid():
+    """鍵ローテーション直後の未知 kid は1回だけ取り直して検証できる"""
+    old, new = _key(), _key()
+    source = StaticKeySource({"old": old.public_key()})
+    verifier = OfflineVerifier(PROJECT, source)
+    verifier.refresh()
+    assert verifier.verify(_token(old, kid="old"))["uid"] == "uid-1"
+
+    source.keys = {"old": old.public_key(), "new": new.public_key()}
+    assert verifier.verify(_token(new, kid="new"))["uid"] == "uid-1"
+    assert verifier.refreshes == 2
+
+    # 直後の未知 kid では取得元を叩かずに拒否
+    with pytest.raises(TokenVerificationError):
+        verifier.verify(_token(new, kid="missing"))
+    assert verifier.refreshes == 2
+
+
+def test_key_source_requires_fetch():
+    """取得元は fetch() を実装しないと作れない"""
+    class NoFetch(KeySource):
+        pass
+
+    with pytest.raises(TypeError):
+        NoFetch()
@@ -0,0 +1,51 @@
+# backend/tests/test_logging_queue.py
+from __future__ import annotations
+import logging
+import queue
+
+from app.core.logging import DroppingQueueHandler
+
+
+def _record(level: int) -> logging.LogRecord:
+    return logging.LogRecord("app.test", level, __file__, 1, {"event": "x"}, None, None)
+
+
+def test_queue_handler_drops_debug_first():
+    """キューが埋まってきたら DEBUG → INFO の順に捨て、WARNING 以上は満杯まで受ける"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=10))
+    for _ in range(20):
+        handler.handle(_record(logging.DEBUG))
+    assert handler.queue.qsize() == 5                       # DEBUG は 50% まで
+    for _ in range(20):
+        handler.handle(_record(logging.INFO))
+    assert handler.queue.qsize() == 9                       # INFO は 90% まで
+    for _ in range(5):
+        handler.handle(_record(logging.ERROR))
+    assert handler.queue.qsize() == 10
+
+    stats = handler.stats()
+    assert stats["dropped"] == {"DEBUG": 15, "INFO": 16, "ERROR": 4}
+    assert stats["enqueued"] == 10
+
+
+def test_queue_handler_defers_formatting():
+    """リクエスト側では整形しない（msg/args はそのまま出力スレッドへ渡る）"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=10))
+    rec = logging.LogRecord("app.test", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+    handler.handle(rec)
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "hello %s" and queued.args == ("world",)
+
+
+def test_queue_handler_copies_mutable_msg_and_args():
+    """記録後に呼び出し側が dict / list を書き換えても、キュー内のレコードは記録時の内容のまま"""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=10))
+    payload = {"event": "order", "items": 1}
+    tags = ["a"]
+    handler.handle(logging.LogRecord("app.test", logging.INFO, __file__, 1, payload, None, None))
+    handler.handle(logging.LogRecord("app.test", logging.INFO, __file__, 1, "tags=%s", (tags,), None))
+    payload["items"] = 2
+    tags.append("b")
+
+    assert handler.queue.get_nowait().msg == {"event": "order", "items": 1}
+    assert handler.queue.get_nowait().getMessage() == "tags=['a']"
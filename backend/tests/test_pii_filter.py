@@ -0,0 +1,44 @@
+# backend/tests/test_pii_filter.py
+from __future__ import annotations
+import logging
+
+from app.core.logging import PIIFilter
+
+
+def _record(msg, args=None, **extra) -> logging.LogRecord:
+    rec = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_pii_filter_masks_msg_args_and_extras():
+    flt = PIIFilter()
+    rec = _record({"event": "request", "headers": {"authorization": "Bearer abc.def", "host": "h"}})
+    flt.filter(rec)
+    assert rec.msg["headers"] == {"authorization": "Bearer ***", "host": "h"}
+
+    rec = _record("user %s", ("taro@example.com",), email="x@example.com", trace_id="t1")
+    flt.filter(rec)
+    assert rec.getMessage() == "user ***"
+    assert rec.email == "***" and rec.trace_id == "t1"
+
+
+def test_pii_filter_keeps_clean_values_untouched():
+    """PII が無ければ dict / args をそのまま使う（作り直さない）。数値も文字列化しない"""
+    flt = PIIFilter()
+    msg = {"event": "response", "status": 200, "items": [1, 2]}
+    args = ("10.0.0.1:5123", "GET", "/shelters", "1.1", 200)
+    rec = _record(msg)
+    flt.filter(rec)
+    assert rec.msg is msg
+    rec = _record('%s - "%s %s HTTP/%s" %d', args)
+    flt.filter(rec)
+    assert rec.args is args and rec.getMessage().endswith(" 200")
+
+
+def test_pii_filter_mixed_case_bearer_and_email_token():
+    """大文字小文字が混ざった Bearer も、メール形式のトークンも丸ごと伏せる"""
+    flt = PIIFilter()
+    rec = _record("auth %s / %s", ("BeArEr secrettoken", "Bearer abc@x.com"))
+    flt.filter(rec)
+    assert rec.getMessage() == "auth BeArEr *** / Bearer ***"
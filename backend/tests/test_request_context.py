@@ -0,0 +1,42 @@
+# backend/tests/test_request_context.py
+from __future__ import annotations
+import logging
+
+import pytest
+from fastapi import FastAPI, Request
+from httpx import AsyncClient, ASGITransport
+
+from app.core.request_id import RequestContextMiddleware
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_trace_id_header_on_app():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/system/health")
+    assert r.status_code == 200
+    assert len(r.headers["x-trace-id"]) == 32
+
+
+@pytest.mark.asyncio
+async def test_access_log_uses_route_template_and_samples_detail(caplog):
+    mini = FastAPI()
+
+    @mini.get("/items/{item_id}")
+    def item(item_id: int, request: Request):
+        return {"trace_id": request.state.trace_id}
+
+    mini.add_middleware(RequestContextMiddleware, detail_rate=0.0, detail_routes={"/items/{item_id}": 1.0})
+    transport = ASGITransport(app=mini)
+    with caplog.at_level(logging.INFO, logger="app.access"):
+        async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+            r = await ac.get("/items/7?x=1", headers={"Authorization": "Bearer secret"})
+    assert r.headers["x-trace-id"] == r.json()["trace_id"]
+
+    events = {rec.msg["event"]: rec.msg for rec in caplog.records if rec.name == "app.access"}
+    access = events["access"]
+    assert access["path"] == "/items/{item_id}" and access["status"] == 200
+    assert access["bytes"] == len(r.content)
+    detail = events["request_detail"]
+    assert detail["query"] == "x=1" and "authorization" not in detail["headers"]
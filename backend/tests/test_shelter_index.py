@@ -0,0 +1,119 @@
+# backend/tests/test_shelter_index.py
+from __future__ import annotations
+import math
+
+from app.crud.shelter import get_shelters, next_cursor_for
+from app.services.shelter_index import EARTH_RADIUS_M, ShelterIndex
+from tests.factories import create_shelter
+
+
+def _search(fn, db, **kw):
+    params = dict(type=None, crowd_level=None, lat=None, lng=None, radius_km=5.0, q=None, limit=50, offset=0)
+    params.update(kw)
+    return fn(db=db, **params)
+
+
+def test_index_matches_sql_for_radius_search(db_session):
+    """
+    インメモリ索引と PostGIS の結果（件数・並び順）が一致することを確認。
+    """
+    create_shelter(db_session, name="索引-中心", lat=35.0000, lng=139.0000)
+    create_shelter(db_session, name="索引-近く", lat=35.0050, lng=139.0000)
+    create_shelter(db_session, name="索引-遠方", lat=35.5000, lng=139.5000)
+
+    index = ShelterIndex()
+    sql_items = _search(get_shelters, db_session, lat=35.0, lng=139.0, radius_km=2.0)
+    mem_items = _search(index.query, db_session, lat=35.0, lng=139.0, radius_km=2.0)
+
+    assert [i["id"] for i in mem_items] == [i["id"] for i in sql_items]
+    assert [i["name"] for i in mem_items][:2] == ["索引-中心", "索引-近く"]
+
+
+def test_index_filters_and_crowd_update(db_session):
+    """
+    type / keyword フィルタと、混雑度の差分反映を確認。
+    """
+    a = create_shelter(db_session, name="索引フィルタA", lat=35.1, lng=139.1, type="companion")
+    create_shelter(db_session, name="索引フィルタB", lat=35.1, lng=139.1, type="accompany")
+
+    index = ShelterIndex()
+    items = _search(index.query, db_session, type="同伴", q="索引フィルタ")
+    assert [i["name"] for i in items] == ["索引フィルタA"]
+
+    assert index.apply_crowd_level(a["id"], "full") is True
+    items = _search(index.query, db_session, crowd_level="full", q="索引フィルタ")
+    assert [i["id"] for i in items] == [a["id"]]
+
+
+def test_index_name_order_matches_sql(db_session):
+    """
+    名称順（大文字・小文字が混ざる名前）とカーソルのページ送りが SQL と一致することを確認。
+    """
+    for name in ("b照合", "B照合", "a照合"):
+        create_shelter(db_session, name=name, lat=43.9, lng=144.9)
+
+    index = ShelterIndex()
+    bbox = (144.8, 43.8, 145.0, 44.0)
+    sql_items = _search(get_shelters, db_session, bbox=bbox)
+    mem_items = _search(index.query, db_session, bbox=bbox)
+    assert [i["name"] for i in sql_items] == [i["name"] for i in mem_items] == ["B照合", "a照合", "b照合"]
+
+    first = _search(index.query, db_session, bbox=bbox, limit=1)
+    cursor = next_cursor_for(first, 1, "n")
+    sql_next = _search(get_shelters, db_session, bbox=bbox, limit=1, cursor=cursor)
+    mem_next = _search(index.query, db_session, bbox=bbox, limit=1, cursor=cursor)
+    assert [i["id"] for i in sql_next] == [i["id"] for i in mem_next] == [sql_items[1]["id"]]
+
+
+def _north(lat, lng, d):
+    """球面上で真北へ d m の点"""
+    return lat + math.degrees(d / EARTH_RADIUS_M), lng
+
+
+def _east(lat, lng, d):
+    """同じ緯度で球面距離がちょうど d m になる東側の点"""
+    dlng = 2 * math.asin(math.sin(d / (2 * EARTH_RADIUS_M)) / math.cos(math.radians(lat)))
+    return lat, lng + math.degrees(dlng)
+
+
+def test_index_matches_sql_at_radius_and_page_edges(db_session):
+    """
+    半径の境目（回転楕円体なら内外が入れ替わる位置）・方向の違う近い距離・同位置の同距離で、
+    索引と SQL の結果が一致し、互いのカーソルを渡し合っても重複・欠落なくページ送りできる。
+    """
+    lat0, lng0 = 36.2, 137.2
+    points = {
+        "境目-北内": _north(lat0, lng0, 999.0),
+        "境目-北外": _north(lat0, lng0, 1001.0),   # 回転楕円体では約 998.7m（内側）
+        "境目-東内": _east(lat0, lng0, 998.0),     # 回転楕円体では約 1000.2m（外側）
+        "境目-東外": _east(lat0, lng0, 1001.0),
+        "順序-北": _north(lat0, lng0, 500.0),      # 回転楕円体では東より近い
+        "順序-東": _east(lat0, lng0, 499.0),
+        "同位置-1": _north(lat0, lng0, 700.0),
+        "同位置-2": _north(lat0, lng0, 700.0),
+    }
+    for name, (lat, lng) in points.items():
+        create_shelter(db_session, name=name, lat=lat, lng=lng)
+
+    index = ShelterIndex()
+    query = dict(lat=lat0, lng=lng0, radius_km=1.0)
+    sql_items = _search(get_shelters, db_session, **query)
+    mem_items = _search(index.query, db_session, **query)
+    assert [i["id"] for i in sql_items] == [i["id"] for i in mem_items]
+    names = [i["name"] for i in sql_items]
+    assert names[:2] == ["順序-東", "順序-北"]
+    assert sorted(names[2:4]) == ["同位置-1", "同位置-2"]
+    assert names[4:] == ["境目-東内", "境目-北内"]
+    for a, b in zip(sql_items, mem_items):
+        assert math.isclose(a["distance_m"], b["distance_m"], abs_tol=1e-6)
+
+    expected = [i["id"] for i in sql_items]
+    for paths in ((index.query, get_shelters), (get_shelters, index.query)):
+        seen, cursor = [], None
+        for page in range(10):
+            items = _search(paths[page % 2], db_session, limit=3, cursor=cursor, **query)
+            seen += [i["id"] for i in items]
+            cursor = next_cursor_for(items, 3, "d")
+            if cursor is None:
+                break
+        assert seen == expected
@@ -0,0 +1,26 @@
+# backend/tests/test_shelters_batch_get.py
+from __future__ import annotations
+import uuid
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_batch_get_preserves_order_and_reports_missing(client, db_session):
+    a = create_shelter(db_session, name="まとめA", lat=35.0, lng=139.0)
+    b = create_shelter(db_session, name="まとめB", lat=35.1, lng=139.1)
+    missing = str(uuid.uuid4())
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.post("/shelters:batchGet", json={"ids": [b["id"], missing, a["id"], "not-a-uuid"]})
+        assert r.status_code == 200
+        data = r.json()
+        assert [i["name"] for i in data["items"]] == ["まとめB", "まとめA"]
+        assert data["missing"] == [missing, "not-a-uuid"]
+
+        r = await ac.post("/shelters:batchGet", json={"ids": [str(uuid.uuid4())] * 201})
+        assert r.status_code == 422
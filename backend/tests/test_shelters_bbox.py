@@ -0,0 +1,38 @@
+# backend/tests/test_shelters_bbox.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_shelters_bbox_viewport(client, db_session):
+    """
+    表示範囲（bbox）内だけが返り、sort=none では distance_m を計算しない。
+    """
+    create_shelter(db_session, name="範囲内1", lat=34.10, lng=134.10)
+    create_shelter(db_session, name="範囲内2", lat=34.15, lng=134.15)
+    create_shelter(db_session, name="範囲外", lat=34.50, lng=134.50)
+
+    viewport = {"min_lat": 34.0, "min_lng": 134.0, "max_lat": 34.2, "max_lng": 134.2}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={**viewport, "sort": "none", "limit": 500})
+        assert r.status_code == 200
+        items = r.json()["items"]
+        assert sorted(i["name"] for i in items) == ["範囲内1", "範囲内2"]
+        assert all(i.get("distance_m") is None for i in items)
+
+        # lat/lng を併用すると範囲内を距離順（半径では絞らない）
+        r = await ac.get("/shelters", params={**viewport, "lat": 34.15, "lng": 134.15, "radius": 0})
+        assert [i["name"] for i in r.json()["items"]] == ["範囲内2", "範囲内1"]
+
+
+@pytest.mark.asyncio
+async def test_shelters_bbox_requires_all_corners(client):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={"min_lat": 34.0, "max_lat": 34.2})
+        assert r.status_code == 400
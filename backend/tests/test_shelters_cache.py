@@ -0,0 +1,100 @@
+# backend/tests/test_shelters_cache.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.services.shelter_cache import ShelterCache
+from tests.factories import create_shelter
+
+
+class FakeRedis:
+    """get/set/incr だけの最小 Redis 代替（テストで本物の Redis に繋がない）"""
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key) or 0) + 1
+        return self.data[key]
+
+
+@pytest.fixture()
+def fake_cache(monkeypatch):
+    import app.routers.shelter as shelter_router
+
+    cache = ShelterCache()
+    cache._client = FakeRedis()
+    monkeypatch.setattr(shelter_router, "shelter_cache", cache)
+    monkeypatch.setattr(shelter_router, "cache_enabled", lambda: True)
+    return cache
+
+
+@pytest.mark.asyncio
+async def test_shelters_cache_hit_miss_and_bump(client, db_session, fake_cache):
+    """
+    1回目 MISS → 近い座標の2回目 HIT → 版上げ後は MISS。バイパスヘッダは HIT にしない。
+    """
+    create_shelter(db_session, name="キャッシュ対象", lat=35.3, lng=139.3)
+    params = {"lat": 35.3001, "lng": 139.3001, "radius": 1.0}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r1 = await ac.get("/shelters", params=params)
+        assert r1.status_code == 200 and r1.headers["x-cache"] == "MISS"
+
+        # 格子（0.005度）内の別座標でも同じエントリを共有
+        r2 = await ac.get("/shelters", params={**params, "lat": 35.3002})
+        assert r2.headers["x-cache"] == "HIT"
+        assert r2.json() == r1.json()
+
+        r3 = await ac.get("/shelters", params=params, headers={"X-Cache-Bypass": "1"})
+        assert r3.headers["x-cache"] == "BYPASS"
+
+        fake_cache.bump_version()
+        r4 = await ac.get("/shelters", params=params)
+        assert r4.headers["x-cache"] == "MISS"
+
+    assert fake_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shelters_cache_never_stores_stale_index_body(client, db_session, fake_cache, monkeypatch):
+    """
+    索引が他ワーカーの更新（版上げ）より古いときは読み直してから作る。古い本文を新しい版のエントリに書かない。
+    """
+    import app.routers.shelter as shelter_router
+    from app.crud.shelter import bump_data_version
+    from app.services.shelter_index import ShelterIndex
+    from app.services.shelter_version import shelter_version
+
+    index = ShelterIndex(ttl=3600)
+    monkeypatch.setattr(shelter_router, "shelter_index", index)
+    monkeypatch.setattr(shelter_router, "index_enabled", lambda: True)
+    shelter_version.invalidate()
+
+    create_shelter(db_session, name="索引キャッシュ既存", lat=35.4, lng=139.4)
+    index.load(db_session)
+    # 他ワーカーでの追加 → データ版・キャッシュ版を上げる（このワーカーの索引は TTL 内）
+    added = create_shelter(db_session, name="索引キャッシュ追加", lat=35.4, lng=139.4)
+    shelter_version.remember(*bump_data_version(db_session))
+    fake_cache.bump_version()
+
+    params = {"lat": 35.4, "lng": 139.4, "radius": 1.0}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r1 = await ac.get("/shelters", params=params)
+        assert r1.headers["x-cache"] == "MISS"
+        assert added["id"] in [i["id"] for i in r1.json()["items"]]
+
+        r2 = await ac.get("/shelters", params=params)
+        assert r2.headers["x-cache"] == "HIT"
+        assert r2.json() == r1.json()
+    # 保存した本文は索引（読み直し後）から作られている
+    assert index._snap.version == shelter_version.current(db_session)[0]
+    shelter_version.invalidate()
@@ -0,0 +1,72 @@
+# backend/tests/test_shelters_changes.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+
+from app.main import app
+from app.crud.shelter import get_change_watermark, get_shelter_changes
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_changes_tracks_writes_and_holds_back_inflight(client, db_session):
+    """
+    トリガで change_version が進み、削除は tombstone に残る。
+    ただし実行中トランザクション（テストの外側トランザクション）の変更は確定するまで返さない。
+    """
+    since = get_change_watermark(db_session)
+    s = create_shelter(db_session, name="差分避難所", lat=35.0, lng=139.0)
+    version = db_session.execute(
+        text("SELECT change_version FROM shelters WHERE id = CAST(:id AS uuid)"), {"id": s["id"]},
+    ).scalar()
+    assert version > since
+
+    db_session.execute(text("DELETE FROM shelters WHERE id = CAST(:id AS uuid)"), {"id": s["id"]})
+    tomb = db_session.execute(
+        text("SELECT count(*) FROM shelter_tombstones WHERE id = CAST(:id AS uuid)"), {"id": s["id"]},
+    ).scalar()
+    assert tomb == 1
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters/changes", params={"since": since})
+        assert r.status_code == 200
+        data = r.json()
+        assert s["id"] not in data["deleted"]
+        assert data["columns"][0] == "id"
+        assert data["next_since"] >= since
+
+        r = await ac.get("/shelters/changes")
+        assert r.status_code == 422
+
+
+def _own_xid(db_session) -> int:
+    return int(db_session.execute(text("SELECT pg_current_xact_id()::text::bigint")).scalar())
+
+
+def test_changes_returns_upserts_and_deletions_past_watermark(db_session):
+    """
+    watermark が書き込んだ xid を超えれば、その変更が返る（確定後に相当）。
+    テストは外側トランザクション内で動くので、自分の xid + 1 を明示して確定済みとみなす。
+    """
+    since = get_change_watermark(db_session)
+    kept = create_shelter(db_session, name="差分追加", lat=35.0, lng=139.0)
+    gone = create_shelter(db_session, name="差分削除", lat=35.1, lng=139.1)
+    db_session.execute(text("DELETE FROM shelters WHERE id = CAST(:id AS uuid)"), {"id": gone["id"]})
+    watermark = _own_xid(db_session) + 1
+
+    changes = get_shelter_changes(db_session, since=since, limit=100, watermark=watermark)
+    upserted_ids = [str(r["id"]) for r in changes["upserted"]]
+    assert kept["id"] in upserted_ids
+    assert gone["id"] not in upserted_ids
+    assert gone["id"] in changes["deleted"]
+    assert changes["next_since"] == watermark - 1
+
+    # 続きから読めば同じ変更は二度返らない
+    again = get_shelter_changes(db_session, since=changes["next_since"], limit=100, watermark=watermark)
+    assert again["upserted"] == [] and again["deleted"] == []
+
+    # 既定の watermark（確定済みまで）では、実行中の自トランザクションの変更は返らない
+    held = get_shelter_changes(db_session, since=since, limit=100)
+    assert kept["id"] not in [str(r["id"]) for r in held["upserted"]]
@@ -0,0 +1,42 @@
+# backend/tests/test_shelters_clusters.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_shelter_clusters_groups_by_zoom(client, db_session):
+    """
+    近接2件 + 離れた1件:
+      - 低ズームでは 3件が1クラスタ
+      - 高ズームでは近接2件のクラスタと単独1件（shelter_id 付き）に分かれる
+    """
+    create_shelter(db_session, name="クラスタA", lat=33.1000, lng=131.1000)
+    create_shelter(db_session, name="クラスタB", lat=33.1001, lng=131.1001)
+    lone = create_shelter(db_session, name="クラスタC", lat=33.3000, lng=131.3000)
+
+    bbox = "131.0,33.0,131.4,33.4"
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters/clusters", params={"bbox": bbox, "zoom": 5})
+        assert r.status_code == 200
+        counts = [c["count"] for c in r.json()["items"]]
+        assert sum(counts) >= 3 and max(counts) >= 3
+
+        r = await ac.get("/shelters/clusters", params={"bbox": bbox, "zoom": 14})
+        assert r.status_code == 200
+        items = r.json()["items"]
+        assert any(c["count"] == 2 for c in items)
+        single = [c for c in items if c["shelter_id"] == lone["id"]]
+        assert single and single[0]["crowd"]["unknown"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shelter_clusters_invalid_bbox(client):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters/clusters", params={"bbox": "1,2,3", "zoom": 5})
+        assert r.status_code == 400
@@ -0,0 +1,46 @@
+# backend/tests/test_shelters_crowd_bulk.py
+from __future__ import annotations
+import uuid
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.core import deps
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_crowd_bulk_update(client, db_session, auth_header):
+    """
+    既存2件は updated、存在しない ID は not_found（全体は失敗にしない）。
+    """
+    a = create_shelter(db_session, name="一括A", lat=35.0, lng=139.0)
+    b = create_shelter(db_session, name="一括B", lat=35.0, lng=139.0)
+    missing = str(uuid.uuid4())
+    app.dependency_overrides[deps.get_admin_user] = lambda: None
+
+    body = {"items": [
+        {"shelter_id": a["id"], "level": "full"},
+        {"shelter_id": missing, "level": "few"},
+        {"shelter_id": b["id"], "level": "few"},
+    ]}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.patch("/shelters/crowd:bulk", json=body, headers=auth_header)
+        assert r.status_code == 200
+        data = r.json()
+        assert (data["updated"], data["not_found"]) == (2, 1)
+        assert [x["status"] for x in data["results"]] == ["updated", "not_found", "updated"]
+
+        r = await ac.get(f"/shelters/{a['id']}")
+        assert r.json()["crowd_level"] == "full"
+
+
+@pytest.mark.asyncio
+async def test_crowd_bulk_requires_admin(client, auth_header):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.patch("/shelters/crowd:bulk", json={"items": [
+            {"shelter_id": str(uuid.uuid4()), "level": "full"},
+        ]}, headers=auth_header)
+        assert r.status_code == 403
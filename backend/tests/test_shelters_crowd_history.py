@@ -0,0 +1,49 @@
+# backend/tests/test_shelters_crowd_history.py
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.core import deps
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_crowd_history_buckets(client, db_session, auth_header):
+    """
+    混雑度更新ごとに履歴が追記され、バケット単位の件数・内訳・末尾の値が返る。
+    """
+    s = create_shelter(db_session, name="履歴避難所", lat=35.0, lng=139.0)
+    app.dependency_overrides[deps.get_admin_user] = lambda: None
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        for level in ("few", "full"):
+            r = await ac.patch(f"/shelters/{s['id']}/crowd", params={"level": level}, headers=auth_header)
+            assert r.status_code == 200
+
+        now = datetime.now(timezone.utc)
+        r = await ac.get(f"/shelters/{s['id']}/crowd/history", params={
+            "since": (now - timedelta(hours=1)).isoformat(),
+            "until": (now + timedelta(hours=1)).isoformat(),
+            "bucket_minutes": 60,
+        })
+        assert r.status_code == 200
+        data = r.json()
+        assert data["initial_level"] is None
+        assert sum(b["observations"] for b in data["buckets"]) == 2
+        assert data["buckets"][-1]["last_level"] == "full"
+
+
+@pytest.mark.asyncio
+async def test_crowd_history_validation(client, db_session):
+    s = create_shelter(db_session, name="履歴避難所2", lat=35.0, lng=139.0)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get(f"/shelters/{s['id']}/crowd/history", params={
+            "since": "2026-01-02T00:00:00Z", "until": "2026-01-01T00:00:00Z",
+        })
+        assert r.status_code == 400
+        r = await ac.get("/shelters/not-a-uuid/crowd/history")
+        assert r.status_code == 404
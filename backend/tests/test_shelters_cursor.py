@@ -0,0 +1,42 @@
+# backend/tests/test_shelters_cursor.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_shelters_cursor_walks_all_pages(client, db_session):
+    """
+    limit=2 で next_cursor をたどると、重複・欠落なく距離順に全件取得できる。
+    """
+    for i in range(5):
+        create_shelter(db_session, name=f"カーソル{i}", lat=34.5 + i * 0.001, lng=138.5)
+
+    seen = []
+    params = {"lat": 34.5, "lng": 138.5, "radius": 2.0, "limit": 2}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        for _ in range(10):
+            r = await ac.get("/shelters", params=params)
+            assert r.status_code == 200
+            data = r.json()
+            seen += [i["name"] for i in data["items"]]
+            if not data.get("next_cursor"):
+                break
+            params["cursor"] = data["next_cursor"]
+
+    assert seen == [f"カーソル{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_shelters_invalid_cursor(client):
+    """
+    壊れたカーソルは 400。
+    """
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={"cursor": "not-a-cursor"})
+        assert r.status_code == 400
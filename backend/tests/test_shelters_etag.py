@@ -0,0 +1,80 @@
+# backend/tests/test_shelters_etag.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.crud.shelter import bump_data_version
+from app.services.shelter_version import shelter_version
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_shelters_conditional_get(client, db_session):
+    """
+    一覧・詳細に ETag / Last-Modified が付き、If-None-Match 一致で 304。
+    データ版が上がると ETag が変わり 200 に戻る。
+    """
+    shelter_version.invalidate()
+    s = create_shelter(db_session, name="ETag避難所", lat=35.0, lng=139.0)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={"lat": 35.0, "lng": 139.0, "radius": 1.0})
+        assert r.status_code == 200
+        etag = r.headers["etag"]
+        assert r.headers.get("last-modified")
+
+        r = await ac.get("/shelters", params={"lat": 35.0, "lng": 139.0, "radius": 1.0},
+                         headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.content == b""
+
+        # パラメータが違えば別の ETag
+        r = await ac.get("/shelters", params={"lat": 35.0, "lng": 139.0, "radius": 2.0},
+                         headers={"If-None-Match": etag})
+        assert r.status_code == 200
+
+        r = await ac.get(f"/shelters/{s['id']}")
+        detail_etag = r.headers["etag"]
+        r = await ac.get(f"/shelters/{s['id']}", headers={"If-None-Match": detail_etag})
+        assert r.status_code == 304
+
+        shelter_version.remember(*bump_data_version(db_session))
+        r = await ac.get(f"/shelters/{s['id']}", headers={"If-None-Match": detail_etag})
+        assert r.status_code == 200
+        assert r.headers["etag"] != detail_etag
+    shelter_version.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_shelters_etag_follows_index_version(client, db_session, monkeypatch):
+    """
+    インメモリ索引で答えるとき、他ワーカーの更新（版上げ）後は索引を読み直してから新しい ETag で返す
+    （古い本文に新しい ETag を付けない）。
+    """
+    import app.routers.shelter as shelter_router
+    from app.services.shelter_index import ShelterIndex
+
+    index = ShelterIndex(ttl=3600)
+    monkeypatch.setattr(shelter_router, "shelter_index", index)
+    monkeypatch.setattr(shelter_router, "index_enabled", lambda: True)
+    monkeypatch.setattr(shelter_router, "cache_enabled", lambda: False)
+    shelter_version.invalidate()
+    create_shelter(db_session, name="索引ETag既存", lat=35.6, lng=139.6)
+    params = {"lat": 35.6, "lng": 139.6, "radius": 1.0}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params=params)
+        etag = r.headers["etag"]
+
+        # 他ワーカーでの追加 + 版上げ（このワーカーの索引は TTL 内）
+        added = create_shelter(db_session, name="索引ETag追加", lat=35.6, lng=139.6)
+        shelter_version.remember(*bump_data_version(db_session))
+
+        r = await ac.get("/shelters", params=params, headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.headers["etag"] != etag
+        assert added["id"] in [i["id"] for i in r.json()["items"]]
+    shelter_version.invalidate()
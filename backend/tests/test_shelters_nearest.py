@@ -0,0 +1,44 @@
+# backend/tests/test_shelters_nearest.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_nearest_batch_per_point(client, db_session):
+    """
+    2地点それぞれに最寄りが近い順で返り、ref と index が入力順を保つ。
+    """
+    create_shelter(db_session, name="KNN北", lat=43.000, lng=141.000)
+    create_shelter(db_session, name="KNN北2", lat=43.010, lng=141.000)
+    create_shelter(db_session, name="KNN南", lat=26.000, lng=127.600)
+
+    body = {
+        "points": [
+            {"lat": 43.001, "lng": 141.0, "ref": "member-1"},
+            {"lat": 26.001, "lng": 127.6, "ref": "member-2"},
+        ],
+        "k": 2,
+    }
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.post("/shelters/nearest:batch", json=body)
+        assert r.status_code == 200
+        results = r.json()["results"]
+
+    assert [x["ref"] for x in results] == ["member-1", "member-2"]
+    assert [i["name"] for i in results[0]["items"]] == ["KNN北", "KNN北2"]
+    assert results[1]["items"][0]["name"] == "KNN南"
+    dists = [i["distance_m"] for i in results[0]["items"]]
+    assert dists == sorted(dists)
+
+
+@pytest.mark.asyncio
+async def test_nearest_batch_validation(client):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.post("/shelters/nearest:batch", json={"points": [], "k": 3})
+        assert r.status_code == 422
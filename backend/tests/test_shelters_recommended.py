@@ -0,0 +1,36 @@
+# backend/tests/test_shelters_recommended.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+
+from app.main import app
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_recommended_prefers_vacant_over_nearest_full(client, db_session):
+    """
+    最寄りが満員（full）なら、少し遠くても空いている避難所が上位に来る。スコア内訳も返す。
+    """
+    near = create_shelter(db_session, name="近いが満員", lat=36.000, lng=138.000, capacity=100)
+    far = create_shelter(db_session, name="少し遠いが空き", lat=36.005, lng=138.000, capacity=100)
+    db_session.execute(
+        text("UPDATE shelters SET crowd_level = CASE WHEN id = CAST(:near AS uuid) THEN 'full' ELSE 'empty' END "
+             "WHERE id IN (CAST(:near AS uuid), CAST(:far AS uuid))"),
+        {"near": near["id"], "far": far["id"]},
+    )
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={
+            "lat": 36.0, "lng": 138.0, "radius": 3, "sort": "recommended", "hazard": "flood",
+        })
+        assert r.status_code == 200
+        items = r.json()["items"]
+        assert [i["name"] for i in items] == ["少し遠いが空き", "近いが満員"]
+        assert items[0]["score"] > items[1]["score"]
+        assert set(items[0]["score_breakdown"]) == {"distance", "crowd", "capacity", "hazard"}
+
+        r = await ac.get("/shelters", params={"sort": "recommended"})
+        assert r.status_code == 400
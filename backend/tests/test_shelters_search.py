@@ -64,3 +64,62 @@ async def test_shelters_param_validation_error(client):
     async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
         r = await ac.get("/shelters", params={"lat": "x", "lng": "y", "radius": "z"})
         assert r.status_code in (400, 422)
+
+@pytest.mark.asyncio
+async def test_shelters_keyword_normalized(client, db_session):
+    """
+    キーワードは NFKC + かな正規化される:
+      - ひらがな「ふじさわ」で読み（name_kana）「フジサワ」の「藤沢」がヒット
+      - 全角英数「ＡＢＣ」で半角「abc」を含む名称がヒット
+    """
+    create_shelter(db_session, name="藤沢テスト公民館", name_kana="フジサワテストコウミンカン", lat=35.34, lng=139.49)
+    create_shelter(db_session, name="abc体育館", lat=35.34, lng=139.49)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={"keyword": "ふじさわてすと"})
+        assert r.status_code == 200
+        assert "藤沢テスト公民館" in [i["name"] for i in r.json()["items"]]
+
+        r = await ac.get("/shelters", params={"keyword": "ＡＢＣ体育館"})
+        assert r.status_code == 200
+        assert "abc体育館" in [i["name"] for i in r.json()["items"]]
+
+@pytest.mark.asyncio
+async def test_shelters_hazard_facility_filter(client, db_session):
+    """
+    hazard=flood & facility=pet_space は両方を満たす避難所だけ返す（capabilities ビット述語）。
+    """
+    create_shelter(db_session, name="洪水+ペット", lat=35.6, lng=139.6, is_emergency_flood=True, has_pet_space=True)
+    create_shelter(db_session, name="洪水のみ", lat=35.6, lng=139.6, is_emergency_flood=True)
+    create_shelter(db_session, name="ペットのみ", lat=35.6, lng=139.6, has_pet_space=True)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters", params={
+            "lat": 35.6, "lng": 139.6, "radius": 1.0, "hazard": "flood", "facility": "pet_space",
+        })
+        assert r.status_code == 200
+        assert [i["name"] for i in r.json()["items"]] == ["洪水+ペット"]
+
+        r = await ac.get("/shelters", params={"hazard": "earthquake"})
+        assert r.status_code == 422
+
+@pytest.mark.asyncio
+async def test_shelter_stored_latlng_follows_geom(client, db_session):
+    """
+    lat/lng は geom からの生成列。geom を更新すると追随し、詳細 API もその値を返す。
+    """
+    from sqlalchemy import text
+    s = create_shelter(db_session, name="生成列", lat=35.25, lng=139.75)
+    db_session.execute(
+        text("UPDATE shelters SET geom = ST_SetSRID(ST_MakePoint(140.5, 36.5), 4326)::geography "
+             "WHERE id = CAST(:id AS uuid)"),
+        {"id": s["id"]},
+    )
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get(f"/shelters/{s['id']}")
+        assert r.status_code == 200
+        assert (r.json()["lat"], r.json()["lng"]) == pytest.approx((36.5, 140.5))
@@ -0,0 +1,64 @@
+# backend/tests/test_shelters_snapshot.py
+from __future__ import annotations
+import json
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.crud.shelter import bump_data_version
+from app.services import shelter_snapshot as snapshot_module
+from app.services.shelter_snapshot import ShelterSnapshotStore, shelter_snapshot
+from app.services.shelter_version import shelter_version
+from tests.factories import create_shelter
+
+
+@pytest.mark.asyncio
+async def test_snapshot_columnar_gzip_and_etag(client, db_session):
+    """
+    gzip 済みの列指向 JSON を返し、同じ版の間は強い ETag で 304。版が上がると作り直される。
+    """
+    shelter_version.invalidate()
+    shelter_snapshot.invalidate()
+    s = create_shelter(db_session, name="スナップ避難所", lat=35.0, lng=139.0, has_pet_space=True)
+    shelter_version.remember(*bump_data_version(db_session))
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters/snapshot", headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == 200
+        assert r.headers["content-encoding"] == "gzip"
+        etag = r.headers["etag"]
+        doc = json.loads(r.content)   # httpx が gzip を展開済み
+        cols = doc["columns"]
+        ids = doc["data"][cols.index("id")]
+        assert s["id"] in ids
+        caps = doc["data"][cols.index("capabilities")][ids.index(s["id"])]
+        assert caps & doc["capability_bits"]["pet_space"]
+        assert "change_version" not in doc
+        assert int(r.headers["x-shelters-change-version"]) > 0
+
+        r = await ac.get("/shelters/snapshot", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert r.status_code == 304
+
+        create_shelter(db_session, name="スナップ追加", lat=35.0, lng=139.0)
+        shelter_version.remember(*bump_data_version(db_session))
+        r = await ac.get("/shelters/snapshot", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.headers["etag"] != etag
+    shelter_version.invalidate()
+    shelter_snapshot.invalidate()
+
+
+def test_snapshot_etag_ignores_build_time_watermark(db_session, monkeypatch):
+    """
+    同じ行データなら、作成時点の change_version が違っても（別ワーカー・別時刻）本文と強い ETag は同じ。
+    """
+    create_shelter(db_session, name="スナップ同一", lat=35.0, lng=139.0)
+    watermarks = iter([100, 200])
+    monkeypatch.setattr(snapshot_module, "get_change_watermark", lambda db: next(watermarks))
+
+    a = ShelterSnapshotStore().build(db_session, version=7)
+    b = ShelterSnapshotStore().build(db_session, version=7)
+    assert (a.change_version, b.change_version) == (100, 200)
+    assert a.etag_base == b.etag_base
+    assert a.bodies == b.bodies
@@ -0,0 +1,49 @@
+# backend/tests/test_shelters_stream.py
+from __future__ import annotations
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.main import app
+from app.services import crowd_stream as cs
+
+
+@pytest.mark.asyncio
+async def test_stream_hub_filters_and_coalesces(monkeypatch):
+    """
+    bbox / ids で絞り込み、同じ避難所の連続変更は最新1件にまとまる。上限超えは resync 扱い。
+    """
+    hub = cs.CrowdStreamHub(url="redis://127.0.0.1:1/0")
+    monkeypatch.setattr(hub, "_listen", lambda: _noop())
+    in_area = hub.subscribe(bbox=(139.0, 35.0, 140.0, 36.0))
+    by_id = hub.subscribe(ids=["b"])
+
+    hub.dispatch([
+        {"id": "a", "crowd_level": "few", "lat": 35.5, "lng": 139.5, "version": 2},
+        {"id": "a", "crowd_level": "full", "lat": 35.5, "lng": 139.5, "version": 3},
+        {"id": "b", "crowd_level": "empty", "lat": 10.0, "lng": 10.0, "version": 3},
+    ])
+    events, overflow = in_area.drain()
+    assert [(e["id"], e["crowd_level"]) for e in events] == [("a", "full")] and not overflow
+    events, _ = by_id.drain()
+    assert [e["id"] for e in events] == ["b"]
+
+    monkeypatch.setattr(cs, "SHELTER_STREAM_MAX_PENDING", 2)
+    hub.dispatch([{"id": str(i), "crowd_level": "full", "lat": 35.5, "lng": 139.5} for i in range(3)])
+    events, overflow = in_area.drain()
+    assert events == [] and overflow
+
+    hub.unsubscribe(in_area)
+    hub.unsubscribe(by_id)
+    assert hub.stats()["connections"] == 0
+
+
+async def _noop():
+    return None
+
+
+@pytest.mark.asyncio
+async def test_stream_disabled_returns_503(client):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r = await ac.get("/shelters/stream")
+        assert r.status_code == 503
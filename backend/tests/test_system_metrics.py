@@ -0,0 +1,59 @@
+# backend/tests/test_system_metrics.py
+from __future__ import annotations
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.core import metrics
+from app.core.metrics import Histogram, http_request_duration
+from app.main import app
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("t_seconds", "test", ("route",), buckets=(0.05, 0.3))
+    for v in (0.01, 0.1, 0.2, 1.0):
+        h.observe(v, "/shelters")
+    text = "\n".join(h.render())
+    assert 't_seconds_bucket{route="/shelters",le="0.05"} 1' in text
+    assert 't_seconds_bucket{route="/shelters",le="0.3"} 3' in text
+    assert 't_seconds_bucket{route="/shelters",le="+Inf"} 4' in text
+    assert 't_seconds_count{route="/shelters"} 4' in text
+
+
+@pytest.mark.asyncio
+async def test_system_metrics_exposes_route_latency_and_pool(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        assert (await ac.get("/system/health")).status_code == 200
+        r = await ac.get("/system/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = r.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/system/health",status="200"}' in body
+    assert "http_requests_in_flight " in body
+    assert "db_pool_checked_out " in body
+    assert 'cache_hit_ratio{cache="auth_token"}' in body
+
+
+@pytest.mark.asyncio
+async def test_system_metrics_requires_token_or_admin(monkeypatch):
+    """トークン無しは 401、METRICS_TOKEN 不一致（＝一般ユーザーの ID トークン扱い）は管理者でなければ 403"""
+    import app.core.deps as deps
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    monkeypatch.setattr(deps, "verify_id_token", lambda token: {"uid": "u-metrics", "email": None, "claims": {"admin": False}})
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        assert (await ac.get("/system/metrics")).status_code == 401
+        r = await ac.get("/system/metrics", headers={"Authorization": "Bearer user-id-token"})
+        assert r.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_is_not_timed(client):
+    """接続を張り続ける /shelters/stream は所要時間ヒストグラムに入れない"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        await ac.get("/shelters/stream")
+    assert not any(labels[1] == "/shelters/stream" for labels in http_request_duration._series)
@@ -0,0 +1,44 @@
+# backend/tests/test_token_cache.py
+from __future__ import annotations
+import time
+
+from app.core import firebase_auth as fb
+from app.core.token_cache import VerifiedTokenCache, token_cache
+
+
+def test_token_cache_lru_and_expiry():
+    cache = VerifiedTokenCache(maxsize=2)
+    payload = {"uid": "u", "email": None, "claims": {}}
+    cache.set("t1", payload, time.time() + 60)
+    cache.set("t2", payload, time.time() + 60)
+    assert cache.get("t1") is not None          # t1 を最近使ったことにする
+    cache.set("t3", payload, time.time() + 60)  # → t2 が追い出される
+    assert cache.get("t2") is None
+    assert cache.get("t3") is not None
+
+    cache.set("old", payload, time.time() - 1)  # 期限切れは覚えない
+    cache.set("noexp", payload, None)           # exp 無しも覚えない
+    assert cache.get("old") is None and cache.get("noexp") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits"] == 2 and stats["size"] == 2
+
+
+def test_verify_id_token_hits_cache(monkeypatch):
+    """同じトークンの2回目は SDK の検証を呼ばない"""
+    calls = []
+
+    def fake_verify(id_token, *args, **kwargs):
+        calls.append(id_token)
+        return {"uid": "cached-uid", "email": "c@example.com", "admin": True, "exp": time.time() + 600}
+
+    monkeypatch.setattr(fb.auth, "verify_id_token", fake_verify, raising=True)
+    monkeypatch.setattr(fb, "_init_app", lambda: None)
+    token_cache.clear()
+
+    first = fb.verify_id_token("tok-abc")
+    first["claims"]["admin"] = False            # 呼び出し側の変更はキャッシュに影響しない
+    second = fb.verify_id_token("tok-abc")
+    assert calls == ["tok-abc"]
+    assert second["uid"] == "cached-uid" and second["claims"]["admin"] is True
+    token_cache.clear()
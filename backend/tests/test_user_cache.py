@@ -0,0 +1,57 @@
+# backend/tests/test_user_cache.py
+from __future__ import annotations
+import uuid
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.core.deps import resolve_user
+from app.core.user_cache import UserRecord, UserRecordCache, user_cache
+from app.crud.user import upsert_user
+from app.main import app
+
+
+def _record(uid: str) -> UserRecord:
+    return UserRecord(id=uuid.uuid4(), firebase_uid=uid, email=None, plan="free")
+
+
+def test_user_record_cache_ttl_lru_and_invalidate():
+    cache = UserRecordCache(maxsize=2, ttl=60, use_redis=False)
+    a, b, c = _record("a"), _record("b"), _record("c")
+    cache.set(a); cache.set(b)
+    assert cache.get("a") == a                 # a を最近使ったことにする
+    cache.set(c)                               # → b が追い出される
+    assert cache.get("b") is None and cache.get("c") == c
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    expired = UserRecordCache(maxsize=2, ttl=-1, use_redis=False)
+    expired.set(a)
+    assert expired.get("a") is None
+
+
+def test_upsert_user_is_idempotent(db_session):
+    """同じ uid の登録が重なっても一意制約違反にならず同じ行が返る"""
+    first = upsert_user(db_session, "uid-upsert-1", "upsert1@example.com")
+    second = upsert_user(db_session, "uid-upsert-1", "upsert1@example.com")
+    assert str(first["id"]) == str(second["id"])
+    assert second["plan"] == "free"
+
+
+def test_resolve_user_uses_cache(db_session):
+    rec = resolve_user(db_session, "uid-resolve-1", "resolve1@example.com")
+    hits = user_cache.stats()["hits"]
+    again = resolve_user(db_session, "uid-resolve-1", "resolve1@example.com")
+    assert again == rec and user_cache.stats()["hits"] == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_users_me_after_cached_record(db_session):
+    """読み取りルートでキャッシュした後でも、/users/me は ORM User を読めて同じ id を返す"""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        r1 = await ac.get("/users/me/pets", headers={"Authorization": "Bearer any.token"})
+        assert r1.status_code == 200
+        r2 = await ac.get("/users/me", headers={"Authorization": "Bearer any.token"})
+        assert r2.status_code == 200
+    assert r2.json()["id"] == str(user_cache.get("test-uid-123").id)